@@ -0,0 +1,147 @@
+"""
+Estatísticas de uso calculadas a partir de agregados diários.
+
+aggregate_usage() recalcula, com consultas de agregação no banco, somente os dias
+marcados em RollupDirtyDay (os sinais marcam o dia de cada horário ou reserva
+alterado). As telas de estatística leem apenas as tabelas de agregados.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Min, Max, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from lavanderia.models import AvaibleSlot, DailyApartmentUsage, DailyWasherUsage, ReservedSlot, RollupDirtyDay
+
+DIAS_DA_SEMANA = ['', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+
+
+def slot_day(start):
+    return timezone.localtime(start).date()
+
+
+def mark_dirty(*days):
+    RollupDirtyDay.objects.bulk_create([RollupDirtyDay(day=day) for day in days], ignore_conflicts=True)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _runs(days):
+    """Agrupa dias em intervalos de dias consecutivos: [(primeiro, último), ...]."""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def aggregate_range(first_day, last_day):
+    """Recalcula os agregados dos dias entre first_day e last_day (inclusive)."""
+    inicio, fim = day_start(first_day), day_start(last_day + datetime.timedelta(days=1))
+
+    por_lavadora = AvaibleSlot.objects.filter(start__gte=inicio, start__lt=fim).annotate(
+        day=TruncDate('start'),
+        hour=ExtractHour('start'),
+    ).values('day', 'washer_id', 'hour').annotate(
+        slots=Count('id'),
+        reserved=Count('reservedslot'),
+        absences=Count('reservedslot', filter=Q(reservedslot__presence=False)),
+    ).order_by()
+
+    por_apartamento = ReservedSlot.objects.filter(slot__start__gte=inicio, slot__start__lt=fim).annotate(
+        day=TruncDate('slot__start'),
+    ).values('day', 'user__apartamento').annotate(
+        reservations=Count('id'),
+        absences=Count('id', filter=Q(presence=False)),
+    ).order_by()
+
+    with transaction.atomic():
+        DailyWasherUsage.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+        DailyApartmentUsage.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+        DailyWasherUsage.objects.bulk_create(
+            (DailyWasherUsage(**linha) for linha in por_lavadora.iterator()), batch_size=1000)
+        DailyApartmentUsage.objects.bulk_create(
+            (DailyApartmentUsage(day=linha['day'], apartamento=linha['user__apartamento'],
+                                 reservations=linha['reservations'], absences=linha['absences'])
+             for linha in por_apartamento.iterator()),
+            batch_size=1000,
+        )
+
+
+def aggregate_usage(everything=False):
+    """
+    Atualiza os agregados. Por padrão só os dias alterados desde a última execução;
+    com everything=True, todos os dias que têm horários. Retorna quantos dias foram processados.
+    """
+    if everything:
+        limites = AvaibleSlot.objects.aggregate(primeiro=Min('start'), ultimo=Max('start'))
+        if limites['primeiro'] is None:
+            RollupDirtyDay.objects.all().delete()
+            return 0
+        runs = [[slot_day(limites['primeiro']), slot_day(limites['ultimo'])]]
+    else:
+        runs = _runs(RollupDirtyDay.objects.values_list('day', flat=True))
+
+    for first_day, last_day in runs:
+        with transaction.atomic():
+            marcados = RollupDirtyDay.objects.all()
+            if not everything:
+                marcados = marcados.filter(day__gte=first_day, day__lte=last_day)
+            # Trava as marcações lidas (no PostgreSQL): quem alterar um desses dias durante a
+            # agregação espera o fim da transação e marca o dia de novo
+            dias = list(marcados.select_for_update().values_list('day', flat=True))
+            aggregate_range(first_day, last_day)
+            # Os dias só deixam de estar marcados junto com a gravação dos agregados: se a
+            # agregação falhar, continuam marcados para a próxima execução ou nova tentativa
+            RollupDirtyDay.objects.filter(day__in=dias).delete()
+    return sum((last_day - first_day).days + 1 for first_day, last_day in runs)
+
+
+def _rate(parte, total):
+    return round(100 * parte / total, 1) if total else 0.0
+
+
+def usage_report(first_day, last_day, top=10):
+    """Estatísticas do período, lidas apenas das tabelas de agregados."""
+    uso = DailyWasherUsage.objects.filter(day__gte=first_day, day__lte=last_day)
+    totais = dict(slots=Sum('slots'), reserved=Sum('reserved'), absences=Sum('absences'))
+
+    def com_taxas(linhas):
+        for linha in linhas:
+            if 'slots' in linha:
+                linha['utilization'] = _rate(linha['reserved'], linha['slots'])
+            linha['no_show'] = _rate(linha['absences'], linha['reserved'])
+        return linhas
+
+    por_dia_da_semana = com_taxas(list(
+        uso.annotate(weekday=ExtractIsoWeekDay('day')).values('weekday').annotate(**totais).order_by('weekday')
+    ))
+    for linha in por_dia_da_semana:
+        linha['weekday'] = DIAS_DA_SEMANA[linha['weekday']]
+
+    picos = com_taxas(list(
+        uso.annotate(weekday=ExtractIsoWeekDay('day')).values('weekday', 'hour').annotate(**totais)
+    ))
+    for linha in picos:
+        linha['weekday'] = DIAS_DA_SEMANA[linha['weekday']]
+    picos.sort(key=lambda linha: (linha['utilization'], linha['reserved']), reverse=True)
+
+    apartamentos = com_taxas([
+        dict(linha, reserved=linha['reservations'])
+        for linha in DailyApartmentUsage.objects.filter(day__gte=first_day, day__lte=last_day)
+        .values('apartamento').annotate(reservations=Sum('reservations'), absences=Sum('absences'))
+    ])
+    apartamentos.sort(key=lambda linha: (linha['no_show'], linha['absences']), reverse=True)
+
+    return {
+        'por_lavadora': com_taxas(list(uso.values('washer__name').annotate(**totais).order_by('washer__name'))),
+        'por_hora': com_taxas(list(uso.values('hour').annotate(**totais).order_by('hour'))),
+        'por_dia_da_semana': por_dia_da_semana,
+        'picos': picos[:top],
+        'apartamentos': apartamentos,
+    }
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class LavanderiaConfig(AppConfig):
+    name = 'lavanderia'
+
+    def ready(self):
+        # Registra os receptores de sinais
+        from lavanderia import signals  # noqa: F401
@@ -0,0 +1,101 @@
+"""
+Arquivamento de horários e reservas antigos.
+
+As consultas do dia a dia só olham horários futuros e as regras de agendamento só
+precisam das faltas dos últimos 30 dias, então horários (e suas reservas) mais antigos
+que ARCHIVE_AFTER_DAYS são movidos em lotes para ArchivedSlot/ArchivedReservation.
+Assim o tamanho das tabelas ativas fica limitado pela janela de agendamento.
+
+Cada lote tem dias inteiros, agregados (analytics) na mesma transação em que são
+movidos, já que depois disso aggregate_range não enxerga mais esses horários. Assim
+um dia nunca fica dividido entre as duas tabelas, mesmo que o arquivamento seja
+interrompido. O histórico completo continua acessível por reservation_history(), que
+junta as duas tabelas.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from lavanderia.analytics import aggregate_range, day_start, slot_day
+from lavanderia.booking import JANELA_FALTAS
+from lavanderia.models import ArchivedReservation, ArchivedSlot, AvaibleSlot, LotteryPreference, ReservedSlot, \
+    RollupDirtyDay, WaitlistEntry
+
+BATCH_SIZE = 1000
+
+
+def archive_cutoff(dias=None):
+    """Início do dia a partir do qual os horários continuam nas tabelas ativas."""
+    dias = settings.ARCHIVE_AFTER_DAYS if dias is None else dias
+    if dias <= JANELA_FALTAS.days:
+        raise ValueError(f"O arquivamento precisa manter mais de {JANELA_FALTAS.days} dias (janela das faltas).")
+    dia = timezone.localdate() - datetime.timedelta(days=dias)
+    return day_start(dia)
+
+
+def archive_old_slots(dias=None, batch_size=BATCH_SIZE, on_batch=None):
+    """
+    Move os horários que começaram antes do corte, e suas reservas, para o arquivo. Retorna quantos.
+
+    Cada lote tem os dias inteiros que cabem em batch_size horários (ou um único dia,
+    se ele sozinho tiver mais). on_batch, se dado, é chamado antes de cada lote (a
+    tarefa renova a reserva do Job).
+    """
+    corte = archive_cutoff(dias)
+    total = 0
+    while True:
+        if on_batch:
+            on_batch()
+        with transaction.atomic():
+            inicios = list(AvaibleSlot.objects.filter(start__lt=corte).order_by('start')
+                           .values_list('start', flat=True)[:batch_size + 1])
+            if not inicios:
+                break
+            primeiro_dia = slot_day(inicios[0])
+            fim = corte
+            if len(inicios) > batch_size:
+                # O lote termina no início do dia do primeiro horário que não coube
+                fim = min(fim, day_start(max(slot_day(inicios[-1]), primeiro_dia + datetime.timedelta(days=1))))
+            ultimo_dia = slot_day(fim) - datetime.timedelta(days=1)
+            aggregate_range(primeiro_dia, ultimo_dia)
+            RollupDirtyDay.objects.filter(day__lte=ultimo_dia).delete()
+
+            slots = list(AvaibleSlot.objects.filter(start__lt=fim).values(
+                'id', 'start', 'end', 'duration', 'washer_id'))
+            ids = [slot['id'] for slot in slots]
+            reservas = ReservedSlot.objects.filter(slot_id__in=ids)
+
+            ArchivedSlot.objects.bulk_create([ArchivedSlot(**slot) for slot in slots])
+            ArchivedReservation.objects.bulk_create([
+                ArchivedReservation(**reserva)
+                for reserva in reservas.values('id', 'slot_id', 'user_id', 'presence')
+            ])
+            # DELETE direto, sem carregar os objetos: os sinais (elegibilidade, cache,
+            # eventos, agregados) não se aplicam a horários que já passaram há meses
+            reservas._raw_delete(reservas.db)
+            WaitlistEntry.objects.filter(slot_id__in=ids)._raw_delete(WaitlistEntry.objects.db)
+            LotteryPreference.objects.filter(slot_id__in=ids)._raw_delete(LotteryPreference.objects.db)
+            AvaibleSlot.objects.filter(id__in=ids)._raw_delete(AvaibleSlot.objects.db)
+        total += len(slots)
+    return total
+
+
+def reservation_history(fields, start=None, end=None, *, conditions=(), **filters):
+    """
+    Reservas das tabelas ativa e de arquivo cujo horário começa em [start, end),
+    como uma única consulta (UNION ALL) de values() ordenada por início.
+
+    fields usa os mesmos nomes nos dois modelos (ex.: 'slot__start', 'user__username');
+    conditions e filters são aplicados às duas tabelas.
+    """
+    consultas = []
+    for model in (ArchivedReservation, ReservedSlot):
+        reservas = model.objects.filter(*conditions, **filters)
+        if start is not None:
+            reservas = reservas.filter(slot__start__gte=start)
+        if end is not None:
+            reservas = reservas.filter(slot__start__lt=end)
+        consultas.append(reservas.values(*fields).order_by())
+    return consultas[0].union(consultas[1], all=True).order_by('slot__start', 'id')
@@ -3,6 +3,11 @@ ASGI config for lavanderia project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live availability stream (horarios/eventos/) is only served when the app runs
+under ASGI, e.g.:
+
+    uvicorn lavanderia.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lavanderia.settings')
+# Habilita o que só funciona sob ASGI, como o fluxo de eventos (ver ASGI em settings)
+os.environ.setdefault('LAVANDERIA_SERVER', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,38 @@
+"""
+Busca do usuário da sessão em cache.
+
+Com o ModelBackend padrão toda requisição autenticada relê o LavanderiaUser no banco
+(e StaffRequireBolsista usa o bolsista desse objeto). CachedModelBackend guarda o
+usuário no cache por USER_CACHE_TIMEOUT segundos; os sinais de LavanderiaUser
+(lavanderia/signals.py) apagam a entrada quando o usuário é alterado ou excluído,
+então senha, bolsista e is_active nunca ficam desatualizados. Como a invalidação
+precisa valer para todos os workers, o cache só é ligado com LAVANDERIA_CACHE=file ou
+redis (ver USER_CACHE_TIMEOUT em settings).
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+
+def user_cache_key(user_id):
+    return f"usuario:{user_id}"
+
+
+def invalidate_user(user_id):
+    """Apaga o usuário do cache assim que a transação atual terminar."""
+    transaction.on_commit(lambda: cache.delete(user_cache_key(user_id)))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout=settings.USER_CACHE_TIMEOUT)
+        # is_active é conferido de novo, como no ModelBackend, caso a regra mude
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,14 @@
+"""
+Benchmarks do fluxo de agendamento, todos em bancos descartáveis (management/seed.py).
+
+simulation.run_benchmark simula moradores e bolsistas concorrentes acessando as rotas
+reais com o Client do Django; report resume vazão, latência (p50/p95/p99) e consultas
+por requisição de cada rota e compara o resultado, gravado em JSON, com o de uma
+execução anterior (comando benchmark).
+
+As medidas específicas ficam nos demais módulos, cada um com o seu comando:
+availability (lista de horários com históricos grandes e com/sem cache,
+benchmark_availability), pagination (página 1 contra uma página distante com um milhão
+de reservas, benchmark_pagination) e events (conexões SSE em um worker ASGI,
+benchmark_events).
+"""
@@ -0,0 +1,132 @@
+"""
+Medidas da lista pública de horários (AvailableSlotListView).
+
+run_growth_benchmark mede a lista, sem cache, com históricos de reservas de tamanhos
+diferentes: como ela só olha a janela de agendamento, o tempo não deve crescer com o
+número de reservas antigas. run_cache_benchmark compara a vazão da lista com e sem o
+cache de disponibilidade (lavanderia/cache.py), também com agendamentos intercalados,
+que invalidam as entradas.
+"""
+import datetime
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from lavanderia.benchmark.report import percentile
+from lavanderia.booking import booking_limit
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot
+
+WASHERS = 100
+SLOTS_POR_DIA = 10
+OCUPACAO = 0.6
+# Cache que nunca guarda nada: toda requisição consulta o banco
+SEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+CACHE_TIMEOUT = 60
+
+
+def _client(usuario):
+    client = Client()
+    client.force_login(usuario)
+    return client
+
+
+def run_growth_benchmark(tamanhos=(10_000, 100_000, 1_000_000), repeticoes=20):
+    """Tempo (mediana e p99) e consultas da lista sem cache para cada tamanho do histórico."""
+    resultados = []
+    for linhas in tamanhos:
+        with test_databases():
+            _, moradores = seed_database(washers=WASHERS, slots_por_dia=SLOTS_POR_DIA, ocupacao=OCUPACAO,
+                                         dias=max(16, round(linhas / (WASHERS * SLOTS_POR_DIA * OCUPACAO))),
+                                         usuarios=2000)
+            client = _client(moradores[0])
+            url = reverse('horarios')
+            with override_settings(CACHES=SEM_CACHE):
+                client.get(url)
+                reset_queries()
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                consultas = len(queries)
+                tempos = []
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    client.get(url)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos.sort()
+            resultados.append({
+                'reservas': ReservedSlot.objects.count(),
+                'mediana_ms': round(statistics.median(tempos), 2),
+                'p99_ms': round(percentile(tempos, 99), 2),
+                'consultas': consultas,
+            })
+    return resultados
+
+
+def _run_requests(client, paginas, requisicoes, agendar_a_cada, slots, outros, rng):
+    tempos = []
+    agendamentos = 0
+    consultas = 0
+
+    def contar(execute, sql, params, many, context):
+        nonlocal consultas
+        consultas += 1
+        return execute(sql, params, many, context)
+
+    inicio = time.perf_counter()
+    for i in range(requisicoes):
+        if agendar_a_cada and i % agendar_a_cada == agendar_a_cada - 1 and slots and outros:
+            # Um agendamento por outro morador (sem reservas): invalida as páginas guardadas
+            outros.pop().get(reverse('schedule_slot', args=[slots.pop()]))
+            agendamentos += 1
+        url, params = rng.choice(paginas)
+        comeco = time.perf_counter()
+        with connection.execute_wrapper(contar):
+            client.get(url, params)
+        tempos.append((time.perf_counter() - comeco) * 1000)
+    segundos = time.perf_counter() - inicio
+    tempos.sort()
+    return {
+        'requisicoes': requisicoes,
+        'agendamentos': agendamentos,
+        'vazao': round(requisicoes / segundos, 1),
+        'p50_ms': round(percentile(tempos, 50), 2),
+        'p99_ms': round(percentile(tempos, 99), 2),
+        'consultas': round(consultas / requisicoes, 2),
+    }
+
+
+def run_cache_benchmark(requisicoes=2000, agendar_a_cada=20, seed=42):
+    """Vazão e latência da lista sem cache, com cache e com cache mais agendamentos intercalados."""
+    rng = random.Random(seed)
+    with test_databases():
+        _, moradores = seed_database(washers=8, dias=30, usuarios=300, ocupacao=OCUPACAO)
+        client = _client(moradores[0])
+        url = reverse('horarios')
+        # Os dias da janela de agendamento e as três primeiras páginas de cada um
+        hoje = timezone.localdate()
+        paginas = [(url, {'data': (hoje + datetime.timedelta(days=dia)).isoformat(), 'page': pagina})
+                   for dia in range(7) for pagina in (1, 2, 3)]
+        livres = list(AvaibleSlot.objects.filter(start__gt=timezone.now(), start__lt=booking_limit(),
+                                                 reservedslot__isnull=True).values_list('id', flat=True))
+        rng.shuffle(livres)
+        outros = [_client(usuario) for usuario in LavanderiaUser.objects.bulk_create(
+            LavanderiaUser(username=f"agenda{i}", matricula=f"a{i}") for i in range(requisicoes // agendar_a_cada))]
+
+        resultados = {}
+        with override_settings(CACHES=SEM_CACHE):
+            resultados['sem cache'] = _run_requests(client, paginas, requisicoes, 0, livres, outros, rng)
+        # Um único processo: o cache local equivale a um compartilhado
+        with override_settings(AVAILABILITY_CACHE_TIMEOUT=CACHE_TIMEOUT):
+            cache.clear()
+            resultados['com cache'] = _run_requests(client, paginas, requisicoes, 0, livres, outros, rng)
+            cache.clear()
+            resultados[f'com cache, agendando a cada {agendar_a_cada}'] = _run_requests(
+                client, paginas, requisicoes, agendar_a_cada, livres, outros, rng)
+    return resultados
@@ -0,0 +1,183 @@
+"""
+Teste de carga do fluxo de eventos (horarios/eventos/) em um worker ASGI de verdade.
+
+Sobe um uvicorn (lavanderia.asgi) sobre o banco descartável, abre `conexoes` conexões
+SSE e mede a memória do worker por conexão. Depois agenda horários pelo caminho normal
+(GET horarios/<pk> com a sessão de um morador) e mede, em cada conexão, o tempo entre o
+início do agendamento e a chegada do slot-booked correspondente.
+"""
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.utils import timezone
+
+from lavanderia.benchmark.report import percentile
+from lavanderia.booking import booking_limit
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot
+
+HOST = '127.0.0.1'
+# Conexões abertas ao mesmo tempo durante o estabelecimento
+CONNECT_BATCH = 200
+# Espera máxima (segundos) pela entrega de um evento a todas as conexões
+DELIVERY_TIMEOUT = 10
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kib(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for linha in status:
+            if linha.startswith('VmRSS:'):
+                return int(linha.split()[1])
+    return 0
+
+
+def _session_cookie(user):
+    """Sessão gravada no banco, como a do login, para o worker reconhecer o morador."""
+    sessao = SessionStore()
+    sessao[SESSION_KEY] = str(user.pk)
+    sessao[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sessao[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    sessao.save()
+    return f"{settings.SESSION_COOKIE_NAME}={sessao.session_key}"
+
+
+def _start_server(port):
+    env = {
+        **os.environ,
+        'LAVANDERIA_SERVER': 'asgi',
+        'LAVANDERIA_DB_NAME': str(connection.settings_dict['NAME']),
+        # As sessões criadas aqui estão no banco; o worker não tem o cache deste processo
+        'LAVANDERIA_SESSION_ENGINE': 'db',
+        'LAVANDERIA_REQUEST_LOG_LEVEL': 'WARNING',
+    }
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'lavanderia.asgi:application', '--host', HOST, '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        env=env,
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return processo
+        except OSError:
+            if processo.poll() is not None:
+                raise RuntimeError("O uvicorn terminou antes de aceitar conexões.")
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("O uvicorn não aceitou conexões em 30s.")
+
+
+def _book(port, slot_id, cookie):
+    cliente = http.client.HTTPConnection(HOST, port, timeout=DELIVERY_TIMEOUT)
+    try:
+        cliente.request('GET', f'/horarios/{slot_id}', headers={'Cookie': cookie})
+        return cliente.getresponse().status
+    finally:
+        cliente.close()
+
+
+class Listener:
+    """Uma conexão SSE que anota o instante de chegada de cada slot-booked."""
+
+    def __init__(self, chegadas):
+        self.chegadas = chegadas
+        self.reader = self.writer = None
+
+    async def connect(self, port):
+        self.reader, self.writer = await asyncio.open_connection(HOST, port)
+        self.writer.write(f"GET /horarios/eventos/ HTTP/1.1\r\nHost: {HOST}\r\n"
+                          f"Accept: text/event-stream\r\n\r\n".encode())
+        await self.writer.drain()
+        # A conexão está registrada no hub quando o preâmbulo chega
+        while not (await self.reader.readline()).startswith(b'retry:'):
+            pass
+
+    async def listen(self):
+        while linha := await self.reader.readline():
+            if linha.startswith(b'data: '):
+                evento = json.loads(linha[6:])
+                if evento['type'] == 'slot-booked':
+                    self.chegadas.setdefault(evento['slot'], []).append(time.perf_counter())
+
+    def close(self):
+        self.writer.close()
+
+
+async def _run(port, pid, conexoes, agendamentos):
+    chegadas = {}
+    ouvintes = [Listener(chegadas) for _ in range(conexoes)]
+    memoria_inicial = _rss_kib(pid)
+    inicio = time.perf_counter()
+    for lote in range(0, conexoes, CONNECT_BATCH):
+        await asyncio.gather(*(ouvinte.connect(port) for ouvinte in ouvintes[lote:lote + CONNECT_BATCH]))
+    segundos_conexao = time.perf_counter() - inicio
+    memoria = _rss_kib(pid) - memoria_inicial
+    tarefas = [asyncio.create_task(ouvinte.listen()) for ouvinte in ouvintes]
+
+    latencias, agendamento_ms, perdidos = [], [], 0
+    loop = asyncio.get_running_loop()
+    for slot_id, cookie in agendamentos:
+        enviado = time.perf_counter()
+        status = await loop.run_in_executor(None, _book, port, slot_id, cookie)
+        agendamento_ms.append((time.perf_counter() - enviado) * 1000)
+        if status != 302:
+            raise RuntimeError(f"Agendamento do horário {slot_id} retornou {status}")
+        limite = time.perf_counter() + DELIVERY_TIMEOUT
+        while len(chegadas.get(slot_id, [])) < conexoes and time.perf_counter() < limite:
+            await asyncio.sleep(0.005)
+        recebidos = chegadas.get(slot_id, [])
+        perdidos += conexoes - len(recebidos)
+        latencias.extend((chegada - enviado) * 1000 for chegada in recebidos)
+
+    for tarefa in tarefas:
+        tarefa.cancel()
+    for ouvinte in ouvintes:
+        ouvinte.close()
+    latencias.sort()
+    agendamento_ms.sort()
+    return {
+        'conexoes': conexoes,
+        'conexao_s': round(segundos_conexao, 2),
+        'memoria_kib_por_conexao': round(memoria / conexoes, 1),
+        'eventos': len(agendamentos),
+        'entregas': len(latencias),
+        'perdidas': perdidos,
+        'agendamento_p50_ms': round(percentile(agendamento_ms, 50), 2),
+        'entrega_p50_ms': round(percentile(latencias, 50), 2) if latencias else None,
+        'entrega_p99_ms': round(percentile(latencias, 99), 2) if latencias else None,
+        'entrega_max_ms': round(latencias[-1], 2) if latencias else None,
+    }
+
+
+def run_events_benchmark(conexoes=1000, eventos=20):
+    """Executa o teste em um banco descartável e retorna as medidas."""
+    with test_databases():
+        _, moradores = seed_database(washers=4, dias=3, dias_futuros=3, usuarios=eventos, ocupacao=0)
+        slots = AvaibleSlot.objects.filter(start__gt=timezone.now(), start__lt=booking_limit()) \
+            .order_by('start').values_list('id', flat=True)[:eventos]
+        agendamentos = [(slot_id, _session_cookie(morador)) for slot_id, morador in zip(slots, moradores)]
+
+        port = _free_port()
+        processo = _start_server(port)
+        try:
+            return asyncio.run(_run(port, processo.pid, conexoes, agendamentos))
+        finally:
+            processo.terminate()
+            processo.wait()
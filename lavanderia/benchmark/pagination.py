@@ -0,0 +1,99 @@
+"""
+Custo da paginação por cursor (lavanderia/pagination.py) com muitas reservas.
+
+Popula o banco descartável com `linhas` reservas e mede, nas listagens de agendamentos e
+do histórico, a página 1 e a página `pagina`: o cursor dessa página é a chave da última
+linha da página anterior, como o link "próxima" geraria. Para comparação, mede também a
+consulta da mesma página por OFFSET, como a paginação por número de página faria (só a
+consulta das chaves, sem as demais colunas nem a renderização).
+"""
+import math
+import statistics
+import time
+
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from lavanderia.archive import reservation_history
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot
+from lavanderia.pagination import KeysetPaginationMixin, encode_cursor
+from lavanderia.views import ReservationHistoryView
+
+WASHERS = 100
+SLOTS_POR_DIA = 10
+# Ordenação das duas listagens medidas
+KEYSET = ('slot__start', 'id')
+
+
+def _median_ms(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return round(statistics.median(tempos), 2)
+
+
+def _request(client, url, params, repeticoes):
+    # Com DEBUG o log de consultas da população está cheio e não registraria nenhuma nova
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} retornou {response.status_code}")
+    consultas = len(queries)
+    return _median_ms(lambda: client.get(url, params), repeticoes), consultas
+
+
+def _measure(client, url, params, ordenadas, pagina, tamanho, repeticoes):
+    """Página 1 e página `pagina` pelo cursor, e a mesma página por OFFSET."""
+    deslocamento = (pagina - 1) * tamanho
+    # Última linha da página anterior: a mesma chave que o link "próxima" levaria
+    linha = ordenadas[deslocamento - 1]
+    cursor = encode_cursor([linha[campo] for campo in KEYSET])
+    primeira_ms, primeira_consultas = _request(client, url, params, repeticoes)
+    ultima_ms, ultima_consultas = _request(client, url, {**params, 'apos': cursor}, repeticoes)
+    offset_ms = _median_ms(lambda: list(ordenadas[deslocamento:deslocamento + tamanho]), repeticoes)
+    return {
+        'pagina_1_ms': primeira_ms,
+        'pagina_1_consultas': primeira_consultas,
+        f'pagina_{pagina}_ms': ultima_ms,
+        f'pagina_{pagina}_consultas': ultima_consultas,
+        f'offset_pagina_{pagina}_ms': offset_ms,
+    }
+
+
+def run_pagination_benchmark(linhas=1_000_000, pagina=500, repeticoes=5):
+    """Executa a medição em um banco descartável e retorna as medidas por listagem."""
+    tamanho = KeysetPaginationMixin.paginate_by
+    if linhas < pagina * tamanho:
+        raise ValueError(f"São necessárias ao menos {pagina * tamanho} linhas para a página {pagina}.")
+    with test_databases():
+        inicio = time.perf_counter()
+        seed_database(washers=WASHERS, slots_por_dia=SLOTS_POR_DIA, dias=math.ceil(linhas / (WASHERS * SLOTS_POR_DIA)),
+                      usuarios=2000, ocupacao=1)
+        populacao_s = time.perf_counter() - inicio
+        primeiro = AvaibleSlot.objects.order_by('start').values_list('start', flat=True).first()
+        bolsista = LavanderiaUser.objects.create(username="bolsista", bolsista=True)
+        client = Client()
+        client.force_login(bolsista)
+
+        resultado = {
+            'linhas': ReservedSlot.objects.count(),
+            'populacao_s': round(populacao_s, 1),
+            'tamanho_pagina': tamanho,
+            'agendamentos': _measure(
+                client, reverse('reserved_slots'), {'data': primeiro.date().isoformat()},
+                ReservedSlot.objects.filter(slot__start__gte=primeiro).order_by(*KEYSET).values(*KEYSET),
+                pagina, tamanho, repeticoes,
+            ),
+            'historico': _measure(
+                client, reverse('reserved_slots_history'), {},
+                reservation_history(ReservationHistoryView.fields),
+                pagina, tamanho, repeticoes,
+            ),
+        }
+    return resultado
@@ -0,0 +1,63 @@
+import json
+import math
+import platform
+
+import django
+from django.db import connection
+
+
+def percentile(valores, p):
+    """Percentil por posição (nearest-rank) de uma lista ordenada."""
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def summarize(amostras, segundos):
+    """Vazão, latências e consultas médias por rota, mais o total."""
+    rotas = {}
+    for rota, linhas in sorted(amostras.items()):
+        tempos = sorted(ms for ms, _, _ in linhas)
+        rotas[rota] = {
+            'requisicoes': len(linhas),
+            'erros': sum(1 for _, _, status in linhas if status >= 500),
+            'vazao': round(len(linhas) / segundos, 1),
+            'p50_ms': round(percentile(tempos, 50), 2),
+            'p95_ms': round(percentile(tempos, 95), 2),
+            'p99_ms': round(percentile(tempos, 99), 2),
+            'consultas': round(sum(consultas for _, consultas, _ in linhas) / len(linhas), 2),
+        }
+    total = sum(rota['requisicoes'] for rota in rotas.values())
+    return {
+        'ambiente': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'banco': connection.vendor,
+        },
+        'duracao_s': round(segundos, 2),
+        'vazao': round(total / segundos, 1),
+        'rotas': rotas,
+    }
+
+
+def compare(atual, base, tolerancia=0.2):
+    """Regressões de `atual` em relação a `base`: p95 ou consultas acima de base * (1 + tolerancia)."""
+    regressoes = []
+    for rota, medidas in atual['rotas'].items():
+        anterior = base['rotas'].get(rota)
+        if anterior is None:
+            continue
+        for campo in ('p95_ms', 'consultas'):
+            if medidas[campo] > anterior[campo] * (1 + tolerancia):
+                regressoes.append(f"{rota}: {campo} {anterior[campo]} -> {medidas[campo]}")
+        if medidas['erros'] > anterior['erros']:
+            regressoes.append(f"{rota}: erros {anterior['erros']} -> {medidas['erros']}")
+    return regressoes
+
+
+def save(resultado, caminho):
+    with open(caminho, 'w') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+def load(caminho):
+    with open(caminho) as arquivo:
+        return json.load(arquivo)
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from lavanderia.booking import booking_limit
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LavanderiaUser
+
+
+class Recorder:
+    """Guarda, por rota, (milissegundos, consultas, status) de cada requisição."""
+
+    def __init__(self):
+        self.amostras = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def request(self, client, rota, method, path):
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(path)
+        amostra = ((time.perf_counter() - inicio) * 1000, len(queries), response.status_code)
+        with self.lock:
+            self.amostras[rota].append(amostra)
+        return response
+
+
+def resident(recorder, user, slots, iteracoes, rng):
+    """Morador: vê os horários, tenta agendar um e confere os próprios agendamentos."""
+    client = Client()
+    client.force_login(user)
+    for _ in range(iteracoes):
+        recorder.request(client, 'horarios', 'get', reverse('horarios'))
+        recorder.request(client, 'schedule_slot', 'post', reverse('schedule_slot', args=[rng.choice(slots)]))
+        recorder.request(client, 'meus_agendamentos', 'get', reverse('meus_agendamentos'))
+
+
+def staff(recorder, user, iteracoes, rng):
+    """Bolsista: acompanha os agendamentos e os horários cadastrados."""
+    client = Client()
+    client.force_login(user)
+    for _ in range(iteracoes):
+        recorder.request(client, 'reserved_slots', 'get', reverse('reserved_slots'))
+        recorder.request(client, 'time_slot_list', 'get', reverse('time_slot_list'))
+
+
+def run_actor(actor, *args):
+    try:
+        actor(*args)
+    finally:
+        # Cada thread tem a própria conexão com o banco
+        connection.close()
+
+
+def run_benchmark(washers=8, usuarios=300, semanas=4, ocupacao=0.6, moradores=8, bolsistas=2,
+                  iteracoes=20, seed=42):
+    """
+    Executa a simulação em um banco descartável.
+
+    Retorna (amostras por rota, duração em segundos). Os horários cobrem `semanas` semanas
+    terminando no fim da janela de agendamento; `ocupacao` é a fração já reservada.
+    """
+    with test_databases():
+        _, moradores_seed = seed_database(washers=washers, dias=semanas * 7, usuarios=usuarios,
+                                          ocupacao=ocupacao, seed=seed)
+        equipe = [LavanderiaUser.objects.create(username=f"bolsista{i}", bolsista=True) for i in range(bolsistas)]
+        slots = list(AvaibleSlot.objects.filter(start__gte=timezone.now(), start__lt=booking_limit())
+                     .values_list('id', flat=True))
+
+        recorder = Recorder()
+        threads = [
+            threading.Thread(target=run_actor, args=(
+                resident, recorder, moradores_seed[i], slots, iteracoes, random.Random(seed + i)))
+            for i in range(moradores)
+        ] + [
+            threading.Thread(target=run_actor, args=(
+                staff, recorder, equipe[i], iteracoes, random.Random(seed - i - 1)))
+            for i in range(bolsistas)
+        ]
+
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return recorder.amostras, time.perf_counter() - inicio
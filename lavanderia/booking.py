@@ -0,0 +1,327 @@
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.utils import timezone
+
+from lavanderia.db import retry_on_locked
+from lavanderia.models import AvaibleSlot, BookingEligibility, LavanderiaUser, LotteryRound, ReservedSlot, \
+    WaitlistEntry
+from lavanderia.notifications import get_notifier
+
+# Regras de agendamento
+HORIZONTE_DIAS = 15  # Não é possível agendar além de duas semanas
+JANELA_FALTAS = datetime.timedelta(days=30)
+LIMITE_FALTAS = 2
+LIMITE_AGENDAMENTOS = 2
+MENSAGEM_LIMITE = "Você não pode agendar mais horários. Possui 2 horarios agendados na próxima semana."
+
+
+class BookingError(Exception):
+    """Agendamento recusado. A mensagem é exibida ao usuário."""
+
+
+class SlotTakenError(BookingError):
+    """O horário já está agendado; o usuário cumpre as demais regras e pode entrar na lista de espera."""
+
+
+def _eligibility_fields(proximos, faltas):
+    """
+    Calcula os campos de BookingEligibility.
+
+    proximos: inícios das reservas que ainda não começaram, em ordem crescente.
+    faltas: inícios das faltas dentro da janela, em ordem decrescente.
+    """
+    blocked_until = None
+    if len(faltas) >= LIMITE_FALTAS:
+        # O bloqueio dura até a falta que mantém o limite atingido sair da janela
+        blocked_until = faltas[LIMITE_FALTAS - 1] + JANELA_FALTAS
+
+    mudancas = []
+    if proximos:
+        mudancas.append(proximos[0])
+    if faltas:
+        mudancas.append(faltas[-1] + JANELA_FALTAS)
+
+    return {
+        'upcoming': len(proximos),
+        'recent_absences': len(faltas),
+        'blocked_until': blocked_until,
+        'valid_until': min(mudancas) if mudancas else None,
+    }
+
+
+def refresh_eligibility(user_id, agora=None, create=True):
+    """
+    Recalcula o registro de elegibilidade de um usuário.
+
+    Com create=False apenas atualiza um registro existente; os sinais usam essa
+    forma para não recriar o registro de um usuário que está sendo excluído.
+    """
+    agora = agora or timezone.now()
+    reservas = ReservedSlot.objects.filter(user_id=user_id)
+    proximos = list(reservas.filter(slot__start__gte=agora)
+                    .order_by('slot__start').values_list('slot__start', flat=True))
+    faltas = list(reservas.filter(presence=False, slot__start__gte=agora - JANELA_FALTAS)
+                  .order_by('-slot__start').values_list('slot__start', flat=True))
+    campos = _eligibility_fields(proximos, faltas)
+
+    # UPDATE e, se preciso, INSERT em comandos separados (sem update_or_create, que
+    # abriria uma transação com SELECT FOR UPDATE antes de escrever)
+    atualizados = BookingEligibility.objects.filter(user_id=user_id).update(**campos)
+    if not atualizados and create:
+        try:
+            # Savepoint: dentro de uma transação (promote_waitlist) o erro não a invalida
+            with transaction.atomic():
+                BookingEligibility.objects.create(user_id=user_id, **campos)
+        except IntegrityError:
+            # Criado por uma requisição concorrente do mesmo usuário
+            BookingEligibility.objects.filter(user_id=user_id).update(**campos)
+    return BookingEligibility(user_id=user_id, **campos)
+
+
+def rebuild_eligibility(agora=None, batch_size=1000):
+    """Reconstrói do zero os registros de elegibilidade de todos os usuários."""
+    agora = agora or timezone.now()
+    proximos = defaultdict(list)
+    faltas = defaultdict(list)
+    # Só as reservas da janela de faltas em diante influenciam os contadores
+    recentes = ReservedSlot.objects.filter(
+        slot__start__gte=agora - JANELA_FALTAS
+    ).order_by('slot__start').values_list('user_id', 'slot__start', 'presence')
+    for user_id, start, presence in recentes.iterator(chunk_size=batch_size):
+        if start >= agora:
+            proximos[user_id].append(start)
+        if not presence:
+            faltas[user_id].append(start)
+
+    with transaction.atomic():
+        BookingEligibility.objects.all().delete()
+        registros = (
+            BookingEligibility(user_id=user_id, **_eligibility_fields(proximos[user_id], faltas[user_id][::-1]))
+            for user_id in LavanderiaUser.objects.values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        )
+        BookingEligibility.objects.bulk_create(registros, batch_size=batch_size)
+
+
+def get_eligibility(user, agora):
+    """Registro de elegibilidade do usuário, recalculado apenas se estiver ausente ou vencido."""
+    eligibility = BookingEligibility.objects.filter(user_id=user.pk).first()
+    if eligibility is None or (eligibility.valid_until is not None and eligibility.valid_until <= agora):
+        eligibility = refresh_eligibility(user.pk, agora)
+    return eligibility
+
+
+def booking_limit():
+    """Início do primeiro dia que ainda não pode ser agendado."""
+    return timezone.make_aware(datetime.datetime.combine(
+        timezone.localdate() + datetime.timedelta(days=HORIZONTE_DIAS), datetime.time.min))
+
+
+def unreserved_slots(start, end=None):
+    """
+    Slots livres que começam a partir de start (e antes de end, se informado).
+
+    O NOT EXISTS consulta o índice único de ReservedSlot.slot apenas para os slots do
+    intervalo, sem depender do tamanho do histórico de reservas.
+    """
+    slots = AvaibleSlot.objects.filter(start__gte=start)
+    if end is not None:
+        slots = slots.filter(start__lt=end)
+    return slots.exclude(
+        Exists(ReservedSlot.objects.filter(slot=OuterRef('pk')))
+    )
+
+
+def available_slots(start, end=None):
+    """Slots livres que começam entre start e end (por padrão, o fim da janela de agendamento)."""
+    end = min(end, booking_limit()) if end else booking_limit()
+    return unreserved_slots(start, end)
+
+
+def slot_queryset(slot_id):
+    """Slot a ser reservado, anotado com a informação de já estar reservado."""
+    return AvaibleSlot.objects.filter(pk=slot_id).annotate(
+        reservado=Exists(ReservedSlot.objects.filter(slot=OuterRef('pk'))),
+    )
+
+
+def check_user_rules(user, agora):
+    """Regras de agendamento do usuário (faltas e agendamentos futuros); levanta BookingError."""
+    eligibility = get_eligibility(user, agora)
+
+    if eligibility.blocked_until is not None and eligibility.blocked_until >= agora:
+        raise BookingError("Você não pode agendar mais horários. "
+                           "Possui 2 ou mais faltas nos últimos 30 dias.")
+
+    if eligibility.upcoming >= LIMITE_AGENDAMENTOS:
+        raise BookingError(MENSAGEM_LIMITE)
+
+
+def check_upcoming_limit(user_id, agora):
+    """
+    Confere o limite de agendamentos futuros contando as reservas do usuário; levanta
+    BookingError se ele já foi atingido.
+
+    Deve ser chamada na transação que cria a reserva. O SELECT FOR UPDATE trava o
+    registro de elegibilidade até o fim dela (no SQLite o BEGIN IMMEDIATE já serializa
+    as escritas), então agendamentos concorrentes do mesmo usuário são conferidos um de
+    cada vez e a contagem já inclui as reservas confirmadas pelos outros. O contador do
+    registro não basta aqui: ele é recalculado fora de transação e pode estar atrasado.
+    """
+    travado = BookingEligibility.objects.select_for_update().filter(user_id=user_id)
+    if travado.values_list('pk', flat=True).first() is None:
+        # Sem registro ainda; get_or_create usa um savepoint se outra transação o criar antes
+        BookingEligibility.objects.get_or_create(user_id=user_id)
+        travado.values_list('pk', flat=True).first()
+    if ReservedSlot.objects.filter(user_id=user_id, slot__start__gte=agora).count() >= LIMITE_AGENDAMENTOS:
+        raise BookingError(MENSAGEM_LIMITE)
+
+
+def lottery_round_for(start):
+    """Sorteio ainda não realizado que distribui o horário que começa em start, se houver (lavanderia/lottery.py)."""
+    return LotteryRound.objects.filter(status=LotteryRound.OPEN, start__lte=start, end__gt=start).first()
+
+
+def check_slot_rules(slot):
+    if slot.start <= timezone.now():
+        raise BookingError("Não é possível agendar um horário que já começou.")
+
+    if (slot.start.date() - timezone.localdate()).days >= HORIZONTE_DIAS:
+        raise BookingError("Você não pode agendar para datas além de duas semanas.")
+
+    rodada = lottery_round_for(slot.start)
+    if rodada is not None:
+        raise BookingError(f"Este horário será distribuído por sorteio. Envie suas preferências até "
+                           f"{timezone.localtime(rodada.closes_at):%d/%m às %H:%M}.")
+
+
+@retry_on_locked
+def book_slot(user, slot_id):
+    """
+    Reserva o slot para o usuário.
+
+    As regras do usuário são verificadas no registro de elegibilidade (uma busca pela
+    chave primária) e as do slot em uma única consulta; a reserva é criada em seguida.
+    A restrição de unicidade em ReservedSlot.slot garante que dois usuários
+    concorrentes não reservem o mesmo horário: o segundo INSERT falha com
+    IntegrityError. As leituras ficam fora da transação, que envolve só o limite de
+    agendamentos (check_upcoming_limit), o INSERT e as atualizações feitas pelos
+    sinais, então o lock de escrita é mantido pelo menor tempo possível.
+
+    Se o horário já estiver agendado levanta SlotTakenError, verificado por último para
+    que o usuário só seja encaminhado à lista de espera se cumprir as demais regras.
+    """
+    agora = timezone.now()
+    check_user_rules(user, agora)
+
+    slot = slot_queryset(slot_id).first()
+
+    if slot is None:
+        raise Http404("Horário não encontrado")
+
+    check_slot_rules(slot)
+
+    if slot.reservado:
+        raise SlotTakenError("Horário já agendado")
+
+    try:
+        with transaction.atomic():
+            check_upcoming_limit(user.pk, agora)
+            return ReservedSlot.objects.create(slot=slot, user=user)
+    except IntegrityError:
+        # Outro usuário reservou o mesmo slot entre a verificação e o INSERT
+        raise SlotTakenError("Horário já agendado")
+
+
+def join_waitlist(user, slot_id):
+    """Coloca o usuário na lista de espera do horário. Retorna a posição dele na fila (1 = próximo)."""
+    if ReservedSlot.objects.filter(slot_id=slot_id, user=user).exists():
+        raise BookingError("Você já agendou este horário.")
+    try:
+        with transaction.atomic():
+            entrada = WaitlistEntry.objects.create(slot_id=slot_id, user=user)
+    except IntegrityError:
+        entrada = WaitlistEntry.objects.get(slot_id=slot_id, user=user)
+    return WaitlistEntry.objects.filter(slot_id=slot_id, id__lte=entrada.id).count()
+
+
+def _notify_promotion(reserva):
+    get_notifier().send_messages([(
+        reserva.user, "Horário liberado",
+        f"O horário de {timezone.localtime(reserva.slot.start):%d/%m às %H:%M} que você esperava "
+        f"foi liberado e agendado para você.",
+    )])
+
+
+def promote_waitlist(slot, agora=None):
+    """
+    Agenda o horário livre para o primeiro da fila que cumpre as regras de agendamento.
+
+    Cada passo lê o primeiro da fila pelo índice (slot, id) e o remove com um DELETE
+    condicional, então dois cancelamentos concorrentes nunca promovem a mesma entrada.
+    Quem não cumpre mais as regras sai da fila; como cada entrada é examinada uma
+    única vez, o custo por cancelamento é O(1) amortizado, independente do tamanho da
+    fila. Enquanto um sorteio aberto cobre o horário ninguém é promovido: ele fica
+    livre para o sorteio. Retorna a nova reserva ou None.
+    """
+    agora = agora or timezone.now()
+    if slot.start <= agora or (slot.start.date() - timezone.localdate()).days >= HORIZONTE_DIAS:
+        return None
+    if lottery_round_for(slot.start) is not None:
+        return None
+    fila = WaitlistEntry.objects.filter(slot=slot).select_related('user').order_by('id')
+    while (entrada := fila.first()) is not None:
+        try:
+            with transaction.atomic():
+                if not WaitlistEntry.objects.filter(id=entrada.id).delete()[0]:
+                    continue  # Promovida por outro cancelamento
+                try:
+                    check_user_rules(entrada.user, agora)
+                    check_upcoming_limit(entrada.user_id, agora)
+                except BookingError:
+                    continue  # Não pode mais agendar: sai da fila
+                reserva = ReservedSlot.objects.create(slot=slot, user=entrada.user)
+        except IntegrityError:
+            # O horário foi agendado diretamente antes da promoção; a entrada volta à fila
+            return None
+        transaction.on_commit(lambda: _notify_promotion(reserva), robust=True)
+        return reserva
+    return None
+
+
+@retry_on_locked
+def cancel_reservation(reservation):
+    """Cancela a reserva e promove o próximo da lista de espera do horário, na mesma transação."""
+    with transaction.atomic():
+        reservation.delete()
+        return promote_waitlist(reservation.slot)
+
+
+@retry_on_locked
+def toggle_presence(reservation_id):
+    """Inverte a presença da reserva; os sinais atualizam a elegibilidade do usuário."""
+    with transaction.atomic():
+        # BEGIN IMMEDIATE: a leitura já ocorre com o lock de escrita, sem atualização perdida
+        reserva = ReservedSlot.objects.filter(id=reservation_id).first()
+        if reserva is None:
+            raise Http404("Agendamento não encontrado")
+        reserva.presence = not reserva.presence
+        reserva.presence_checked = True
+        reserva.save()
+    return reserva
+
+
+@retry_on_locked
+def confirm_presence(reservation_id):
+    """Confirma a presença, para que a tarefa de faltas (AUTO_NO_SHOW) não registre falta."""
+    with transaction.atomic():
+        reserva = ReservedSlot.objects.filter(id=reservation_id).first()
+        if reserva is None:
+            raise Http404("Agendamento não encontrado")
+        reserva.presence = True
+        reserva.presence_checked = True
+        reserva.save()
+    return reserva
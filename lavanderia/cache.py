@@ -0,0 +1,63 @@
+"""
+Cache da lista pública de horários disponíveis.
+
+As entradas são gravadas com a versão atual da disponibilidade (o parâmetro
+`version` do cache do Django). Qualquer alteração em AvaibleSlot ou ReservedSlot
+incrementa a versão, o que torna todas as entradas anteriores inacessíveis sem
+precisar apagá-las uma a uma. Como a versão precisa valer para todos os workers, o
+cache só é ligado com LAVANDERIA_CACHE=file ou redis (ver AVAILABILITY_CACHE_TIMEOUT
+em settings).
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'horarios:versao'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def availability_version():
+    versao = cache.get(VERSION_KEY)
+    if versao is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        versao = cache.get(VERSION_KEY, 1)
+    return versao
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Chave ausente (cache reiniciado ou expulsa): qualquer valor novo serve,
+        # desde que diferente do anterior
+        cache.set(VERSION_KEY, availability_version() + 1, timeout=None)
+
+
+def bump_availability_version():
+    """Invalida a lista de horários disponíveis assim que a transação atual terminar."""
+    transaction.on_commit(_bump)
+
+
+def _count(resultado):
+    with _stats_lock:
+        _stats[resultado] += 1
+
+
+def get_availability(key):
+    valor = cache.get(key, version=availability_version())
+    _count('misses' if valor is None else 'hits')
+    return valor
+
+
+def set_availability(key, valor):
+    cache.set(key, valor, timeout=settings.AVAILABILITY_CACHE_TIMEOUT, version=availability_version())
+
+
+def cache_stats():
+    """Contadores de acertos e falhas do cache de disponibilidade deste processo."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,39 @@
+"""
+Escritas que toleram o banco travado por outro processo.
+
+No SQLite só uma conexão escreve por vez. O busy_timeout (settings.SQLITE_PRAGMAS)
+já faz cada comando esperar pelo lock; retry_on_locked repete a operação inteira,
+com espera exponencial, quando mesmo assim o banco responde "database is locked".
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+
+def is_locked_error(error):
+    mensagem = str(error).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
+def retry_on_locked(func):
+    """
+    Repete func até settings.DB_WRITE_RETRIES vezes se o banco estiver travado.
+
+    func deve ser segura para repetir: a escrita que falhou foi desfeita. Dentro de uma
+    transação aberta por quem chamou não há nova tentativa, pois a transação toda falhou.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tentativas = settings.DB_WRITE_RETRIES
+        for tentativa in range(tentativas + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if tentativa == tentativas or connection.in_atomic_block or not is_locked_error(error):
+                    raise
+                time.sleep(settings.DB_WRITE_RETRY_DELAY * 2 ** tentativa * random.uniform(0.5, 1.5))
+
+    return wrapper
@@ -0,0 +1,99 @@
+"""
+Eventos de disponibilidade enviados aos moradores por Server-Sent Events.
+
+O hub em memória distribui cada evento para as conexões abertas neste processo.
+Cada conexão é só uma fila asyncio, então milhares de conexões ociosas custam
+pouco. Com LAVANDERIA_EVENT_HUB=redis, os eventos passam por um canal pub/sub do
+Redis e chegam também às conexões dos outros workers.
+"""
+import asyncio
+import contextlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+# Eventos pendentes por conexão; uma conexão lenta perde os mais antigos
+MAX_QUEUE = 100
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self):
+        """Nova fila, no loop atual, que recebe os eventos publicados até unsubscribe()."""
+        queue = asyncio.Queue(maxsize=MAX_QUEUE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def connections(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        """Entrega o evento às conexões deste processo. Pode ser chamado de qualquer thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            with contextlib.suppress(RuntimeError):  # loop já encerrado
+                loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue, event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+class RedisEventHub(EventHub):
+    """Hub que usa um canal do Redis para distribuir os eventos entre processos."""
+    channel = 'lavanderia:eventos'
+
+    def __init__(self, url):
+        import redis
+
+        super().__init__()
+        self._url = url
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self):
+        # Um único ouvinte por processo repassa as mensagens do canal ao hub local
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return super().subscribe()
+
+    async def _listen(self):
+        import redis.asyncio
+
+        async with redis.asyncio.Redis.from_url(self._url) as client:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        super().publish(json.loads(message['data']))
+
+    def publish(self, event):
+        self._redis.publish(self.channel, json.dumps(event))
+
+
+def _create_hub():
+    if settings.EVENT_HUB == 'redis':
+        return RedisEventHub(settings.EVENT_HUB_LOCATION)
+    return EventHub()
+
+
+hub = _create_hub()
+
+
+def publish_on_commit(event_type, **data):
+    """Publica o evento quando a transação atual for confirmada."""
+    transaction.on_commit(lambda: hub.publish({'type': event_type, **data}))
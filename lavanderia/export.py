@@ -0,0 +1,65 @@
+"""
+Exportação das reservas (com horário, lavadora e morador) em CSV ou JSON Lines.
+
+As linhas são lidas com QuerySet.iterator() e escritas uma a uma em um gerador,
+então a memória usada não depende do tamanho do período exportado e o
+cabeçalho é enviado antes mesmo da consulta ser executada.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from lavanderia.archive import reservation_history
+
+CHUNK_SIZE = 2000
+
+FIELDS = {
+    'id': 'id',
+    'inicio': 'slot__start',
+    'fim': 'slot__end',
+    'lavadora': 'slot__washer__name',
+    'usuario': 'user__username',
+    'matricula': 'user__matricula',
+    'apartamento': 'user__apartamento',
+    'presenca': 'presence',
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def reservation_rows(start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Dicionários com os campos de FIELDS para as reservas (inclusive arquivadas) cujo horário começa em [start, end)."""
+    linhas = reservation_history(FIELDS.values(), start, end)
+    for linha in linhas.iterator(chunk_size=chunk_size):
+        yield {coluna: linha[campo] for coluna, campo in FIELDS.items()}
+
+
+class Echo:
+    """Arquivo falso cujo write() devolve o texto, para usar csv.writer em um gerador."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value for value in row.values()
+        ])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(rows, formato):
+    if formato == 'jsonl':
+        return jsonl_lines(rows)
+    return csv_lines(rows)
@@ -1,9 +1,14 @@
 from datetime import timedelta
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+from django.utils import timezone
 
-from lavanderia.models import Washer, AvaibleSlot, ReservedSlot, LavanderiaUser
+from lavanderia.booking import HORIZONTE_DIAS
+from lavanderia.lottery import MAX_PREFERENCIAS
+from lavanderia.models import Washer, AvaibleSlot, ReservedSlot, LavanderiaUser, LotteryRound
 
 
 class WasherForm(forms.ModelForm):
@@ -66,12 +71,10 @@ class AvaibleSlotForm(forms.ModelForm):
             end_time = start + duration
 
             # Verifica se há algum slot existente que sobrepõe o novo slot
+            # (começa antes do fim do novo e termina depois do início dele)
             overlapping_slots = AvaibleSlot.objects.filter(
-                washer=washer,
-                start__lt=end_time,  # Início de um slot já registrado antes do fim do novo slot
-                start__gte=start - timedelta(seconds=1)
-                # O início do slot já registrado ocorre após o início do novo slot
-            )
+                washer=washer
+            ).overlapping(start, end_time).exclude(pk=self.instance.pk)
 
             if overlapping_slots.exists():
                 raise ValidationError(
@@ -83,17 +86,54 @@ class AvaibleSlotForm(forms.ModelForm):
 
 
 
+def slot_label(slot):
+    return f"{timezone.localtime(slot.start):%d/%m/%Y %H:%M} - {slot.washer.name}"
+
+
+class SlotPickerWidget(forms.Select):
+    """
+    Seleção de horário que não carrega todos os horários: só a opção escolhida é
+    renderizada, e o script da página busca as demais em `url` (data-url), filtradas
+    por data e lavadora.
+    """
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        escolhidos = [valor for valor in value if str(valor).isdigit()]
+        opcoes = [self.create_option(name, '', '---------', not escolhidos, 0)]
+        for slot in AvaibleSlot.objects.filter(pk__in=escolhidos).select_related('washer'):
+            opcoes.append(self.create_option(name, slot.pk, slot_label(slot), True, len(opcoes)))
+        return [(None, opcoes, 0)]
+
+
 class ReservedSlotForm(forms.ModelForm):
-    # Cria um campo de seleção (drop-down) para os slots disponíveis
+    # O usuário é informado pelo login, validado por uma busca no índice único de username
+    user = forms.ModelChoiceField(
+        queryset=LavanderiaUser.objects.all(),
+        to_field_name='username',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+        label="Usuário (login)",
+    )
+    # As opções vêm de slot_autocomplete; a queryset só é usada para validar o id escolhido
     slot = forms.ModelChoiceField(
-        queryset=AvaibleSlot.objects.all(),  # Obtém todos os slots disponíveis
-        widget=forms.Select(attrs={'class': 'form-control'}),  # Personaliza o widget, se necessário
-        label="Available Slot"  # Rotulo para o campo
+        queryset=AvaibleSlot.objects.all(),
+        widget=SlotPickerWidget(url=reverse_lazy('slot_autocomplete'), attrs={'class': 'form-control'}),
+        label="Horário",
+        # Mensagem da restrição de unicidade em ReservedSlot.slot, verificada na validação do modelo
+        error_messages={'unique': "Horário já agendado"},
     )
 
     class Meta:
         model = ReservedSlot
-        fields = ['slot', 'presence']  # Exibe os campos 'slot' e 'presence'
+        fields = ['user', 'slot', 'presence']  # Exibe os campos 'user', 'slot' e 'presence'
 
     presence = forms.BooleanField(
         required=False,
@@ -132,3 +172,192 @@ class LavanderiaUserForm(forms.ModelForm):
             'apartamento': 'Apartamento',
             'telefone': 'Telefone',
         }
+
+
+DIAS_DA_SEMANA = [
+    (0, 'Segunda'),
+    (1, 'Terça'),
+    (2, 'Quarta'),
+    (3, 'Quinta'),
+    (4, 'Sexta'),
+    (5, 'Sábado'),
+    (6, 'Domingo'),
+]
+
+
+# Formulário para gerar vários horários a partir de um modelo de agenda
+class SlotScheduleForm(forms.Form):
+    washers = forms.ModelMultipleChoiceField(
+        queryset=Washer.objects.order_by('name'),
+        widget=forms.CheckboxSelectMultiple,
+        label='Lavadoras'
+    )
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=DIAS_DA_SEMANA,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+        label='Dias da semana'
+    )
+    opening = forms.TimeField(
+        widget=forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+        label='Abertura'
+    )
+    closing = forms.TimeField(
+        widget=forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+        label='Fechamento'
+    )
+    duration = forms.DurationField(
+        widget=forms.TextInput(attrs={'placeholder': 'HH:MM:SS', 'class': 'form-control'}),
+        validators=[validate_positive_duration],
+        label='Duração'
+    )
+    first_day = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='De'
+    )
+    last_day = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='Até'
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        opening = cleaned_data.get('opening')
+        closing = cleaned_data.get('closing')
+        duration = cleaned_data.get('duration')
+        first_day = cleaned_data.get('first_day')
+        last_day = cleaned_data.get('last_day')
+
+        if duration is not None and duration <= timedelta(seconds=0):
+            raise ValidationError("A duração deve ser maior que zero.")
+        if opening and closing and closing <= opening:
+            raise ValidationError("O fechamento deve ser depois da abertura.")
+        if first_day and last_day and last_day < first_day:
+            raise ValidationError("A data final deve ser igual ou posterior à data inicial.")
+
+        return cleaned_data
+
+
+# Formulário para escolher um período
+class PeriodForm(forms.Form):
+    inicio = forms.DateField(
+        label='De',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False
+    )
+    fim = forms.DateField(
+        label='Até',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False
+    )
+
+
+# Formulário para exportar as reservas de um período
+class ExportForm(PeriodForm):
+    formato = forms.ChoiceField(
+        label='Formato',
+        choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')],
+        required=False
+    )
+
+
+# Formulário para consultar o histórico de reservas (inclusive arquivadas)
+class HistoryForm(PeriodForm):
+    usuario = forms.CharField(label='Usuário', max_length=150, required=False)
+
+
+# Uma linha do CSV de cadastro em lote; os usernames e matrículas já cadastrados são
+# verificados de uma vez para todo o lote (provisioning.import_users)
+class UserImportRowForm(forms.ModelForm):
+    class Meta:
+        model = LavanderiaUser
+        fields = ['username', 'matricula', 'apartamento', 'telefone', 'email']
+
+    def validate_unique(self):
+        pass
+
+
+# Formulário para enviar o CSV de cadastro em lote
+class UserImportForm(forms.Form):
+    arquivo = forms.FileField(
+        label='Arquivo CSV',
+        help_text='Colunas: username, matricula, apartamento, telefone, email e, opcionalmente, senha.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if arquivo.size > settings.USER_IMPORT_MAX_BYTES:
+            raise ValidationError(
+                f"O arquivo passa de {settings.USER_IMPORT_MAX_BYTES // 1024} KiB; "
+                "use o comando import_users para arquivos maiores.")
+        return arquivo
+
+
+# Formulário para abrir um sorteio dos horários de uma janela
+class LotteryRoundForm(forms.ModelForm):
+    class Meta:
+        model = LotteryRound
+        fields = ['start', 'end', 'closes_at']
+        widgets = {
+            'start': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+            'end': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+            'closes_at': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+        }
+        labels = {
+            'start': 'Horários a partir de',
+            'end': 'Até',
+            'closes_at': 'Inscrições até',
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        closes_at = cleaned_data.get('closes_at')
+
+        if start and end and end <= start:
+            raise ValidationError("O fim da janela deve ser depois do início.")
+        if start and closes_at and closes_at >= start:
+            raise ValidationError("As inscrições devem terminar antes do primeiro horário da janela.")
+        if end and closes_at and (end.date() - closes_at.date()).days > HORIZONTE_DIAS:
+            raise ValidationError(f"A janela deve terminar até {HORIZONTE_DIAS} dias depois das inscrições.")
+        if start and end:
+            sobrepostas = LotteryRound.objects.filter(status=LotteryRound.OPEN, start__lt=end, end__gt=start)
+            if self.instance.pk:
+                sobrepostas = sobrepostas.exclude(pk=self.instance.pk)
+            if sobrepostas.exists():
+                raise ValidationError("Já existe um sorteio aberto para parte dessa janela.")
+
+        return cleaned_data
+
+
+# Preferências de um morador em um sorteio: um campo de ordem (1 é o preferido) por horário
+class LotteryPreferenceForm(forms.Form):
+    def __init__(self, slots, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slots = list(slots)
+        for slot in self.slots:
+            self.fields[f'slot_{slot.id}'] = forms.IntegerField(
+                min_value=1,
+                max_value=MAX_PREFERENCIAS,
+                required=False,
+                label=slot_label(slot),
+                widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm'}),
+            )
+
+    def rows(self):
+        """Pares (horário, campo) para o template."""
+        return [(slot, self[f'slot_{slot.id}']) for slot in self.slots]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        escolhidos = {
+            slot.id: cleaned_data[f'slot_{slot.id}'] for slot in self.slots
+            if cleaned_data.get(f'slot_{slot.id}') is not None
+        }
+        if len(set(escolhidos.values())) != len(escolhidos):
+            raise ValidationError("Use cada número de preferência uma única vez.")
+        # Ids dos horários, do preferido ao último
+        cleaned_data['slot_ids'] = sorted(escolhidos, key=escolhidos.get)
+        return cleaned_data
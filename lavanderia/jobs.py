@@ -0,0 +1,181 @@
+"""
+Fila de tarefas em segundo plano guardada no banco (modelo Job), sem broker externo.
+
+enqueue() cria uma tarefa com uma chave de idempotência: uma chave que já existe não
+gera outra tarefa. O comando run_jobs mantém um Worker, que a cada rodada enfileira as
+tarefas periódicas da janela de tempo atual (a chave inclui o início da janela, então
+cada uma roda uma vez por janela mesmo com vários workers) e reserva as tarefas vencidas
+com um UPDATE condicional, executando no máximo JOB_CONCURRENCY ao mesmo tempo.
+
+Uma tarefa que falha volta para a fila com espera exponencial, até JOB_MAX_ATTEMPTS
+tentativas; como as tarefas são idempotentes (lavanderia/tasks.py), repeti-las não
+duplica o efeito. Se o worker morrer, a tarefa é retomada por outro depois de
+JOB_LEASE_SECONDS; as tarefas renovam essa reserva entre os lotes (tasks.renew_lease).
+Itens processados e duração de cada execução ficam no Job e são registrados no logger
+lavanderia.jobs (vazão) e expostos por job_stats().
+"""
+import datetime
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from lavanderia.db import retry_on_locked
+from lavanderia.models import Job
+from lavanderia.tasks import TASKS, LeaseLost, periodic_tasks
+
+logger = logging.getLogger('lavanderia.jobs')
+
+# Origem das janelas das tarefas periódicas (as janelas diárias começam à meia-noite UTC)
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def enqueue(kind, key, run_at=None, payload=None):
+    """Enfileira a tarefa, a menos que já exista uma com a mesma chave. Retorna se ela foi criada."""
+    if kind not in TASKS:
+        raise ValueError(f"Tarefa desconhecida: {kind}")
+    try:
+        with transaction.atomic():
+            Job.objects.create(kind=kind, key=key, run_at=run_at or timezone.now(), payload=payload or {})
+    except IntegrityError:
+        return False
+    return True
+
+
+def window_start(agora, intervalo):
+    return agora - (agora - EPOCH) % intervalo
+
+
+def schedule_periodic(agora=None):
+    """Enfileira as tarefas periódicas da janela atual que ainda não existem. Retorna quantas."""
+    agora = agora or timezone.now()
+    janelas = {}
+    for kind, intervalo in periodic_tasks().items():
+        janela = window_start(agora, intervalo)
+        janelas[f"{kind}:{janela.isoformat()}"] = (kind, janela)
+    # Na maioria das rodadas todas já existem: uma consulta, nenhuma escrita
+    existentes = set(Job.objects.filter(key__in=janelas).values_list('key', flat=True))
+    return sum(
+        enqueue(kind, key, janela, {'janela': janela.isoformat()})
+        for key, (kind, janela) in janelas.items() if key not in existentes
+    )
+
+
+@retry_on_locked
+def _update(job, **campos):
+    # Só grava se a tarefa ainda é desta tentativa (não foi retomada por outro worker)
+    Job.objects.filter(id=job.id, attempts=job.attempts).update(**campos)
+
+
+@retry_on_locked
+def claim(limite, agora=None):
+    """Reserva até limite tarefas vencidas (ou abandonadas) para este worker."""
+    agora = agora or timezone.now()
+    disponiveis = Q(status=Job.PENDING, run_at__lte=agora) | Q(status=Job.RUNNING, locked_until__lt=agora)
+    ids = list(Job.objects.filter(disponiveis).order_by('run_at').values_list('id', flat=True)[:limite])
+    reservadas = [
+        # UPDATE condicional: se outro worker reservou a tarefa antes, nenhuma linha muda
+        id_ for id_ in ids
+        if Job.objects.filter(disponiveis, id=id_).update(
+            status=Job.RUNNING,
+            locked_until=agora + datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+    ]
+    return list(Job.objects.filter(id__in=reservadas).order_by('run_at'))
+
+
+def execute(job):
+    """Executa uma tarefa reservada e registra o resultado. Retorna o status final."""
+    inicio = time.perf_counter()
+    processados = 0
+    try:
+        if job.attempts > settings.JOB_MAX_ATTEMPTS:
+            # Retomada depois de o worker morrer em todas as tentativas
+            raise RuntimeError("Tarefa abandonada em todas as tentativas.")
+        processados = TASKS[job.kind](job) or 0
+    except LeaseLost:
+        # O resultado fica a cargo do worker que retomou a tarefa
+        segundos = time.perf_counter() - inicio
+        status = Job.RUNNING
+        logger.warning("Tarefa %s (%s) retomada por outro worker na tentativa %s", job.id, job.kind, job.attempts)
+    except Exception:
+        segundos = time.perf_counter() - inicio
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            status, campos = Job.FAILED, {'finished_at': timezone.now()}
+        else:
+            espera = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            status, campos = Job.PENDING, {'run_at': timezone.now() + datetime.timedelta(seconds=espera)}
+        _update(job, status=status, locked_until=None, seconds=segundos,
+                last_error=traceback.format_exc()[-4000:], **campos)
+        logger.exception("Falha na tarefa %s (%s), tentativa %s", job.id, job.kind, job.attempts)
+    else:
+        segundos = time.perf_counter() - inicio
+        status = Job.DONE
+        _update(job, status=status, locked_until=None, processed=processados, seconds=segundos,
+                finished_at=timezone.now())
+    finally:
+        # Cada thread do pool tem a própria conexão
+        connection.close()
+
+    logger.info(json.dumps({
+        'job': job.id,
+        'kind': job.kind,
+        'status': status,
+        'attempt': job.attempts,
+        'items': processados,
+        'seconds': round(segundos, 3),
+        'items_per_s': round(processados / segundos, 1) if segundos else None,
+    }, ensure_ascii=False))
+    return status
+
+
+class Worker:
+    """Executa as tarefas da fila em até concurrency threads."""
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='lavanderia-job')
+        self.running = set()
+
+    def tick(self):
+        """Enfileira as tarefas periódicas e inicia tarefas vencidas nas threads livres. Retorna quantas."""
+        self.running = {future for future in self.running if not future.done()}
+        livres = self.concurrency - len(self.running)
+        if livres <= 0:
+            return 0
+        close_old_connections()
+        schedule_periodic()
+        jobs = claim(livres)
+        self.running |= {self.executor.submit(execute, job) for job in jobs}
+        return len(jobs)
+
+    def wait(self, timeout):
+        """Espera uma tarefa terminar ou o tempo acabar."""
+        if self.running:
+            wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(timeout)
+
+    def run_until_idle(self):
+        """Executa tarefas até a fila não ter nenhuma vencida (usado por run_jobs --once)."""
+        while self.tick() or self.running:
+            self.wait(None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def job_stats():
+    """Tarefas guardadas por tipo e status, com itens processados e tempo total de execução."""
+    return list(
+        Job.objects.values('kind', 'status')
+        .annotate(jobs=Count('id'), processed=Sum('processed'), seconds=Sum('seconds'))
+        .order_by('kind', 'status')
+    )
@@ -0,0 +1,224 @@
+"""
+Distribuição por sorteio dos horários de uma janela, alternativa ao primeiro que chegar.
+
+Durante as inscrições de uma LotteryRound os horários da janela não podem ser agendados;
+cada morador envia até MAX_PREFERENCIAS horários em ordem de preferência. Depois de
+closes_at, draw_round() distribui todos os horários em um único lote:
+
+1. As regras de schedule_slot valem para todos os inscritos, calculadas com duas
+   agregações: bloqueados por faltas ficam de fora e cada morador recebe no máximo
+   LIMITE_AGENDAMENTOS menos os agendamentos futuros que já tem.
+2. A ordem dos moradores é sorteada com peso pela assiduidade recente: chave
+   random() ** (1 / peso) (Efraimidis-Spirakis), com peso (presenças + 1) / (reservas + 1)
+   nos últimos JANELA_ASSIDUIDADE.
+3. Ditadura serial nessa ordem, em passadas: na primeira cada morador recebe o horário
+   livre que mais prefere, na segunda o segundo, até a capacidade de cada um.
+4. Uma passada de caminhos aumentantes (Kuhn) no grafo morador-horário dá horários a
+   quem ficou sem, trocando outros moradores para horários que eles também escolheram,
+   sem tirar horário de ninguém.
+
+O resultado é gravado com bulk_create, em uma transação.
+"""
+import datetime
+import random
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from lavanderia.analytics import mark_dirty, slot_day
+from lavanderia.booking import JANELA_FALTAS, LIMITE_AGENDAMENTOS, LIMITE_FALTAS, unreserved_slots
+from lavanderia.cache import bump_availability_version
+from lavanderia.events import publish_on_commit
+from lavanderia.models import BookingEligibility, LavanderiaUser, LotteryPreference, LotteryRound, ReservedSlot
+from lavanderia.notifications import get_notifier
+
+MAX_PREFERENCIAS = 5
+JANELA_ASSIDUIDADE = datetime.timedelta(days=60)
+
+
+def save_preferences(rodada, user, slot_ids):
+    """Substitui as preferências do morador no sorteio pelos horários em slot_ids, em ordem."""
+    with transaction.atomic():
+        LotteryPreference.objects.filter(round=rodada, user=user).delete()
+        LotteryPreference.objects.bulk_create(
+            LotteryPreference(round=rodada, user=user, slot_id=slot_id, rank=rank)
+            for rank, slot_id in enumerate(slot_ids, start=1)
+        )
+
+
+def _augment(raiz, preferencias, dono, recebidos, mortos):
+    """
+    Procura um caminho aumentante a partir de raiz (busca em profundidade iterativa) e o
+    aplica: raiz recebe um horário e cada morador do caminho troca o seu por outro que
+    também escolheu. Horários de buscas que falharam ficam em mortos até a próxima troca.
+    """
+    pilha = [(raiz, iter(preferencias[raiz]))]
+    na_pilha = {raiz}
+    caminho = []  # caminho[i]: horário que o morador pilha[i] vai receber
+    while pilha:
+        usuario, opcoes = pilha[-1]
+        for slot in opcoes:
+            if slot in mortos or slot in recebidos[usuario] or dono.get(slot) in na_pilha:
+                continue
+            mortos.add(slot)
+            caminho.append(slot)
+            atual = dono.get(slot)
+            if atual is None:
+                for i, (morador, _) in enumerate(pilha):
+                    if i:
+                        recebidos[morador].discard(caminho[i - 1])
+                    recebidos[morador].add(caminho[i])
+                    dono[caminho[i]] = morador
+                return True
+            pilha.append((atual, iter(preferencias[atual])))
+            na_pilha.add(atual)
+            break
+        else:
+            pilha.pop()
+            na_pilha.discard(usuario)
+            if caminho:
+                caminho.pop()
+    return False
+
+
+def allocate(preferencias, capacidade, pesos, rng):
+    """
+    Distribui os horários. preferencias: {morador: [horários, do preferido ao último]};
+    capacidade e pesos: {morador: número}. Retorna {horário: morador}.
+    """
+    ordem = sorted(
+        (usuario for usuario in preferencias if capacidade.get(usuario, 0) > 0),
+        key=lambda usuario: rng.random() ** (1 / pesos[usuario]),
+        reverse=True,
+    )
+    dono = {}
+    recebidos = {usuario: set() for usuario in ordem}
+
+    for passada in range(max((capacidade[usuario] for usuario in ordem), default=0)):
+        for usuario in ordem:
+            # Quem não recebeu nada numa passada não tem mais horário livre entre os escolhidos
+            if passada < capacidade[usuario] and len(recebidos[usuario]) == passada:
+                slot = next((slot for slot in preferencias[usuario] if slot not in dono), None)
+                if slot is not None:
+                    dono[slot] = usuario
+                    recebidos[usuario].add(slot)
+
+    mortos = set()
+    for usuario in ordem:
+        while len(recebidos[usuario]) < capacidade[usuario]:
+            if not _augment(usuario, preferencias, dono, recebidos, mortos):
+                break
+            mortos = set()
+    return dono
+
+
+def _user_data(rodada, agora):
+    """Capacidade e peso de cada inscrito, com as regras de schedule_slot."""
+    inscritos = LotteryPreference.objects.filter(round=rodada).values('user_id')
+    reservas = ReservedSlot.objects.filter(user_id__in=inscritos)
+    futuros = dict(reservas.filter(slot__start__gte=agora).values('user_id')
+                   .annotate(total=Count('id')).values_list('user_id', 'total'))
+    historico = {
+        linha['user_id']: linha
+        for linha in reservas.filter(slot__start__gte=agora - max(JANELA_ASSIDUIDADE, JANELA_FALTAS),
+                                     slot__start__lt=agora)
+        .values('user_id').annotate(
+            total=Count('id', filter=Q(slot__start__gte=agora - JANELA_ASSIDUIDADE)),
+            presencas=Count('id', filter=Q(slot__start__gte=agora - JANELA_ASSIDUIDADE, presence=True)),
+            faltas=Count('id', filter=Q(slot__start__gte=agora - JANELA_FALTAS, presence=False)),
+        )
+    }
+
+    capacidade, pesos = {}, {}
+    for user_id in set(inscritos.values_list('user_id', flat=True)):
+        linha = historico.get(user_id, {'total': 0, 'presencas': 0, 'faltas': 0})
+        bloqueado = linha['faltas'] >= LIMITE_FALTAS
+        capacidade[user_id] = 0 if bloqueado else max(LIMITE_AGENDAMENTOS - futuros.get(user_id, 0), 0)
+        pesos[user_id] = (linha['presencas'] + 1) / (linha['total'] + 1)
+    return capacidade, pesos
+
+
+def _notify(alocacao, inicios, inscritos):
+    recebidos = defaultdict(list)
+    for slot, user_id in alocacao.items():
+        recebidos[user_id].append(inicios[slot])
+    mensagens = []
+    for usuario in LavanderiaUser.objects.filter(id__in=inscritos).only('username', 'email'):
+        if recebidos[usuario.id]:
+            horarios = ", ".join(f"{timezone.localtime(inicio):%d/%m às %H:%M}"
+                                 for inicio in sorted(recebidos[usuario.id]))
+            mensagens.append((usuario, "Resultado do sorteio", f"Você recebeu os horários: {horarios}."))
+        else:
+            mensagens.append((usuario, "Resultado do sorteio",
+                              "Você não recebeu horários neste sorteio. Os horários restantes podem ser agendados."))
+    get_notifier().send_messages(mensagens)
+
+
+def draw_round(rodada_id, seed=None):
+    """
+    Sorteia a rodada e grava as reservas. Retorna as estatísticas do sorteio, ou None se
+    a rodada já foi sorteada (por outro worker, por exemplo).
+    """
+    inicio = time.perf_counter()
+    agora = timezone.now()
+    seed = random.SystemRandom().randrange(2 ** 62) if seed is None else seed
+
+    with transaction.atomic():
+        # UPDATE condicional: cada rodada é sorteada uma única vez
+        if not LotteryRound.objects.filter(id=rodada_id, status=LotteryRound.OPEN).update(
+                status=LotteryRound.DRAWN, drawn_at=agora, seed=seed):
+            return None
+        rodada = LotteryRound.objects.get(id=rodada_id)
+
+        livres = {
+            slot_id: start for slot_id, start in
+            unreserved_slots(max(rodada.start, agora), rodada.end).values_list('id', 'start')
+        }
+        preferencias = defaultdict(list)
+        for user_id, slot_id in rodada.preferences.order_by('user_id', 'rank').values_list('user_id', 'slot_id'):
+            if slot_id in livres:
+                preferencias[user_id].append(slot_id)
+        capacidade, pesos = _user_data(rodada, agora)
+
+        alocacao = allocate(preferencias, capacidade, pesos, random.Random(seed))
+
+        ReservedSlot.objects.bulk_create(
+            (ReservedSlot(slot_id=slot_id, user_id=user_id) for slot_id, user_id in alocacao.items()),
+            batch_size=1000,
+        )
+        # bulk_create não envia post_save: a elegibilidade dos inscritos é recalculada
+        # no próximo acesso, e a lista de horários e os agregados são invalidados
+        inscritos = rodada.preferences.values('user_id')
+        BookingEligibility.objects.filter(user_id__in=inscritos).delete()
+        bump_availability_version()
+        publish_on_commit('slots-booked', slots=list(alocacao))
+        mark_dirty(*{slot_day(livres[slot_id]) for slot_id in alocacao})
+        transaction.on_commit(lambda: _notify(alocacao, livres, inscritos), robust=True)
+
+    primeira_opcao = sum(1 for slot_id, user_id in alocacao.items() if preferencias[user_id][0] == slot_id)
+    return {
+        'inscritos': len(capacidade),
+        'horarios': len(livres),
+        'alocados': len(alocacao),
+        'atendidos': len(set(alocacao.values())),
+        'primeira_opcao': primeira_opcao,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def due_rounds():
+    """Rodadas com inscrições encerradas que ainda não foram sorteadas."""
+    return LotteryRound.objects.filter(status=LotteryRound.OPEN, closes_at__lte=timezone.now())
+
+
+def draw_due_rounds():
+    """Sorteia as rodadas com inscrições encerradas. Retorna quantos horários foram distribuídos."""
+    total = 0
+    for rodada_id in due_rounds().values_list('id', flat=True):
+        resultado = draw_round(rodada_id)
+        if resultado:
+            total += resultado['alocados']
+    return total
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lavanderia.analytics import aggregate_usage
+
+
+class Command(BaseCommand):
+    help = ("Atualiza os agregados diários de uso das lavadoras e de faltas por apartamento, "
+            "processando apenas os dias alterados desde a última execução.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recalcula todos os dias")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        dias = aggregate_usage(everything=options['all'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{dias} dias agregados em {time.perf_counter() - inicio:.2f}s."
+        ))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lavanderia.archive import BATCH_SIZE, archive_old_slots
+
+
+class Command(BaseCommand):
+    help = ("Move horários e reservas antigos para as tabelas de arquivo, "
+            "agregando antes as estatísticas desses dias.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Arquiva horários que começaram há mais que esse número de dias")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            total = archive_old_slots(options['dias'], options['batch_size'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} horários arquivados em {time.perf_counter() - inicio:.2f}s."
+        ))
@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from lavanderia.management.seed import seed_database, test_databases
+
+
+class Command(BaseCommand):
+    help = ("Mede o custo de abrir uma conexão com o banco por requisição: atende a mesma rota "
+            "pelo handler WSGI (com os sinais de início e fim de requisição, como em produção) "
+            "com CONN_MAX_AGE = 0 e com a configuração atual.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=500)
+        parser.add_argument('--path', default='/api/horarios/')
+
+    def handle(self, *args, **options):
+        configurado = connection.settings_dict['CONN_MAX_AGE']
+        opcoes = connection.settings_dict['OPTIONS']
+        sem_pool = {nome: valor for nome, valor in opcoes.items() if nome != 'pool'}
+        modos = [('sem reuso (CONN_MAX_AGE=0)', 0, sem_pool)]
+        if 'pool' in opcoes:
+            modos.append(('pool do PostgreSQL', 0, opcoes))
+        else:
+            modos.append((f'persistente (CONN_MAX_AGE={configurado or 60})', configurado or 60, opcoes))
+
+        with test_databases():
+            seed_database(washers=4, dias=15, dias_futuros=15, usuarios=50)
+            environ = RequestFactory().get(options['path']).environ
+            handler = WSGIHandler()
+
+            self.stdout.write(f"{'modo':<36}{'conexões':>10}{'média ms':>10}{'p95 ms':>9}")
+            try:
+                for modo, max_age, opcoes_modo in modos:
+                    connection.close()
+                    connection.settings_dict['CONN_MAX_AGE'] = max_age
+                    connection.settings_dict['OPTIONS'] = opcoes_modo
+                    tempos, conexoes = self.run(handler, environ, options['requisicoes'])
+                    self.stdout.write(
+                        f"{modo:<36}{conexoes:>10}{statistics.mean(tempos):>10.2f}"
+                        f"{statistics.quantiles(tempos, n=20)[-1]:>9.2f}"
+                    )
+            finally:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = configurado
+                connection.settings_dict['OPTIONS'] = opcoes
+
+    def run(self, handler, environ, requisicoes):
+        conexoes = []
+
+        def contar(sender, connection, **kwargs):
+            conexoes.append(connection)
+
+        connection_created.connect(contar)
+        tempos = []
+        try:
+            for _ in range(requisicoes):
+                # Sem cache, toda requisição chega ao banco
+                cache.clear()
+                inicio = time.perf_counter()
+                response = handler(dict(environ), lambda status, headers: None)
+                response.close()  # Dispara request_finished, que fecha ou mantém a conexão
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connection_created.disconnect(contar)
+        return tempos, len(conexoes)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lavanderia.benchmark.report import compare, load, save, summarize
+from lavanderia.benchmark.simulation import run_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Simula moradores e bolsistas concorrentes em um banco descartável e mede vazão, "
+            "latência (p50/p95/p99) e consultas por requisição das rotas do agendamento. "
+            "Com --comparar, falha se alguma rota piorar além da tolerância.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--washers', type=int, default=8)
+        parser.add_argument('--usuarios', type=int, default=300)
+        parser.add_argument('--semanas', type=int, default=4, help="Semanas de horários cadastrados")
+        parser.add_argument('--ocupacao', type=float, default=0.6, help="Fração dos horários já reservada")
+        parser.add_argument('--moradores', type=int, default=8, help="Moradores simultâneos")
+        parser.add_argument('--bolsistas', type=int, default=2, help="Bolsistas simultâneos")
+        parser.add_argument('--iteracoes', type=int, default=20, help="Ciclos de cada usuário simulado")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--saida', help="Arquivo JSON onde gravar o resultado")
+        parser.add_argument('--comparar', help="Resultado JSON anterior usado como referência")
+        parser.add_argument('--tolerancia', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        parametros = {nome: options[nome] for nome in (
+            'washers', 'usuarios', 'semanas', 'ocupacao', 'moradores', 'bolsistas', 'iteracoes', 'seed')}
+        if parametros['moradores'] > parametros['usuarios']:
+            raise CommandError("--moradores não pode ser maior que --usuarios.")
+
+        amostras, segundos = run_benchmark(**parametros)
+        resultado = summarize(amostras, segundos)
+        resultado['parametros'] = parametros
+
+        self.stdout.write(f"{'rota':<20}{'req':>6}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'consultas':>11}")
+        for rota, medidas in resultado['rotas'].items():
+            self.stdout.write(
+                f"{rota:<20}{medidas['requisicoes']:>6}{medidas['vazao']:>8}{medidas['p50_ms']:>8}"
+                f"{medidas['p95_ms']:>8}{medidas['p99_ms']:>8}{medidas['consultas']:>11}"
+            )
+        self.stdout.write(f"Total: {resultado['vazao']} req/s em {resultado['duracao_s']}s")
+
+        if options['saida']:
+            save(resultado, options['saida'])
+        if options['comparar']:
+            regressoes = compare(resultado, load(options['comparar']), options['tolerancia'])
+            if regressoes:
+                raise CommandError("Regressões em relação a " + options['comparar'] + ":\n" + "\n".join(regressoes))
+            self.stdout.write(self.style.SUCCESS("Sem regressões."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from lavanderia.benchmark.availability import run_cache_benchmark, run_growth_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Mede a lista pública de horários em bancos descartáveis: o tempo sem cache com históricos "
+            "de reservas de tamanhos diferentes e a vazão com e sem o cache de disponibilidade.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help="Reservas no histórico em cada medida de crescimento")
+        parser.add_argument('--requisicoes', type=int, default=2000, help="Requisições em cada medida de vazão")
+        parser.add_argument('--agendar-a-cada', type=int, default=20,
+                            help="Na medida com agendamentos, um agendamento a cada N requisições")
+        parser.add_argument('--so-cache', action='store_true', help="Pula a medida de crescimento")
+
+    def handle(self, *args, **options):
+        if not options['so_cache']:
+            self.stdout.write(f"{'reservas':>10}{'mediana ms':>12}{'p99 ms':>10}{'consultas':>11}")
+            for medida in run_growth_benchmark(options['tamanhos']):
+                self.stdout.write(f"{medida['reservas']:>10}{medida['mediana_ms']:>12}{medida['p99_ms']:>10}"
+                                  f"{medida['consultas']:>11}")
+            self.stdout.write("")
+
+        resultados = run_cache_benchmark(options['requisicoes'], options['agendar_a_cada'])
+        self.stdout.write(f"{'':<34}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'consultas':>11}{'agendamentos':>14}")
+        for nome, medida in resultados.items():
+            self.stdout.write(f"{nome:<34}{medida['vazao']:>8}{medida['p50_ms']:>9}{medida['p99_ms']:>9}"
+                              f"{medida['consultas']:>11}{medida['agendamentos']:>14}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from lavanderia.benchmark.events import run_events_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Sobe um worker uvicorn em um banco descartável, abre várias conexões ao fluxo de "
+            "eventos e mede a memória por conexão e o tempo de entrega de cada agendamento.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexoes', type=int, default=1000, help="Conexões SSE abertas no worker")
+        parser.add_argument('--eventos', type=int, default=20, help="Agendamentos feitos com as conexões abertas")
+
+    def handle(self, *args, **options):
+        resultado = run_events_benchmark(options['conexoes'], options['eventos'])
+        self.stdout.write(
+            f"{resultado['conexoes']} conexões abertas em {resultado['conexao_s']}s, "
+            f"{resultado['memoria_kib_por_conexao']} KiB por conexão no worker"
+        )
+        self.stdout.write(
+            f"{resultado['eventos']} agendamentos (p50 {resultado['agendamento_p50_ms']} ms): "
+            f"{resultado['entregas']} entregas, {resultado['perdidas']} perdidas; entrega p50 "
+            f"{resultado['entrega_p50_ms']} ms, p99 {resultado['entrega_p99_ms']} ms, "
+            f"máx {resultado['entrega_max_ms']} ms"
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lavanderia.benchmark.pagination import run_pagination_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Popula um banco descartável com muitas reservas e compara o tempo da página 1 com o de "
+            "uma página distante (pelo cursor e por OFFSET) nas listagens de agendamentos e do histórico.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1_000_000, help="Reservas no banco")
+        parser.add_argument('--pagina', type=int, default=500, help="Página distante medida")
+        parser.add_argument('--repeticoes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            resultado = run_pagination_benchmark(options['linhas'], options['pagina'], options['repeticoes'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        pagina = options['pagina']
+        self.stdout.write(f"{resultado['linhas']} reservas (populadas em {resultado['populacao_s']}s), "
+                          f"{resultado['tamanho_pagina']} por página")
+        self.stdout.write(f"{'listagem':<14}{'página 1':>10}{f'página {pagina}':>13}{'consultas':>11}"
+                          f"{f'OFFSET {pagina}':>13}")
+        for listagem in ('agendamentos', 'historico'):
+            medidas = resultado[listagem]
+            self.stdout.write(
+                f"{listagem:<14}{medidas['pagina_1_ms']:>8}ms{medidas[f'pagina_{pagina}_ms']:>11}ms"
+                f"{medidas['pagina_1_consultas']:>5} / {medidas[f'pagina_{pagina}_consultas']:<3}"
+                f"{medidas[f'offset_pagina_{pagina}_ms']:>11}ms"
+            )
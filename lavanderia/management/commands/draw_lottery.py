@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lavanderia.lottery import draw_round, due_rounds
+
+
+class Command(BaseCommand):
+    help = ("Sorteia as rodadas com inscrições encerradas (ou a rodada indicada, mesmo antes do fim "
+            "das inscrições) e grava as reservas. Normalmente o sorteio é feito pela tarefa sorteios de run_jobs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rodada', type=int, help="Id da rodada a sortear")
+        parser.add_argument('--seed', type=int, help="Semente do sorteio, para reproduzir um resultado")
+
+    def handle(self, *args, **options):
+        if options['rodada']:
+            rodadas = [options['rodada']]
+        else:
+            rodadas = due_rounds().values_list('id', flat=True)
+
+        for rodada_id in rodadas:
+            resultado = draw_round(rodada_id, options['seed'])
+            if resultado is None:
+                raise CommandError(f"A rodada {rodada_id} não existe ou já foi sorteada.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Rodada {rodada_id}: {resultado['alocados']} de {resultado['horarios']} horários distribuídos "
+                f"entre {resultado['atendidos']} de {resultado['inscritos']} inscritos "
+                f"({resultado['primeira_opcao']} na primeira opção) em {resultado['segundos']:.2f}s."
+            ))
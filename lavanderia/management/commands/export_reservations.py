@@ -0,0 +1,36 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from lavanderia.export import FORMATS, export_lines, reservation_rows
+
+
+def parse_date(value):
+    return datetime.date.fromisoformat(value)
+
+
+class Command(BaseCommand):
+    help = "Exporta as reservas de um período, com horário, lavadora e morador, em CSV ou JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first_day', type=parse_date, help="AAAA-MM-DD")
+        parser.add_argument('--to', dest='last_day', type=parse_date, help="AAAA-MM-DD (inclusive)")
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', help="Arquivo de saída (padrão: saída padrão)")
+
+    def handle(self, *args, **options):
+        inicio = fim = None
+        if options['first_day']:
+            inicio = timezone.make_aware(datetime.datetime.combine(options['first_day'], datetime.time.min))
+        if options['last_day']:
+            fim = timezone.make_aware(datetime.datetime.combine(
+                options['last_day'] + datetime.timedelta(days=1), datetime.time.min))
+
+        linhas = export_lines(reservation_rows(inicio, fim), options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as arquivo:
+                arquivo.writelines(linhas)
+        else:
+            sys.stdout.writelines(linhas)
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lavanderia.provisioning import BATCH_SIZE, import_users, report_lines
+
+
+class Command(BaseCommand):
+    help = ("Cadastra em lote os moradores de um CSV (username, matricula, apartamento, telefone, "
+            "email e, opcionalmente, senha) e escreve um relatório por linha com o link (caminho "
+            "no site) em que cada usuário sem senha a define.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="CSV com cabeçalho, em UTF-8")
+        parser.add_argument('--relatorio', help="Arquivo do relatório (padrão: saída padrão)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--workers', type=int, help="Processos para as senhas (padrão: um por CPU)")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], newline='', encoding='utf-8-sig') as arquivo:
+                report = import_users(arquivo, options['batch_size'], options['workers'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        linhas = report_lines(report)
+        if options['relatorio']:
+            with open(options['relatorio'], 'w', newline='', encoding='utf-8') as saida:
+                saida.writelines(linhas)
+        else:
+            sys.stdout.writelines(linhas)
+        self.stderr.write(f"{len(report.created)} usuários criados, {len(report.errors)} linhas com erro.")
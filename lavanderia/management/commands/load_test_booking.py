@@ -0,0 +1,141 @@
+import multiprocessing
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from lavanderia.benchmark.report import percentile
+from lavanderia.booking import LIMITE_AGENDAMENTOS, BookingError, SlotTakenError, book_slot, booking_limit
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot
+
+
+def run_worker(tentativas, barreira, resultados):
+    """Processo que faz cada agendamento da lista junto com os demais processos."""
+    usuarios = LavanderiaUser.objects.in_bulk([user_id for _, user_id in tentativas])
+    saida = []
+    for slot_id, user_id in tentativas:
+        # Todos os processos fazem o k-ésimo agendamento ao mesmo tempo
+        barreira.wait()
+        inicio = time.perf_counter()
+        try:
+            book_slot(usuarios[user_id], slot_id)
+            resultado = 'agendado'
+        except SlotTakenError:
+            resultado = 'ocupado'
+        except BookingError as erro:
+            resultado = f"recusado: {erro}"
+        except Exception as erro:
+            resultado = f"erro: {type(erro).__name__}: {erro}"
+        saida.append((slot_id, user_id, resultado, (time.perf_counter() - inicio) * 1000))
+    resultados.put(saida)
+
+
+def run_workers(por_processo):
+    """Roda um processo por lista de tentativas, todos sincronizados pela barreira."""
+    connections.close_all()
+    contexto = multiprocessing.get_context('fork')
+    barreira = contexto.Barrier(len(por_processo))
+    resultados = contexto.Queue()
+    workers = [contexto.Process(target=run_worker, args=(tentativas, barreira, resultados))
+               for tentativas in por_processo]
+    inicio = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    saidas = [linha for _ in workers for linha in resultados.get()]
+    for worker in workers:
+        worker.join()
+    return saidas, time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = ("Agenda horários a partir de vários processos ao mesmo tempo, em um banco descartável. Verifica "
+            "que cada horário recebe exatamente uma reserva, medindo a latência (p50/p99) do agendamento, e "
+            "que um morador agendando horários diferentes em todos os processos não passa de "
+            "LIMITE_AGENDAMENTOS reservas.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=16, help="Processos disputando cada horário")
+        parser.add_argument('--horarios', type=int, default=50, help="Horários disputados, um de cada vez")
+        parser.add_argument('--rodadas', type=int, default=5,
+                            help="Moradores que agendam, cada um em todos os processos, um horário diferente "
+                                 "por processo")
+
+    def handle(self, *args, **options):
+        processos, horarios, rodadas = options['processos'], options['horarios'], options['rodadas']
+        with test_databases():
+            # Um morador por processo e por horário, para que os limites por morador não
+            # interfiram na disputa pelo mesmo horário, mais um por rodada do limite
+            _, moradores = seed_database(washers=8, dias=4, dias_futuros=3, ocupacao=0,
+                                         usuarios=processos * horarios + rodadas)
+            slots = list(AvaibleSlot.objects.filter(start__gt=timezone.now(), start__lt=booking_limit())
+                         .order_by('start', 'id').values_list('id', flat=True))
+            if len(slots) < horarios + processos * rodadas:
+                raise CommandError(f"Apenas {len(slots)} horários livres para {horarios} + "
+                                   f"{processos * rodadas} agendamentos")
+            problemas = self.same_slot(slots[:horarios], moradores[:processos * horarios], processos)
+            problemas += self.same_user(slots[horarios:], moradores[processos * horarios:], processos)
+        if problemas:
+            raise CommandError("Falhou: " + "; ".join(problemas))
+        self.stdout.write(self.style.SUCCESS(
+            "Ok: exatamente uma reserva por horário, confirmada a um único processo, e nenhum morador "
+            f"acima de {LIMITE_AGENDAMENTOS} agendamentos."))
+
+    def same_slot(self, slots, moradores, processos):
+        """Todos os processos agendam o mesmo horário, cada um para um morador diferente."""
+        por_processo = [
+            [(slot_id, moradores[k * processos + i].id) for k, slot_id in enumerate(slots)]
+            for i in range(processos)
+        ]
+        saidas, segundos = run_workers(por_processo)
+
+        tempos = sorted(ms for *_, ms in saidas)
+        situacoes = Counter(resultado for _, _, resultado, _ in saidas)
+        agendados = Counter(slot_id for slot_id, _, resultado, _ in saidas if resultado == 'agendado')
+        reservas = Counter(ReservedSlot.objects.filter(slot_id__in=slots).values_list('slot_id', flat=True))
+        self.stdout.write(
+            f"{len(slots)} horários x {processos} processos: {len(saidas)} tentativas em {segundos:.2f}s; "
+            + ", ".join(f"{quantidade} {resultado}" for resultado, quantidade in situacoes.most_common())
+        )
+        self.stdout.write(f"latência p50 {percentile(tempos, 50):.1f} ms, p99 {percentile(tempos, 99):.1f} ms, "
+                          f"máx {tempos[-1]:.1f} ms")
+
+        problemas = []
+        sem_reserva = [slot_id for slot_id in slots if reservas[slot_id] == 0]
+        if sem_reserva:
+            problemas.append(f"{len(sem_reserva)} horários sem reserva")
+        if any(quantidade > 1 for quantidade in reservas.values()):
+            problemas.append("horário com mais de uma reserva")
+        if agendados != reservas:
+            problemas.append("agendamentos confirmados diferentes das reservas gravadas")
+        return problemas + self.unexpected_errors(situacoes)
+
+    def same_user(self, slots, moradores, processos):
+        """Em cada rodada todos os processos agendam, para o mesmo morador, um horário diferente."""
+        por_processo = [
+            [(slots[k * processos + i], morador.id) for k, morador in enumerate(moradores)]
+            for i in range(processos)
+        ]
+        saidas, segundos = run_workers(por_processo)
+
+        situacoes = Counter(resultado for _, _, resultado, _ in saidas)
+        agendados = Counter(user_id for _, user_id, resultado, _ in saidas if resultado == 'agendado')
+        reservas = Counter(ReservedSlot.objects.filter(user__in=moradores).values_list('user_id', flat=True))
+        self.stdout.write(
+            f"{len(moradores)} moradores x {processos} processos: {len(saidas)} tentativas em {segundos:.2f}s; "
+            + ", ".join(f"{quantidade} {resultado}" for resultado, quantidade in situacoes.most_common())
+        )
+
+        problemas = []
+        acima = [user_id for user_id, quantidade in reservas.items() if quantidade > LIMITE_AGENDAMENTOS]
+        if acima:
+            problemas.append(f"{len(acima)} moradores com mais de {LIMITE_AGENDAMENTOS} reservas")
+        if agendados != reservas:
+            problemas.append("agendamentos confirmados diferentes das reservas gravadas")
+        return problemas + self.unexpected_errors(situacoes)
+
+    def unexpected_errors(self, situacoes):
+        erros = sum(quantidade for resultado, quantidade in situacoes.items() if resultado.startswith('erro'))
+        return [f"{erros} tentativas com erro inesperado"] if erros else []
@@ -0,0 +1,131 @@
+import datetime
+import itertools
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.test import override_settings
+from django.utils import timezone
+
+from lavanderia.booking import JANELA_FALTAS, LIMITE_AGENDAMENTOS, LIMITE_FALTAS
+from lavanderia.lottery import MAX_PREFERENCIAS, allocate, draw_round
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LotteryPreference, LotteryRound, ReservedSlot
+
+
+def popular_sample(rng, slots, acumulados, quantidade):
+    """quantidade horários distintos, sorteados com peso pela popularidade (pesos acumulados)."""
+    escolhidos = []
+    while len(escolhidos) < quantidade:
+        slot = rng.choices(slots, cum_weights=acumulados)[0]
+        if slot not in escolhidos:
+            escolhidos.append(slot)
+    return escolhidos
+
+
+class Command(BaseCommand):
+    help = ("Simula o sorteio de abertura de horários em um banco descartável: milhares de moradores "
+            "enviam preferências, a rodada é sorteada e o comando verifica as regras de agendamento "
+            "(bloqueados, limite por morador, um morador por horário) e mede o tempo do sorteio.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=3000)
+        parser.add_argument('--lavadoras', type=int, default=20)
+        parser.add_argument('--dias', type=int, default=5, help="Dias da janela sorteada")
+
+    def handle(self, *args, **options):
+        # Os avisos do resultado vão para o nada, não para a saída do comando
+        with test_databases(), override_settings(NOTIFIER='lavanderia.notifications.FileNotifier',
+                                                     NOTIFIER_FILE=os.devnull):
+            self.simulate(options['usuarios'], options['lavadoras'], options['dias'])
+        self.stdout.write("")
+        self.scaling()
+
+    def simulate(self, usuarios, lavadoras, dias, seed=1):
+        rng = random.Random(seed)
+        _, moradores = seed_database(washers=lavadoras, dias=40, dias_futuros=dias + 1, usuarios=usuarios,
+                                     slots_por_dia=14, ocupacao=0.3)
+        agora = timezone.now()
+        inicio_janela = timezone.make_aware(datetime.datetime.combine(
+            timezone.localdate() + datetime.timedelta(days=1), datetime.time.min))
+        rodada = LotteryRound.objects.create(start=inicio_janela,
+                                             end=inicio_janela + datetime.timedelta(days=dias),
+                                             closes_at=agora + datetime.timedelta(minutes=1))
+
+        # Horários livres da janela; os do fim da tarde são os mais disputados
+        livres = list(AvaibleSlot.objects.filter(start__gte=rodada.start, start__lt=rodada.end,
+                                                 reservedslot__isnull=True).values_list('id', 'start'))
+        slots = [slot_id for slot_id, _ in livres]
+        acumulados = list(itertools.accumulate(1 + 4 * (17 <= timezone.localtime(start).hour <= 20)
+                                               for _, start in livres))
+        LotteryPreference.objects.bulk_create(
+            (LotteryPreference(round=rodada, user=morador, slot_id=slot_id, rank=rank)
+             for morador in moradores
+             for rank, slot_id in enumerate(popular_sample(rng, slots, acumulados, MAX_PREFERENCIAS), start=1)),
+            batch_size=1000,
+        )
+
+        ultima_reserva = ReservedSlot.objects.order_by('-id').values_list('id', flat=True).first()
+        resultado = draw_round(rodada.id, seed=seed)
+        self.stdout.write(
+            f"{resultado['inscritos']} inscritos, {resultado['horarios']} horários livres: "
+            f"{resultado['alocados']} distribuídos, {resultado['atendidos']} moradores atendidos, "
+            f"{resultado['primeira_opcao']} na primeira opção, sorteio em {resultado['segundos']:.2f}s"
+        )
+        self.check_result(rodada, agora, ultima_reserva)
+
+    def check_result(self, rodada, agora, ultima_reserva):
+        """Confere o resultado gravado contra as regras, calculadas de novo a partir das reservas."""
+        novas = list(ReservedSlot.objects.filter(id__gt=ultima_reserva).values_list('slot_id', 'user_id'))
+        escolhas = set(rodada.preferences.values_list('slot_id', 'user_id'))
+        faltas = dict(ReservedSlot.objects.filter(slot__start__gte=agora - JANELA_FALTAS, slot__start__lt=agora)
+                      .values('user_id').annotate(total=Count('id', filter=Q(presence=False)))
+                      .values_list('user_id', 'total'))
+        futuras = Counter(ReservedSlot.objects.filter(slot__start__gte=agora).values_list('user_id', flat=True))
+        por_slot = Counter(slot_id for slot_id, _ in novas)
+
+        problemas = []
+        if any(total > 1 for total in por_slot.values()):
+            problemas.append("horário com mais de uma reserva")
+        if any((slot_id, user_id) not in escolhas for slot_id, user_id in novas):
+            problemas.append("horário dado a quem não o escolheu")
+        if any(faltas.get(user_id, 0) >= LIMITE_FALTAS for _, user_id in novas):
+            problemas.append("morador bloqueado recebeu horário")
+        if any(futuras[user_id] > LIMITE_AGENDAMENTOS for _, user_id in novas):
+            problemas.append("morador com mais agendamentos futuros que o limite")
+        # Nenhum horário escolhido ficou livre enquanto quem o escolheu ainda podia recebê-lo
+        ocupados = set(por_slot)
+        sobras = sum(
+            1 for slot_id, user_id in escolhas
+            if slot_id not in ocupados and faltas.get(user_id, 0) < LIMITE_FALTAS
+            and futuras[user_id] < LIMITE_AGENDAMENTOS
+        )
+        if sobras:
+            problemas.append(f"{sobras} escolhas livres de moradores com capacidade sobrando")
+        if problemas:
+            self.stdout.write(self.style.ERROR("Falhou: " + "; ".join(problemas)))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                "Ok: um morador por horário, limites respeitados, nenhum bloqueado sorteado "
+                "e nenhuma escolha livre que ainda pudesse ser atendida."))
+
+    def scaling(self):
+        """Tempo do alocador em memória para tamanhos diferentes (5 preferências por morador)."""
+        self.stdout.write(f"{'moradores':>10}{'horários':>10}{'alocados':>10}{'ms':>10}")
+        for usuarios, horarios in ((1000, 400), (5000, 2000), (20000, 6000), (50000, 20000)):
+            rng = random.Random(usuarios)
+            slots = list(range(horarios))
+            acumulados = list(itertools.accumulate(1 + 4 * (i % 14 >= 10) for i in slots))
+            preferencias = {u: popular_sample(rng, slots, acumulados, MAX_PREFERENCIAS) for u in range(usuarios)}
+            capacidade = {u: rng.choice((0, 1, 2, 2, 2)) for u in range(usuarios)}
+            assiduidade = {u: rng.uniform(0.2, 1) for u in range(usuarios)}
+            tempos = []
+            for repeticao in range(3):
+                inicio = time.perf_counter()
+                dono = allocate(preferencias, capacidade, assiduidade, random.Random(repeticao))
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(f"{usuarios:>10}{horarios:>10}{len(dono):>10}{statistics.median(tempos):>10.0f}")
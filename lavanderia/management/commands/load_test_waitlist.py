@@ -0,0 +1,147 @@
+import datetime
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from django.utils import timezone
+
+from lavanderia.booking import LIMITE_AGENDAMENTOS, BookingError, SlotTakenError, book_slot, cancel_reservation, \
+    join_waitlist
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot, WaitlistEntry
+
+# Fração dos moradores da fila que estão bloqueados por faltas e devem ser pulados
+FRACAO_BLOQUEADOS = 0.1
+# Horários que cada morador tenta agendar (e em cuja fila entra)
+TENTATIVAS = 3
+
+
+def run_worker(reservas, resultados):
+    """Processo que cancela reservas, medindo o tempo de cada cancelamento (com a promoção)."""
+    tempos = []
+    promovidas = 0
+    for reserva in ReservedSlot.objects.filter(id__in=reservas).select_related('slot'):
+        inicio = time.perf_counter()
+        promovidas += cancel_reservation(reserva) is not None
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    resultados.put((tempos, promovidas))
+
+
+class Command(BaseCommand):
+    help = ("Simula centenas de moradores em listas de espera em um banco descartável: os horários "
+            "ocupados são cancelados por vários processos ao mesmo tempo e o comando verifica as "
+            "promoções (regras de agendamento, uma reserva por horário) e o tempo por cancelamento.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--espera', type=int, default=500, help="Moradores nas listas de espera")
+        parser.add_argument('--horarios', type=int, default=40, help="Horários ocupados e depois cancelados")
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        # Os avisos de promoção vão para o nada, não para a saída do comando
+        with test_databases(), override_settings(NOTIFIER='lavanderia.notifications.FileNotifier',
+                                                     NOTIFIER_FILE=os.devnull):
+            self.simulate(options['espera'], options['horarios'], options['workers'])
+            self.stdout.write("")
+            self.scaling()
+
+    def setup(self, espera, horarios, seed=1):
+        """Horários futuros ocupados, moradores na fila e alguns deles bloqueados por faltas."""
+        rng = random.Random(seed)
+        _, moradores = seed_database(washers=4, dias=6, dias_futuros=3, usuarios=horarios + espera,
+                                     ocupacao=0)
+        agora = timezone.now()
+        futuros = list(AvaibleSlot.objects.filter(start__gt=agora + datetime.timedelta(hours=1)).order_by('start'))
+        passados = list(AvaibleSlot.objects.filter(end__lt=agora).order_by('-start'))
+        ocupados = futuros[:horarios]
+        donos, fila = moradores[:horarios], moradores[horarios:]
+
+        ReservedSlot.objects.bulk_create(ReservedSlot(slot=slot, user=dono) for slot, dono in zip(ocupados, donos))
+        bloqueados = set(rng.sample(range(len(fila)), int(len(fila) * FRACAO_BLOQUEADOS)))
+        faltas = iter(passados)
+        ReservedSlot.objects.bulk_create(
+            ReservedSlot(slot=next(faltas), user=fila[i], presence=False)
+            for i in sorted(bloqueados) for _ in range(2)
+        )
+
+        # Cada morador tenta agendar horários ocupados e entra na fila pelo caminho normal
+        for morador in fila:
+            for slot in rng.sample(ocupados, min(TENTATIVAS, len(ocupados))):
+                try:
+                    book_slot(morador, slot.id)
+                except SlotTakenError:
+                    join_waitlist(morador, slot.id)
+                except BookingError:
+                    pass  # Bloqueado: não entra na fila
+        return ocupados, {fila[i].id for i in bloqueados}
+
+    def simulate(self, espera, horarios, workers):
+        ocupados, bloqueados = self.setup(espera, horarios)
+        na_fila = WaitlistEntry.objects.count()
+        reservas = list(ReservedSlot.objects.filter(slot__in=ocupados).values_list('id', flat=True))
+        self.stdout.write(f"{espera} moradores, {len(ocupados)} horários ocupados, {na_fila} entradas nas filas")
+
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        resultados = contexto.Queue()
+        processos = [contexto.Process(target=run_worker, args=(reservas[i::workers], resultados))
+                     for i in range(workers)]
+        inicio = time.perf_counter()
+        for processo in processos:
+            processo.start()
+        saidas = [resultados.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+        segundos = time.perf_counter() - inicio
+
+        tempos = [tempo for parcial, _ in saidas for tempo in parcial]
+        promovidas = sum(quantidade for _, quantidade in saidas)
+        agora = timezone.now()
+        futuras = Counter(ReservedSlot.objects.filter(slot__start__gt=agora).values_list('user_id', flat=True))
+        self.stdout.write(
+            f"{len(tempos)} cancelamentos em {segundos:.2f}s ({workers} processos): {promovidas} promoções, "
+            f"mediana {statistics.median(tempos):.1f} ms, p95 {statistics.quantiles(tempos, n=20)[-1]:.1f} ms"
+        )
+
+        problemas = []
+        if any(quantidade > LIMITE_AGENDAMENTOS for quantidade in futuras.values()):
+            problemas.append("morador com mais agendamentos futuros que o limite")
+        if bloqueados & set(futuras):
+            problemas.append("morador bloqueado promovido")
+        livres_com_fila = AvaibleSlot.objects.filter(id__in=[slot.id for slot in ocupados],
+                                                     reservedslot__isnull=True,
+                                                     waitlistentry__isnull=False).distinct().count()
+        if livres_com_fila:
+            problemas.append(f"{livres_com_fila} horários livres com fila")
+        if problemas:
+            self.stdout.write(self.style.ERROR("Falhou: " + "; ".join(problemas)))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                "Ok: nenhum horário livre com fila, limites respeitados e nenhum bloqueado promovido."))
+
+    def scaling(self):
+        """Tempo de um cancelamento com promoção para filas de tamanhos diferentes."""
+        self.stdout.write(f"{'fila':>6}{'mediana ms':>12}")
+        slot = AvaibleSlot.objects.filter(start__gt=timezone.now() + datetime.timedelta(hours=1),
+                                          reservedslot__isnull=True).first()
+        for tamanho in (10, 100, 1000):
+            WaitlistEntry.objects.all().delete()
+            ReservedSlot.objects.filter(slot=slot).delete()
+            usuarios = LavanderiaUser.objects.bulk_create(
+                LavanderiaUser(username=f"fila{tamanho}-{i}", matricula=f"f{tamanho}-{i}") for i in range(tamanho))
+            WaitlistEntry.objects.bulk_create(WaitlistEntry(slot=slot, user=usuario) for usuario in usuarios)
+            tempos = []
+            for _ in range(min(tamanho, 50)):
+                reserva = ReservedSlot.objects.filter(slot=slot).select_related('slot').first()
+                if reserva is None:
+                    reserva = ReservedSlot.objects.create(slot=slot, user=usuarios[0])
+                inicio = time.perf_counter()
+                cancel_reservation(reserva)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(f"{tamanho:>6}{statistics.median(tempos):>12.2f}")
@@ -0,0 +1,96 @@
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from lavanderia.booking import BookingError, book_slot, toggle_presence
+from lavanderia.db import is_locked_error
+from lavanderia.management.seed import seed_database, test_databases
+from lavanderia.models import AvaibleSlot, ReservedSlot
+
+# Fração das operações que alteram a presença em vez de agendar
+FRACAO_PRESENCA = 0.3
+
+
+def run_worker(numero, usuarios, slots, reservas, operacoes, resultados):
+    """Processo de carga: agenda horários e altera presenças, contando os resultados."""
+    rng = random.Random(numero)
+    contagem = Counter()
+    for i in range(operacoes):
+        try:
+            if rng.random() < FRACAO_PRESENCA:
+                toggle_presence(rng.choice(reservas))
+            else:
+                # Cada usuário agenda no máximo dois horários (limite das regras)
+                book_slot(usuarios[i // 2 % len(usuarios)], rng.choice(slots))
+            contagem['ok'] += 1
+        except BookingError:
+            contagem['recusadas'] += 1
+        except OperationalError as error:
+            if not is_locked_error(error):
+                raise
+            contagem['travadas'] += 1
+    resultados.put(contagem)
+
+
+class Command(BaseCommand):
+    help = ("Teste de carga das escritas de agendamento e de presença com vários processos "
+            "(como os workers do gunicorn) em um banco descartável, comparando a configuração "
+            "padrão do SQLite com a de settings.py (WAL, busy_timeout, BEGIN IMMEDIATE e novas tentativas).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--operacoes', type=int, default=200, help="Operações por worker")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write("O teste compara configurações do SQLite; o banco configurado é outro.")
+            return
+
+        configurado = connection.settings_dict['OPTIONS']
+        modos = {
+            # Padrão do Django: journal em rollback, BEGIN DEFERRED, timeout de 5s e nenhuma nova tentativa
+            'padrão': ({}, 0),
+            'ajustado': (configurado, None),
+        }
+        self.stdout.write(f"{'modo':<10}{'ok':>8}{'recusadas':>11}{'travadas':>10}{'% travadas':>12}{'ops/s':>10}")
+        try:
+            for modo, (opcoes, tentativas) in modos.items():
+                connection.settings_dict['OPTIONS'] = opcoes
+                with override_settings(**({} if tentativas is None else {'DB_WRITE_RETRIES': tentativas})):
+                    contagem, segundos = self.run(options['workers'], options['operacoes'])
+                total = sum(contagem.values())
+                self.stdout.write(
+                    f"{modo:<10}{contagem['ok']:>8}{contagem['recusadas']:>11}{contagem['travadas']:>10}"
+                    f"{100 * contagem['travadas'] / total:>11.1f}%{total / segundos:>10.0f}"
+                )
+        finally:
+            connection.settings_dict['OPTIONS'] = configurado
+
+    def run(self, workers, operacoes):
+        with test_databases():
+            _, usuarios = seed_database(washers=8, dias=15, dias_futuros=15, slots_por_dia=12,
+                                        usuarios=workers * operacoes, ocupacao=0.3)
+            slots = list(AvaibleSlot.objects.values_list('id', flat=True))
+            reservas = list(ReservedSlot.objects.values_list('id', flat=True))
+            # Cada processo abre a própria conexão, como um worker
+            connections.close_all()
+
+            contexto = multiprocessing.get_context('fork')
+            resultados = contexto.Queue()
+            processos = [
+                contexto.Process(target=run_worker, args=(
+                    numero, usuarios[numero::workers], slots, reservas, operacoes, resultados))
+                for numero in range(workers)
+            ]
+            inicio = time.perf_counter()
+            for processo in processos:
+                processo.start()
+            contagem = sum((resultados.get() for _ in processos), Counter())
+            for processo in processos:
+                processo.join()
+            return contagem, time.perf_counter() - inicio
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lavanderia.booking import rebuild_eligibility
+from lavanderia.models import BookingEligibility
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero os registros de elegibilidade para agendamento de todos os usuários."
+
+    def handle(self, *args, **options):
+        rebuild_eligibility()
+        self.stdout.write(self.style.SUCCESS(
+            f"{BookingEligibility.objects.count()} registros de elegibilidade reconstruídos."
+        ))
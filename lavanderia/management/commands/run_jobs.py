@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from lavanderia.jobs import TASKS, Worker, enqueue, job_stats
+
+
+class Command(BaseCommand):
+    help = ("Executa a fila de tarefas em segundo plano (lembretes, faltas, liberação de horários, "
+            "agregados e arquivamento), enfileirando as tarefas periódicas de cada janela de tempo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Executa as tarefas vencidas e termina (para rodar pelo cron)")
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_CONCURRENCY)
+        parser.add_argument('--enqueue', choices=sorted(TASKS),
+                            help="Enfileira uma execução imediata da tarefa antes de começar")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            agora = timezone.now()
+            enqueue(options['enqueue'], f"{options['enqueue']}:manual:{agora.isoformat()}", agora)
+
+        worker = Worker(options['concurrency'])
+        try:
+            if options['once']:
+                worker.run_until_idle()
+            else:
+                while True:
+                    if not worker.tick():
+                        worker.wait(settings.JOB_POLL_SECONDS)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.shutdown()
+
+        if options['once']:
+            self.stdout.write(f"{'tarefa':<20}{'status':<12}{'execuções':>10}{'itens':>10}{'itens/s':>10}")
+            for linha in job_stats():
+                vazao = linha['processed'] / linha['seconds'] if linha['seconds'] else 0
+                self.stdout.write(f"{linha['kind']:<20}{linha['status']:<12}{linha['jobs']:>10}"
+                                  f"{linha['processed']:>10}{vazao:>10.1f}")
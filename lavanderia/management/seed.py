@@ -0,0 +1,67 @@
+import contextlib
+import datetime
+import random
+
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot, Washer
+
+# Horários criados por vez em seed_database
+SEED_CHUNK = 20000
+
+
+@contextlib.contextmanager
+def test_databases():
+    """
+    Cria os bancos de teste do Django (DATABASES[...]['TEST'], os mesmos de manage.py test)
+    e os destrói ao final, sem tocar no banco configurado.
+    """
+    old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def seed_database(washers=8, dias=30, usuarios=100, slots_por_dia=12, ocupacao=0.6, dias_futuros=15,
+                  seed=42):
+    """
+    Popula o banco com lavadoras, moradores, horários de uma hora e reservas.
+
+    Os horários cobrem `dias` dias terminando `dias_futuros` dias à frente de hoje;
+    `ocupacao` é a fração de horários reservados.
+    """
+    rng = random.Random(seed)
+    duracao = datetime.timedelta(hours=1)
+    primeiro_dia = timezone.make_aware(datetime.datetime.combine(
+        timezone.localdate() - datetime.timedelta(days=dias - dias_futuros), datetime.time(8)))
+
+    lavadoras = Washer.objects.bulk_create(Washer(name=f"Lavadora {i}") for i in range(washers))
+    moradores = LavanderiaUser.objects.bulk_create(
+        LavanderiaUser(username=f"morador{i}", matricula=str(i), apartamento=str(i % 120))
+        for i in range(usuarios)
+    )
+    agora = timezone.now()
+    # Em lotes de dias, para que milhões de horários não fiquem todos na memória
+    dias_por_lote = max(1, SEED_CHUNK // max(1, washers * slots_por_dia))
+    for primeiro in range(0, dias, dias_por_lote):
+        slots = AvaibleSlot.objects.bulk_create(
+            (AvaibleSlot(washer=lavadora, start=inicio, duration=duracao, end=inicio + duracao)
+             for dia in range(primeiro, min(dias, primeiro + dias_por_lote))
+             for hora in range(slots_por_dia) for lavadora in lavadoras
+             for inicio in [primeiro_dia + datetime.timedelta(days=dia, hours=hora)]),
+            batch_size=1000,
+        )
+        ReservedSlot.objects.bulk_create(
+            (ReservedSlot(slot=slot, user=rng.choice(moradores), presence=rng.random() > 0.1,
+                          presence_checked=slot.end <= agora)
+             for slot in slots if rng.random() < ocupacao),
+            batch_size=1000,
+        )
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return lavadoras, moradores
@@ -0,0 +1,188 @@
+"""
+Instrumentação das requisições.
+
+PerformanceMiddleware mede, em cada requisição, a view, o tempo total, o número e o
+tempo das consultas ao banco (connection.execute_wrapper) e o tempo de renderização
+dos templates das TemplateResponse (as views baseadas em classe). Cada requisição gera
+uma linha de log em JSON no logger lavanderia.requests; as mais lentas que
+SLOW_REQUEST_MS geram um aviso que inclui o SQL executado.
+
+Os histogramas por view ficam em memória, em cada processo, e são expostos por
+metrics_text() no formato de texto do Prometheus.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from lavanderia.cache import cache_stats
+from lavanderia.events import hub
+from lavanderia.jobs import job_stats
+
+logger = logging.getLogger('lavanderia.requests')
+
+# Limites superiores (segundos) dos intervalos do histograma de duração
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Consultas guardadas por requisição para o log das requisições lentas
+MAX_SQL = 50
+
+
+class QueryRecorder:
+    """execute_wrapper que conta as consultas, soma o tempo gasto no banco e guarda o SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - inicio
+            self.count += 1
+            if len(self.sql) < MAX_SQL:
+                self.sql.append(sql)
+
+
+class RouteStats:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def add(self, seconds, queries, db_seconds, template_seconds):
+        indice = bisect_left(BUCKETS, seconds)
+        if indice < len(BUCKETS):
+            self.buckets[indice] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.db_seconds += db_seconds
+        self.template_seconds += template_seconds
+
+
+_lock = threading.Lock()
+_routes = defaultdict(RouteStats)
+
+
+def record(view, seconds, queries, db_seconds, template_seconds):
+    with _lock:
+        _routes[view].add(seconds, queries, db_seconds, template_seconds)
+
+
+def metrics_text():
+    """Métricas deste processo no formato de texto do Prometheus."""
+    with _lock:
+        rotas = {view: vars(stats).copy() for view, stats in _routes.items()}
+        for stats in rotas.values():
+            stats['buckets'] = list(stats['buckets'])
+
+    linhas = [
+        '# HELP lavanderia_request_duration_seconds Duração das requisições por view.',
+        '# TYPE lavanderia_request_duration_seconds histogram',
+    ]
+    for view, stats in sorted(rotas.items()):
+        acumulado = 0
+        for limite, quantidade in zip(BUCKETS, stats['buckets']):
+            acumulado += quantidade
+            linhas.append(f'lavanderia_request_duration_seconds_bucket{{view="{view}",le="{limite}"}} {acumulado}')
+        linhas.append(f'lavanderia_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {stats["count"]}')
+        linhas.append(f'lavanderia_request_duration_seconds_sum{{view="{view}"}} {stats["seconds"]:.6f}')
+        linhas.append(f'lavanderia_request_duration_seconds_count{{view="{view}"}} {stats["count"]}')
+
+    contadores = [
+        ('lavanderia_request_db_queries_total', 'queries', 'Consultas ao banco por view.', '{}'),
+        ('lavanderia_request_db_seconds_total', 'db_seconds', 'Tempo gasto no banco por view.', '{:.6f}'),
+        ('lavanderia_request_template_seconds_total', 'template_seconds',
+         'Tempo de renderização de templates por view.', '{:.6f}'),
+    ]
+    for nome, campo, descricao, formato in contadores:
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} counter']
+        for view, stats in sorted(rotas.items()):
+            linhas.append(f'{nome}{{view="{view}"}} ' + formato.format(stats[campo]))
+
+    linhas += [
+        '# HELP lavanderia_availability_cache_total Consultas ao cache da lista de horários.',
+        '# TYPE lavanderia_availability_cache_total counter',
+    ]
+    for resultado, quantidade in cache_stats().items():
+        linhas.append(f'lavanderia_availability_cache_total{{resultado="{resultado}"}} {quantidade}')
+
+    linhas += [
+        '# HELP lavanderia_event_connections Conexões abertas no fluxo de eventos de disponibilidade.',
+        '# TYPE lavanderia_event_connections gauge',
+        f'lavanderia_event_connections {hub.connections()}',
+    ]
+
+    # Lidas do banco: as tarefas rodam no processo do run_jobs, não neste
+    tarefas = job_stats()
+    linhas += [
+        '# HELP lavanderia_jobs Tarefas em segundo plano guardadas, por tipo e status.',
+        '# TYPE lavanderia_jobs gauge',
+    ]
+    for linha in tarefas:
+        linhas.append(f'lavanderia_jobs{{kind="{linha["kind"]}",status="{linha["status"]}"}} {linha["jobs"]}')
+    for nome, campo, descricao, formato in [
+        ('lavanderia_job_items', 'processed', 'Itens processados pelas tarefas guardadas.', '{}'),
+        ('lavanderia_job_seconds', 'seconds', 'Tempo de execução das tarefas guardadas.', '{:.6f}'),
+    ]:
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} gauge']
+        for linha in tarefas:
+            linhas.append(f'{nome}{{kind="{linha["kind"]}",status="{linha["status"]}"}} '
+                          + formato.format(linha[campo]))
+    return '\n'.join(linhas) + '\n'
+
+
+class PerformanceMiddleware:
+    """Deve ser o primeiro de MIDDLEWARE, para medir a requisição inteira."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryRecorder()
+        request.template_seconds = 0.0
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        segundos = time.perf_counter() - inicio
+
+        view = request.resolver_match.view_name if request.resolver_match else 'nao_encontrada'
+        record(view, segundos, queries.count, queries.seconds, request.template_seconds)
+
+        lenta = segundos * 1000 >= settings.SLOW_REQUEST_MS
+        if lenta or logger.isEnabledFor(logging.INFO):
+            linha = {
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'ms': round(segundos * 1000, 2),
+                'queries': queries.count,
+                'db_ms': round(queries.seconds * 1000, 2),
+                'template_ms': round(request.template_seconds * 1000, 2),
+            }
+            if lenta:
+                linha['sql'] = queries.sql
+                logger.warning(json.dumps(linha, ensure_ascii=False))
+            else:
+                logger.info(json.dumps(linha, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        # Como este é o último process_template_response chamado, renderizar aqui mede só o
+        # template; a chamada a render() feita depois pelo Django não renderiza de novo
+        inicio = time.perf_counter()
+        response.render()
+        request.template_seconds = time.perf_counter() - inicio
+        return response
@@ -3,6 +3,21 @@
 from django.db import migrations, models
 
 
+class AlterDurationField(migrations.AlterField):
+    """
+    No PostgreSQL um timestamp não pode ser convertido em interval, então a coluna é
+    convertida sem aproveitar os valores (em um banco novo a tabela ainda está vazia; com
+    linhas, a restrição NOT NULL faz a migração falhar em vez de inventar durações).
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        schema_editor.execute('ALTER TABLE %s ALTER COLUMN %s TYPE interval USING NULL' % (
+            schema_editor.quote_name(model._meta.db_table), schema_editor.quote_name(self.name)))
+
+
 class Migration(migrations.Migration):
 
     dependencies = [
@@ -10,7 +25,7 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        migrations.AlterField(
+        AlterDurationField(
             model_name='avaibleslot',
             name='duration',
             field=models.DurationField(),
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+def remove_duplicate_reservations(apps, schema_editor):
+    # Antes da restrição um horário podia ter mais de uma reserva: fica a mais antiga (menor id)
+    ReservedSlot = apps.get_model('lavanderia', 'ReservedSlot')
+    anteriores = ReservedSlot.objects.filter(slot=models.OuterRef('slot'), id__lt=models.OuterRef('id'))
+    ReservedSlot.objects.filter(models.Exists(anteriores)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0002_alter_avaibleslot_duration'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reservations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reservedslot',
+            constraint=models.UniqueConstraint(fields=('slot',), name='reservedslot_slot_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0003_reservedslot_slot_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='avaibleslot',
+            index=models.Index(fields=['start'], name='avaibleslot_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='avaibleslot',
+            index=models.Index(fields=['washer', 'start'], name='avaibleslot_washer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservedslot',
+            index=models.Index(fields=['user', 'presence'], name='reservedslot_user_presence_idx'),
+        ),
+    ]
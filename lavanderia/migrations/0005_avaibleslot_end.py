@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+def fill_end(apps, schema_editor):
+    AvaibleSlot = apps.get_model('lavanderia', 'AvaibleSlot')
+    slots = list(AvaibleSlot.objects.only('start', 'duration'))
+    for slot in slots:
+        slot.end = slot.start + slot.duration
+    AvaibleSlot.objects.bulk_update(slots, ['end'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0004_slot_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avaibleslot',
+            name='end',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_end, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='avaibleslot',
+            name='end',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='avaibleslot',
+            index=models.Index(fields=['washer', 'end'], name='avaibleslot_washer_end_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0005_avaibleslot_end'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEligibility',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='eligibility', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('upcoming', models.PositiveIntegerField(default=0)),
+                ('recent_absences', models.PositiveIntegerField(default=0)),
+                ('blocked_until', models.DateTimeField(blank=True, null=True)),
+                ('valid_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
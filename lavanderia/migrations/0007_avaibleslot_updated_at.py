@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0006_bookingeligibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avaibleslot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0007_avaibleslot_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyApartmentUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('apartamento', models.CharField(max_length=64)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('absences', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'apartamento'), name='dailyapartmentusage_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyWasherUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('slots', models.PositiveIntegerField(default=0)),
+                ('reserved', models.PositiveIntegerField(default=0)),
+                ('absences', models.PositiveIntegerField(default=0)),
+                ('washer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lavanderia.washer')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'washer', 'hour'), name='dailywasherusage_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0008_usage_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('duration', models.DurationField()),
+                ('washer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lavanderia.washer')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('presence', models.BooleanField(default=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='lavanderia.archivedslot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedslot',
+            index=models.Index(fields=['start'], name='archivedslot_start_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0009_archive_tables'),
+    ]
+
+    operations = [
+        # As reservas existentes contam como conferidas, para que a tarefa de faltas
+        # só se aplique às criadas daqui em diante
+        migrations.AddField(
+            model_name='reservedslot',
+            name='presence_checked',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='reservedslot',
+            name='presence_checked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='reservedslot',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64)),
+                ('key', models.CharField(max_length=191, unique=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=16)),
+                ('run_at', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx')],
+            },
+        ),
+    ]
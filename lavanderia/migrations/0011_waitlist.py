@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0010_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('slot', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='lavanderia.avaibleslot')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['slot', 'id'], name='waitlistentry_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('slot', 'user'), name='waitlistentry_slot_user_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lavanderia', '0011_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotteryRound',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('closes_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('aberta', 'Aberta'), ('sorteada', 'Sorteada')], default='aberta', max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('drawn_at', models.DateTimeField(blank=True, null=True)),
+                ('seed', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'start'], name='lotteryround_status_start_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LotteryPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lavanderia.avaibleslot')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preferences', to='lavanderia.lotteryround')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('round', 'user', 'slot'), name='lotterypreference_slot_unique'), models.UniqueConstraint(fields=('round', 'user', 'rank'), name='lotterypreference_rank_unique')],
+            },
+        ),
+    ]
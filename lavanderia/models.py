@@ -23,14 +23,233 @@ class Washer(models.Model):
         return self.name
 
 
+class AvaibleSlotQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """Slots cujo intervalo [start, end) se sobrepõe ao intervalo dado."""
+        return self.filter(start__lt=end, end__gt=start)
+
+
 class AvaibleSlot(models.Model):
     start = models.DateTimeField(null=False)
     washer = models.ForeignKey('lavanderia.Washer', on_delete=models.CASCADE, null=False)
     duration = models.DurationField(null=False)
+    # start + duration, armazenado para que a sobreposição possa ser consultada com índice
+    end = models.DateTimeField(null=False, editable=False)
+    # Usado pela API de disponibilidade para detectar slots editados
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AvaibleSlotQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listagens por data e verificação de sobreposição por lavadora
+            models.Index(fields=['start'], name='avaibleslot_start_idx'),
+            models.Index(fields=['washer', 'start'], name='avaibleslot_washer_start_idx'),
+            models.Index(fields=['washer', 'end'], name='avaibleslot_washer_end_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.end = self.start + self.duration
+        super().save(*args, **kwargs)
 
 
 class ReservedSlot(models.Model):
     slot = models.ForeignKey(AvaibleSlot, on_delete=models.CASCADE, null=False)
     user = models.ForeignKey(LavanderiaUser, on_delete=models.CASCADE, null=False)
     presence = models.BooleanField(null=False, default=True)
+    # Presença conferida pela equipe (ou falta registrada pela tarefa de faltas)
+    presence_checked = models.BooleanField(default=False)
+    # Quando o lembrete foi enviado ao usuário (tarefa de lembretes)
+    reminded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Um horário só pode ser reservado uma vez
+            models.UniqueConstraint(fields=['slot'], name='reservedslot_slot_unique'),
+        ]
+        indexes = [
+            # Contagem de faltas e agendamentos do usuário
+            models.Index(fields=['user', 'presence'], name='reservedslot_user_presence_idx'),
+        ]
+
+
+class WaitlistEntry(models.Model):
+    """Usuário esperando um horário já agendado; a fila de cada horário é ordenada pelo id."""
+    # Sem o índice próprio da FK: o índice (slot, id) da fila já começa pelo horário
+    slot = models.ForeignKey(AvaibleSlot, on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(LavanderiaUser, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'user'], name='waitlistentry_slot_user_unique'),
+        ]
+        indexes = [
+            # Primeiro da fila de um horário: uma busca no índice, qualquer que seja o tamanho da fila
+            models.Index(fields=['slot', 'id'], name='waitlistentry_queue_idx'),
+        ]
+
+
+class LotteryRound(models.Model):
+    """
+    Sorteio dos horários que começam em [start, end): até closes_at os moradores enviam
+    preferências e esses horários não podem ser agendados (lavanderia/lottery.py).
+    """
+    OPEN = 'aberta'
+    DRAWN = 'sorteada'
+    STATUS_CHOICES = [
+        (OPEN, 'Aberta'),
+        (DRAWN, 'Sorteada'),
+    ]
+
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    closes_at = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    drawn_at = models.DateTimeField(null=True, blank=True)
+    # Semente usada no sorteio, guardada para que o resultado possa ser reproduzido
+    seed = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'start'], name='lotteryround_status_start_idx'),
+        ]
+
+
+class LotteryPreference(models.Model):
+    """Horário escolhido por um morador em um sorteio; rank 1 é o preferido."""
+    round = models.ForeignKey(LotteryRound, on_delete=models.CASCADE, related_name='preferences')
+    user = models.ForeignKey(LavanderiaUser, on_delete=models.CASCADE)
+    slot = models.ForeignKey(AvaibleSlot, on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['round', 'user', 'slot'], name='lotterypreference_slot_unique'),
+            models.UniqueConstraint(fields=['round', 'user', 'rank'], name='lotterypreference_rank_unique'),
+        ]
+
+
+class BookingEligibility(models.Model):
+    """
+    Contadores usados pelas regras de agendamento, mantidos por usuário para que a
+    verificação de elegibilidade seja uma busca pela chave primária.
+    """
+    user = models.OneToOneField(LavanderiaUser, on_delete=models.CASCADE, primary_key=True,
+                                related_name='eligibility')
+    # Reservas em horários que ainda não começaram
+    upcoming = models.PositiveIntegerField(default=0)
+    # Faltas (presence=False) nos últimos 30 dias
+    recent_absences = models.PositiveIntegerField(default=0)
+    # Até quando o usuário não pode agendar por excesso de faltas
+    blocked_until = models.DateTimeField(null=True, blank=True)
+    # Momento em que algum contador muda só pela passagem do tempo (um horário passa ou
+    # uma falta sai da janela de 30 dias). Depois dele o registro precisa ser recalculado.
+    valid_until = models.DateTimeField(null=True, blank=True)
+
+
+class DailyWasherUsage(models.Model):
+    """Uso agregado de uma lavadora em uma hora de um dia (preenchido por aggregate_usage)."""
+    day = models.DateField()
+    washer = models.ForeignKey(Washer, on_delete=models.CASCADE)
+    hour = models.PositiveSmallIntegerField()
+    slots = models.PositiveIntegerField(default=0)  # Horários oferecidos
+    reserved = models.PositiveIntegerField(default=0)
+    absences = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'washer', 'hour'], name='dailywasherusage_unique'),
+        ]
+
+
+class DailyApartmentUsage(models.Model):
+    """Reservas e faltas de um apartamento em um dia (preenchido por aggregate_usage)."""
+    day = models.DateField()
+    apartamento = models.CharField(max_length=64)
+    reservations = models.PositiveIntegerField(default=0)
+    absences = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'apartamento'], name='dailyapartmentusage_unique'),
+        ]
+
+
+class RollupDirtyDay(models.Model):
+    """Dias com horários ou reservas alterados desde a última agregação."""
+    day = models.DateField(primary_key=True)
+
+
+class ArchivedSlot(models.Model):
+    """Horário antigo movido de AvaibleSlot pelo arquivamento (mantém o id original)."""
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    duration = models.DurationField()
+    washer = models.ForeignKey(Washer, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start'], name='archivedslot_start_idx'),
+        ]
+
+
+class ArchivedReservation(models.Model):
+    """Reserva antiga movida de ReservedSlot pelo arquivamento (mantém o id original)."""
+    slot = models.OneToOneField(ArchivedSlot, on_delete=models.CASCADE)
+    user = models.ForeignKey(LavanderiaUser, on_delete=models.CASCADE)
+    presence = models.BooleanField(default=True)
+
+
+class Job(models.Model):
+    """Tarefa em segundo plano, executada fora das requisições pelo comando run_jobs (lavanderia/jobs.py)."""
+    PENDING = 'pendente'
+    RUNNING = 'executando'
+    DONE = 'concluida'
+    FAILED = 'falhou'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendente'),
+        (RUNNING, 'Executando'),
+        (DONE, 'Concluída'),
+        (FAILED, 'Falhou'),
+    ]
+
+    kind = models.CharField(max_length=64)
+    # Chave de idempotência: a mesma tarefa (ex.: a mesma janela de tempo) só é enfileirada uma vez
+    key = models.CharField(max_length=191, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    # Enquanto executando, até quando o worker detém a tarefa; depois disso outro worker pode retomá-la
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Itens processados e duração da última execução (métricas de vazão)
+    processed = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
 
+class UserImport(models.Model):
+    """Importação de moradores de um CSV, executada pela tarefa importar_usuarios (lavanderia/provisioning.py)."""
+    created_by = models.ForeignKey(LavanderiaUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Conteúdo do CSV enviado; apagado quando a importação termina
+    content = models.TextField(blank=True)
+    # Última linha do arquivo já processada: uma nova tentativa continua depois dela
+    processed_line = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # Linhas do relatório em CSV, com os links para definir a senha; só as linhas com erro ficam
+    # depois do download ou depois que os links vencem
+    report = models.TextField(blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    downloaded_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,64 @@
+"""
+Envio de avisos aos moradores (lembretes, faltas registradas, reservas liberadas).
+
+O notificador é escolhido por NOTIFIER (LAVANDERIA_NOTIFIER), como os backends de
+e-mail do Django: ConsoleNotifier (padrão) escreve na saída padrão, FileNotifier
+acrescenta uma linha JSON por aviso em NOTIFIER_FILE (útil em testes) e
+EmailNotifier envia pelo EMAIL_BACKEND configurado.
+"""
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class BaseNotifier:
+    def send_messages(self, messages):
+        """Envia os avisos [(usuário, assunto, texto)]; retorna quantos foram enviados."""
+        raise NotImplementedError
+
+
+class ConsoleNotifier(BaseNotifier):
+    _lock = threading.Lock()
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, messages):
+        with self._lock:
+            for user, subject, body in messages:
+                self.stream.write(f"Para: {user.username}\nAssunto: {subject}\n\n{body}\n{'-' * 79}\n")
+            self.stream.flush()
+        return len(messages)
+
+
+class FileNotifier(BaseNotifier):
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or settings.NOTIFIER_FILE
+
+    def send_messages(self, messages):
+        agora = timezone.now().isoformat()
+        with self._lock, open(self.path, 'a', encoding='utf-8') as arquivo:
+            for user, subject, body in messages:
+                arquivo.write(json.dumps({
+                    'enviado_em': agora, 'usuario': user.username, 'assunto': subject, 'texto': body,
+                }, ensure_ascii=False) + '\n')
+        return len(messages)
+
+
+class EmailNotifier(BaseNotifier):
+    """Envia por e-mail, em uma única conexão; usuários sem e-mail são ignorados."""
+
+    def send_messages(self, messages):
+        emails = [EmailMessage(subject, body, to=[user.email]) for user, subject, body in messages if user.email]
+        return get_connection().send_messages(emails) or 0
+
+
+def get_notifier():
+    return import_string(settings.NOTIFIER)()
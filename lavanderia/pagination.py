@@ -0,0 +1,107 @@
+"""
+Paginação por cursor (keyset) para as listagens da equipe.
+
+Em vez de OFFSET, cada página continua a partir da chave de ordenação do último
+item da página anterior, então qualquer página custa o mesmo que a primeira e
+nenhum COUNT(*) é necessário.
+
+O cursor vem da URL e pode ter sido adulterado: um cursor que não decodifica, que não
+tem um valor escalar por campo do keyset ou cujos valores não servem para os campos
+resulta em 400 (BadRequest), não em erro do servidor.
+"""
+import base64
+import binascii
+import functools
+import json
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        return None
+
+
+def after(keyset, values):
+    """Filtro das linhas que vêm depois de `values` na ordem crescente de `keyset`."""
+    condicao = Q()
+    for i, campo in enumerate(keyset):
+        anteriores = {keyset[j]: values[j] for j in range(i)}
+        condicao |= Q(**anteriores, **{f'{campo}__gt': values[i]})
+    # Limite inferior explícito no primeiro campo, para que o índice seja usado
+    return Q(**{f'{keyset[0]}__gte': values[0]}) & condicao
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.first = first
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return not self.first
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginationMixin:
+    """
+    Substitui a paginação por página de uma ListView pela paginação por cursor.
+
+    keyset são os campos da ordenação (crescente); o último deve ser único.
+    O contexto recebe page_obj com has_next() e next_cursor, e paginator=None.
+    Os itens podem ser objetos ou dicionários (querysets de values()).
+    """
+    keyset = ('id',)
+    cursor_kwarg = 'apos'
+    paginate_by = 100
+
+    def get_cursor(self):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if not cursor:
+            return None
+        values = decode_cursor(cursor)
+        # Um valor escalar do JSON por campo; listas e objetos só vêm de um cursor adulterado
+        if not (isinstance(values, list) and len(values) == len(self.keyset)
+                and all(isinstance(value, (str, int, float)) for value in values)):
+            raise BadRequest("Cursor de paginação inválido.")
+        return values
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.order_by(*self.keyset)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            try:
+                # Os valores são convertidos para os tipos dos campos ao montar o filtro
+                queryset = self.filter_after(queryset, cursor)
+            except (ValidationError, TypeError, ValueError):
+                raise BadRequest("Cursor de paginação inválido.")
+
+        # Um item a mais indica se existe próxima página
+        object_list = list(queryset[:page_size + 1])
+        next_cursor = None
+        if len(object_list) > page_size:
+            object_list = object_list[:page_size]
+            ultimo = object_list[-1]
+            next_cursor = encode_cursor([
+                ultimo[campo] if isinstance(ultimo, dict) else functools.reduce(getattr, campo.split('__'), ultimo)
+                for campo in self.keyset
+            ])
+
+        page = KeysetPage(object_list, next_cursor, first=cursor is None)
+        return None, page, object_list, page.has_other_pages()
+
+    def filter_after(self, queryset, cursor):
+        return queryset.filter(after(self.keyset, cursor))
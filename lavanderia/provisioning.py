@@ -0,0 +1,256 @@
+"""
+Cadastro de moradores em lote a partir de um CSV (início de semestre).
+
+As linhas são processadas em lotes de BATCH_SIZE: cada linha é validada pelo
+UserImportRowForm sem acessar o banco, os usernames e matrículas já cadastrados são
+buscados com uma única consulta por lote, as senhas informadas são transformadas em
+hash em um pool de processos (o PBKDF2 é o que domina o tempo do cadastro) e os
+usuários do lote são inseridos com bulk_create.
+
+Quem não tem senha no CSV é criado com uma senha inutilizável e recebe, no relatório,
+um link para defini-la: o mesmo formulário de "esqueci a senha", válido por
+PASSWORD_RESET_TIMEOUT e só até a senha ser definida. Assim nenhuma senha em texto
+fica guardada e só as senhas informadas passam pelo PBKDF2.
+
+Pela interface a importação não roda na requisição: o CSV é guardado em um UserImport e a
+tarefa importar_usuarios (run_import) o processa na fila em segundo plano. O relatório é
+gravado na mesma transação de cada lote, junto com a última linha processada, então uma
+nova tentativa continua do lote seguinte sem perder os links já gerados. A tarefa diária
+limpeza_importacoes (purge_imports) apaga o CSV das importações que falharam e os links
+vencidos dos relatórios que ninguém baixou.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from lavanderia.export import Echo
+from lavanderia.forms import UserImportRowForm
+from lavanderia.models import Job, LavanderiaUser, UserImport
+
+COLUMNS = ('username', 'matricula', 'apartamento', 'telefone', 'email')
+PASSWORD_COLUMN = 'senha'
+BATCH_SIZE = 500
+# Abaixo disso não compensa enviar as senhas para o pool
+MIN_POOL_ROWS = 20
+HASH_CHUNK_SIZE = 16
+
+
+class ImportReport:
+    """Resultado da importação, pelo número da linha no arquivo (a linha 1 é o cabeçalho)."""
+
+    def __init__(self):
+        # (linha, username, link para definir a senha ou '')
+        self.created = []
+        # (linha, username, [mensagens])
+        self.errors = []
+
+    def rows(self):
+        """Linhas do relatório em ordem: (linha, username, situação, link, erros)."""
+        linhas = [(linha, username, 'criado', link, '') for linha, username, link in self.created]
+        linhas += [(linha, username, 'erro', '', '; '.join(erros)) for linha, username, erros in self.errors]
+        return sorted(linhas)
+
+
+REPORT_HEADER = ['linha', 'username', 'situacao', 'link', 'erros']
+
+
+def report_lines(report, header=True):
+    """O relatório em CSV, com os links para definir a senha."""
+    writer = csv.writer(Echo())
+    if header:
+        yield writer.writerow(REPORT_HEADER)
+    for row in report.rows():
+        yield writer.writerow(row)
+
+
+def error_rows(texto):
+    """Linhas com erro de um relatório gravado em UserImport.report, já separadas em colunas."""
+    return [row for row in csv.reader(io.StringIO(texto, newline='')) if row[2] == 'erro']
+
+
+def _form_errors(form):
+    return [f"{campo}: {erro}" if campo != '__all__' else erro
+            for campo, erros in form.errors.items() for erro in erros]
+
+
+def password_link(user):
+    """Caminho do formulário em que o usuário define a senha (o mesmo de "esqueci a senha")."""
+    return reverse('password_reset_confirm', kwargs={
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    })
+
+
+def _hash_passwords(senhas, pool):
+    if pool is None or len(senhas) < MIN_POOL_ROWS:
+        return [make_password(senha) for senha in senhas]
+    return list(pool.map(make_password, senhas, chunksize=HASH_CHUNK_SIZE))
+
+
+def _import_batch(batch, vistos, pool, progress):
+    report = ImportReport()
+    validas = []
+    for numero, row in batch:
+        form = UserImportRowForm({coluna: (row.get(coluna) or '').strip() for coluna in COLUMNS})
+        if form.is_valid():
+            validas.append((numero, form.cleaned_data, (row.get(PASSWORD_COLUMN) or '').strip()))
+        else:
+            report.errors.append((numero, row.get('username') or '', _form_errors(form)))
+
+    # Uma consulta para os usernames e matrículas do lote que já estão cadastrados
+    existentes = LavanderiaUser.objects.filter(
+        Q(username__in=[dados['username'] for _, dados, _ in validas])
+        | Q(matricula__in=[dados['matricula'] for _, dados, _ in validas])
+    ).values_list('username', 'matricula')
+    usernames, matriculas = vistos
+    for username, matricula in existentes:
+        usernames.add(username)
+        matriculas.add(matricula)
+
+    novos = []
+    for numero, dados, senha in validas:
+        erros = []
+        if dados['username'] in usernames:
+            erros.append("username: Já existe um usuário com este nome.")
+        if dados['matricula'] in matriculas:
+            erros.append("matricula: Já existe um usuário com esta matrícula.")
+        if erros:
+            report.errors.append((numero, dados['username'], erros))
+            continue
+        # Linhas repetidas dentro do próprio arquivo também são recusadas
+        usernames.add(dados['username'])
+        matriculas.add(dados['matricula'])
+        novos.append((numero, dados, senha))
+
+    # Só as senhas informadas passam pelo PBKDF2; as demais contas ficam sem senha utilizável
+    hashes = iter(_hash_passwords([senha for _, _, senha in novos if senha], pool))
+    usuarios = [LavanderiaUser(password=next(hashes) if senha else make_password(None), **dados)
+                for _, dados, senha in novos]
+    with transaction.atomic():
+        LavanderiaUser.objects.bulk_create(usuarios)
+        # O link depende da chave primária, preenchida pelo bulk_create
+        report.created += [
+            (numero, usuario.username, '' if senha else password_link(usuario))
+            for (numero, _, senha), usuario in zip(novos, usuarios)
+        ]
+        if progress is not None:
+            progress(report, batch[-1][0])
+    return report
+
+
+def check_columns(leitor):
+    """Levanta ValueError se faltar alguma coluna no cabeçalho do csv.DictReader."""
+    faltando = [coluna for coluna in COLUMNS if coluna not in (leitor.fieldnames or [])]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no CSV: {', '.join(faltando)}.")
+
+
+def import_users(arquivo, batch_size=BATCH_SIZE, workers=None, after_line=0, progress=None):
+    """
+    Cadastra os usuários do CSV (um arquivo de texto aberto) e devolve um ImportReport.
+
+    workers é o número de processos usados para as senhas (padrão: um por CPU; com 1,
+    nenhum processo é criado). Levanta ValueError se faltar alguma coluna no cabeçalho.
+    As linhas até after_line são puladas (retomada de uma importação interrompida) e
+    progress(relatório do lote, última linha do lote), se dado, é chamado dentro da
+    transação de cada lote.
+    """
+    leitor = csv.DictReader(arquivo)
+    check_columns(leitor)
+
+    report = ImportReport()
+    vistos = (set(), set())
+    linhas = ((leitor.line_num, row) for row in leitor if leitor.line_num > after_line)
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while batch := list(islice(linhas, batch_size)):
+            lote = _import_batch(batch, vistos, pool, progress)
+            report.created += lote.created
+            report.errors += lote.errors
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return report
+
+
+def job_key(importacao_id):
+    """Chave do Job que executa a importação (uma tarefa por UserImport)."""
+    return f"importar_usuarios:{importacao_id}"
+
+
+def job_key_id(key):
+    """Id do UserImport a partir da chave do Job (inverso de job_key)."""
+    return int(key.rsplit(':', 1)[1])
+
+
+def run_import(importacao_id, on_batch=None):
+    """
+    Executa uma importação enfileirada (UserImport) a partir da última linha processada.
+
+    O relatório de cada lote é acrescentado ao UserImport na transação do lote, e on_batch
+    (a tarefa renova a reserva do Job) é chamado ali também. Retorna as linhas processadas.
+    """
+    importacao = UserImport.objects.get(id=importacao_id)
+    if importacao.finished_at is not None:
+        return 0
+
+    def progresso(lote, ultima_linha):
+        UserImport.objects.filter(id=importacao_id).update(
+            processed_line=ultima_linha,
+            created_count=F('created_count') + len(lote.created),
+            error_count=F('error_count') + len(lote.errors),
+            report=Concat('report', Value(''.join(report_lines(lote, header=False)))),
+        )
+        if on_batch:
+            on_batch()
+
+    report = import_users(io.StringIO(importacao.content, newline=''), after_line=importacao.processed_line,
+                          progress=progresso)
+    # O CSV não é mais necessário (pode ter senhas informadas); o relatório fica até o
+    # download ou até os links vencerem (purge_imports)
+    UserImport.objects.filter(id=importacao_id).update(content='', finished_at=timezone.now())
+    return len(report.created) + len(report.errors)
+
+
+def report_expiry():
+    """Importações terminadas antes disso têm os links do relatório vencidos."""
+    return timezone.now() - datetime.timedelta(seconds=settings.PASSWORD_RESET_TIMEOUT)
+
+
+def purge_imports():
+    """
+    Apaga o CSV das importações que falharam ou passaram de PASSWORD_RESET_TIMEOUT sem
+    terminar, e deixa só as linhas com erro nos relatórios não baixados cujos links
+    venceram. Retorna quantas importações foram alteradas.
+    """
+    corte = report_expiry()
+    falhas = [job_key_id(key) for key in Job.objects.filter(kind='importar_usuarios', status=Job.FAILED)
+              .values_list('key', flat=True)]
+    alteradas = UserImport.objects.filter(Q(id__in=falhas) | Q(created_at__lt=corte), finished_at__isnull=True) \
+        .exclude(content='').update(content='')
+
+    writer = csv.writer(Echo())
+    vencidas = UserImport.objects.filter(finished_at__lt=corte, downloaded_at__isnull=True).exclude(report='')
+    for importacao in vencidas.only('report'):
+        erros = ''.join(writer.writerow(row) for row in error_rows(importacao.report))
+        if erros != importacao.report:
+            importacao.report = erros
+            importacao.save(update_fields=['report'])
+            alteradas += 1
+    return alteradas
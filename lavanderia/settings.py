@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista, para medir a requisição inteira
+    'lavanderia.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,18 +76,230 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'lavanderia.wsgi.application'
+# lavanderia/asgi.py define LAVANDERIA_SERVER=asgi antes de carregar as configurações;
+# sob WSGI (gunicorn, runserver) a variável fica vazia
+ASGI = os.environ.get('LAVANDERIA_SERVER', '') == 'asgi'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# LAVANDERIA_DB_ENGINE escolhe o banco: sqlite (padrão) ou postgresql. Para o PostgreSQL,
+# LAVANDERIA_DB_NAME/USER/PASSWORD/HOST/PORT; LAVANDERIA_DB_POOL=1 usa o pool de conexões
+# do Django 5.1 (exige pip install "psycopg[binary,pool]").
+
+DB_ENGINE = os.environ.get('LAVANDERIA_DB_ENGINE', 'sqlite')
+DB_POOL = DB_ENGINE == 'postgresql' and os.environ.get('LAVANDERIA_DB_POOL', '') == '1'
+
+# PRAGMAs executados em cada nova conexão com o SQLite (LAVANDERIA_SQLITE_<NOME> para alterar).
+# WAL deixa as leituras seguirem durante uma escrita; busy_timeout (ms) faz a conexão esperar
+# pelo lock de escrita em vez de falhar com "database is locked"; cache_size negativo é em KiB.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('LAVANDERIA_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('LAVANDERIA_SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.environ.get('LAVANDERIA_SQLITE_BUSY_TIMEOUT', 5000)),
+    'cache_size': int(os.environ.get('LAVANDERIA_SQLITE_CACHE_SIZE', -20000)),
+    'mmap_size': int(os.environ.get('LAVANDERIA_SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+}
+
+DATABASE_BACKENDS = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('LAVANDERIA_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {nome}={valor}' for nome, valor in SQLITE_PRAGMAS.items()),
+            # Transações pegam o lock de escrita no BEGIN: uma transação que leu e depois
+            # tenta escrever não pode falhar na hora por causa de outra escrita
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Banco de teste em arquivo (e não em memória), para que os testes de carga possam
+        # usá-lo a partir de vários processos
+        'TEST': {
+            'NAME': os.environ.get('LAVANDERIA_TEST_DB_NAME',
+                                   os.path.join(tempfile.gettempdir(), 'lavanderia-test.sqlite3')),
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('LAVANDERIA_DB_NAME', 'lavanderia'),
+        'USER': os.environ.get('LAVANDERIA_DB_USER', 'lavanderia'),
+        'PASSWORD': os.environ.get('LAVANDERIA_DB_PASSWORD', ''),
+        'HOST': os.environ.get('LAVANDERIA_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('LAVANDERIA_DB_PORT', '5432'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('LAVANDERIA_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('LAVANDERIA_DB_POOL_MAX', 10)),
+            },
+        } if DB_POOL else {},
+    },
+}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **DATABASE_BACKENDS[DB_ENGINE],
+        # Conexão reaproveitada entre requisições por até CONN_MAX_AGE segundos (0: uma por
+        # requisição) e testada antes do reuso. Com o pool quem reaproveita é o pool, e
+        # o Django exige CONN_MAX_AGE = 0. Sob ASGI o padrão também é 0, como o Django
+        # recomenda: o código síncrono roda nas threads do executor e a conexão persistente
+        # de cada thread não é fechada ao fim da requisição; reaproveite pelo pool.
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('LAVANDERIA_DB_CONN_MAX_AGE', 0 if ASGI else 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Novas tentativas das escritas de agendamento e de presença se o banco continuar travado
+# após o busy_timeout, com espera exponencial a partir de DB_WRITE_RETRY_DELAY segundos
+DB_WRITE_RETRIES = int(os.environ.get('LAVANDERIA_DB_WRITE_RETRIES', 3))
+DB_WRITE_RETRY_DELAY = float(os.environ.get('LAVANDERIA_DB_WRITE_RETRY_DELAY', 0.05))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LAVANDERIA_CACHE escolhe o backend: locmem (padrão, um cache por processo), file ou redis.
+# Com vários workers use file ou redis, para que a invalidação valha para todos; por isso
+# os caches de sessão, de usuário e de horários disponíveis só são ligados com eles.
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LAVANDERIA_CACHE_LOCATION',
+                                   os.path.join(tempfile.gettempdir(), 'lavanderia-cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('LAVANDERIA_CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+    },
+}
+
+CACHE = os.environ.get('LAVANDERIA_CACHE', 'locmem')
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE],
+}
+# Cache visto por todos os workers: o que um processo apaga deixa de valer para os outros
+SHARED_CACHE = CACHE in ('file', 'redis')
+
+# Sessões e usuário autenticado
+# LAVANDERIA_SESSION_ENGINE: cached_db (a sessão é lida do cache e só é gravada no banco
+# quando muda), signed_cookies (a sessão fica no cookie assinado, sem leitura nem escrita
+# no banco; um cookie copiado continua valendo até expirar, mesmo depois do logout) ou db
+# (sempre no banco). O padrão é cached_db com um cache compartilhado e db com locmem: o
+# logout só apagaria a sessão do cache do worker que o atendeu, e os outros continuariam
+# aceitando o cookie.
+
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE_NAME = os.environ.get('LAVANDERIA_SESSION_ENGINE', 'cached_db' if SHARED_CACHE else 'db')
+if SESSION_ENGINE_NAME == 'cached_db' and not SHARED_CACHE:
+    raise ImproperlyConfigured("LAVANDERIA_SESSION_ENGINE=cached_db exige LAVANDERIA_CACHE=file ou redis.")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_ENGINE_NAME]
+
+# O usuário da sessão é lido do cache (lavanderia/auth.py)
+AUTHENTICATION_BACKENDS = ['lavanderia.auth.CachedModelBackend']
+# Tempo máximo (segundos) que o usuário fica em cache; 0 desativa o cache. Só é ligado
+# com um cache compartilhado: com locmem, bolsista revogado ou senha trocada só seriam
+# vistos pelo worker que fez a mudança.
+USER_CACHE_TIMEOUT = int(os.environ.get('LAVANDERIA_USER_CACHE_TIMEOUT', 300 if SHARED_CACHE else 0))
+if USER_CACHE_TIMEOUT and not SHARED_CACHE:
+    raise ImproperlyConfigured("LAVANDERIA_USER_CACHE_TIMEOUT exige LAVANDERIA_CACHE=file ou redis.")
+
+# Tempo máximo (segundos) que uma página de horários disponíveis fica em cache; 0 desativa
+# o cache. Só é ligado com um cache compartilhado: com locmem, um agendamento só invalidaria
+# as páginas do worker que o atendeu, e os outros mostrariam horários já ocupados.
+AVAILABILITY_CACHE_TIMEOUT = int(os.environ.get('LAVANDERIA_AVAILABILITY_CACHE_TIMEOUT', 60 if SHARED_CACHE else 0))
+if AVAILABILITY_CACHE_TIMEOUT and not SHARED_CACHE:
+    raise ImproperlyConfigured("LAVANDERIA_AVAILABILITY_CACHE_TIMEOUT exige LAVANDERIA_CACHE=file ou redis.")
+
+
+# Eventos de disponibilidade (Server-Sent Events, exige ASGI)
+# O fluxo horarios/eventos/ só é servido sob ASGI: sob WSGI o Django consome o gerador
+# assíncrono inteiro antes de enviar o primeiro byte, e cada conexão prenderia um worker
+# para sempre. Sem o fluxo, a página de horários consulta api/horarios/ (com ETag) a cada
+# AVAILABILITY_POLL_SECONDS. LAVANDERIA_LIVE_EVENTS=0 desliga o fluxo também sob ASGI.
+# LAVANDERIA_EVENT_HUB: memory (padrão, eventos ficam no processo) ou redis (entre workers)
+
+LIVE_EVENTS = ASGI and os.environ.get('LAVANDERIA_LIVE_EVENTS', '1') == '1'
+AVAILABILITY_POLL_SECONDS = int(os.environ.get('LAVANDERIA_AVAILABILITY_POLL_SECONDS', 30))
+
+EVENT_HUB = os.environ.get('LAVANDERIA_EVENT_HUB', 'memory')
+EVENT_HUB_LOCATION = os.environ.get('LAVANDERIA_EVENT_HUB_LOCATION', 'redis://127.0.0.1:6379')
+# Intervalo (segundos) entre comentários de keep-alive em conexões ociosas
+EVENT_KEEPALIVE = int(os.environ.get('LAVANDERIA_EVENT_KEEPALIVE', 30))
+
+# Horários e reservas que começaram há mais dias que isso são movidos para as tabelas
+# de arquivo pelo comando archive_old_slots (mínimo: a janela de 30 dias das faltas)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('LAVANDERIA_ARCHIVE_AFTER_DAYS', 90))
+
+# Tamanho máximo (bytes) do CSV da importação de moradores pela interface. A importação
+# roda na fila de tarefas (importar_usuarios), fora da requisição; arquivos maiores podem
+# ser importados pelo comando import_users.
+USER_IMPORT_MAX_BYTES = int(os.environ.get('LAVANDERIA_USER_IMPORT_MAX_BYTES', 2 * 1024 * 1024))
+
+
+# Tarefas em segundo plano (lavanderia/jobs.py), executadas pelo comando run_jobs
+
+# Tarefas executadas ao mesmo tempo por worker
+JOB_CONCURRENCY = int(os.environ.get('LAVANDERIA_JOB_CONCURRENCY', 2))
+# Intervalo (segundos) entre verificações da fila quando não há tarefas
+JOB_POLL_SECONDS = float(os.environ.get('LAVANDERIA_JOB_POLL_SECONDS', 5))
+JOB_MAX_ATTEMPTS = int(os.environ.get('LAVANDERIA_JOB_MAX_ATTEMPTS', 5))
+# Espera (segundos) antes da segunda tentativa; dobra a cada nova falha
+JOB_RETRY_DELAY = int(os.environ.get('LAVANDERIA_JOB_RETRY_DELAY', 30))
+# Tempo (segundos) após o qual uma tarefa em execução é considerada abandonada e retomada
+JOB_LEASE_SECONDS = int(os.environ.get('LAVANDERIA_JOB_LEASE_SECONDS', 600))
+# Tamanho da janela de tempo das tarefas periódicas (uma execução por janela)
+JOB_INTERVAL_MINUTES = int(os.environ.get('LAVANDERIA_JOB_INTERVAL_MINUTES', 15))
+# Tarefas concluídas são apagadas depois desse número de dias
+JOB_RETENTION_DAYS = int(os.environ.get('LAVANDERIA_JOB_RETENTION_DAYS', 7))
+
+# Avisos aos moradores (lavanderia/notifications.py)
+NOTIFIER = os.environ.get('LAVANDERIA_NOTIFIER', 'lavanderia.notifications.ConsoleNotifier')
+NOTIFIER_FILE = os.environ.get('LAVANDERIA_NOTIFIER_FILE',
+                               os.path.join(tempfile.gettempdir(), 'lavanderia-notificacoes.jsonl'))
+# Antecedência (minutos) do lembrete de um agendamento; 0 desativa os lembretes
+REMINDER_MINUTES = int(os.environ.get('LAVANDERIA_REMINDER_MINUTES', 60))
+
+# LAVANDERIA_AUTO_NO_SHOW=1 registra falta nas reservas cuja presença não foi conferida pela
+# equipe até NO_SHOW_GRACE_MINUTES após o fim do horário. Desativado por padrão: com ele
+# ligado, a equipe precisa confirmar a presença de cada agendamento.
+AUTO_NO_SHOW = os.environ.get('LAVANDERIA_AUTO_NO_SHOW', '') == '1'
+NO_SHOW_GRACE_MINUTES = int(os.environ.get('LAVANDERIA_NO_SHOW_GRACE_MINUTES', 30))
+# LAVANDERIA_RELEASE_BLOCKED=1 cancela os agendamentos futuros de quem foi bloqueado por
+# excesso de faltas, liberando os horários para os demais moradores
+RELEASE_BLOCKED = os.environ.get('LAVANDERIA_RELEASE_BLOCKED', '') == '1'
+
+
+# Instrumentação das requisições (lavanderia/metrics.py)
+# Requisições mais lentas que isso (ms) são registradas com o SQL executado
+SLOW_REQUEST_MS = int(os.environ.get('LAVANDERIA_SLOW_REQUEST_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Uma linha JSON por requisição (INFO); as lentas como WARNING
+        'lavanderia.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('LAVANDERIA_REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Uma linha JSON por tarefa executada, com a vazão (itens por segundo)
+        'lavanderia.jobs': {
+            'handlers': ['console'],
+            'level': os.environ.get('LAVANDERIA_JOB_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
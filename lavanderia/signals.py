@@ -0,0 +1,77 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lavanderia.analytics import mark_dirty, slot_day
+from lavanderia.auth import invalidate_user
+from lavanderia.booking import refresh_eligibility
+from lavanderia.cache import bump_availability_version
+from lavanderia.events import publish_on_commit
+from lavanderia.models import AvaibleSlot, LavanderiaUser, ReservedSlot
+
+
+@receiver(post_save, sender=ReservedSlot)
+@receiver(post_delete, sender=ReservedSlot)
+def update_eligibility(sender, instance, **kwargs):
+    # Reserva criada, cancelada ou presença alterada: atualiza os contadores do usuário
+    refresh_eligibility(instance.user_id, create=False)
+
+
+@receiver(post_save, sender=AvaibleSlot)
+@receiver(post_delete, sender=AvaibleSlot)
+@receiver(post_save, sender=ReservedSlot)
+@receiver(post_delete, sender=ReservedSlot)
+def invalidate_availability(sender, **kwargs):
+    bump_availability_version()
+
+
+@receiver(post_save, sender=ReservedSlot)
+def publish_slot_booked(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit('slot-booked', slot=instance.slot_id)
+
+
+@receiver(post_delete, sender=ReservedSlot)
+def publish_slot_freed(sender, instance, **kwargs):
+    publish_on_commit('slot-freed', slot=instance.slot_id)
+
+
+@receiver(post_save, sender=AvaibleSlot)
+def publish_slot_added(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit('slot-added', slot=instance.pk)
+
+
+@receiver(post_delete, sender=AvaibleSlot)
+def publish_slot_removed(sender, instance, **kwargs):
+    publish_on_commit('slot-removed', slot=instance.pk)
+
+
+@receiver(pre_save, sender=AvaibleSlot)
+def remember_previous_start(sender, instance, **kwargs):
+    # Se o horário mudar de dia, o dia antigo também precisa ser reagregado
+    if instance.pk is not None:
+        instance._previous_start = AvaibleSlot.objects.filter(pk=instance.pk).values_list('start', flat=True).first()
+
+
+@receiver(post_save, sender=AvaibleSlot)
+@receiver(post_delete, sender=AvaibleSlot)
+def mark_slot_day_dirty(sender, instance, **kwargs):
+    starts = {instance.start, getattr(instance, '_previous_start', None)} - {None}
+    mark_dirty(*(slot_day(start) for start in starts))
+
+
+@receiver(post_save, sender=ReservedSlot)
+@receiver(post_delete, sender=ReservedSlot)
+def mark_reservation_day_dirty(sender, instance, **kwargs):
+    try:
+        mark_dirty(slot_day(instance.slot.start))
+    except AvaibleSlot.DoesNotExist:
+        # Reserva removida junto com o horário, cujo dia já foi marcado
+        pass
+
+
+@receiver(post_save, sender=LavanderiaUser)
+@receiver(post_delete, sender=LavanderiaUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Senha, bolsista ou is_active alterados: a próxima requisição relê o usuário no banco
+    invalidate_user(instance.pk)
@@ -0,0 +1,89 @@
+import bisect
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from lavanderia.analytics import mark_dirty, slot_day
+from lavanderia.cache import bump_availability_version
+from lavanderia.events import publish_on_commit
+from lavanderia.models import AvaibleSlot
+
+BATCH_SIZE = 1000
+
+
+def expand_schedule(washers, weekdays, opening, closing, duration, first_day, last_day):
+    """
+    Gera em memória os slots de um modelo de agenda.
+
+    Para cada dia entre first_day e last_day (inclusive) cujo weekday() está em
+    weekdays, cria slots consecutivos de `duration` entre opening e closing, para
+    cada lavadora. Um slot que terminaria depois de closing não é criado.
+    """
+    weekdays = set(weekdays)
+    slots = []
+    day = first_day
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            start = timezone.make_aware(datetime.datetime.combine(day, opening))
+            end_of_day = timezone.make_aware(datetime.datetime.combine(day, closing))
+            while start + duration <= end_of_day:
+                slots.extend(AvaibleSlot(washer=washer, start=start, duration=duration, end=start + duration)
+                             for washer in washers)
+                start += duration
+        day += datetime.timedelta(days=1)
+    return slots
+
+
+def split_conflicts(candidates):
+    """
+    Separa os candidatos em (livres, conflitantes) comparando com os slots já cadastrados.
+
+    Os slots existentes que se sobrepõem ao período dos candidatos são lidos em uma
+    única consulta; cada candidato é então verificado com busca binária sobre os
+    intervalos existentes da sua lavadora, ordenados pelo início.
+    """
+    if not candidates:
+        return [], []
+
+    existentes = defaultdict(list)
+    for washer_id, start, end in AvaibleSlot.objects.filter(
+        washer_id__in={slot.washer_id for slot in candidates},
+    ).overlapping(
+        min(slot.start for slot in candidates),
+        max(slot.end for slot in candidates),
+    ).order_by('start').values_list('washer_id', 'start', 'end'):
+        existentes[washer_id].append((start, end))
+
+    intervalos = {}
+    for washer_id, lista in existentes.items():
+        # max_end[i] é o maior término entre os i+1 primeiros intervalos existentes
+        max_end = []
+        for _, end in lista:
+            max_end.append(max(end, max_end[-1]) if max_end else end)
+        intervalos[washer_id] = ([start for start, _ in lista], max_end)
+
+    livres, conflitantes = [], []
+    for slot in candidates:
+        starts, max_end = intervalos.get(slot.washer_id, ([], []))
+        # Intervalos existentes que começam antes do fim do candidato
+        i = bisect.bisect_left(starts, slot.end)
+        if i and max_end[i - 1] > slot.start:
+            conflitantes.append(slot)
+        else:
+            livres.append(slot)
+    return livres, conflitantes
+
+
+def generate_slots(washers, weekdays, opening, closing, duration, first_day, last_day, batch_size=BATCH_SIZE):
+    """Expande o modelo de agenda e grava os slots sem conflito. Retorna (criados, conflitantes)."""
+    candidates = expand_schedule(washers, weekdays, opening, closing, duration, first_day, last_day)
+    with transaction.atomic():
+        livres, conflitantes = split_conflicts(candidates)
+        AvaibleSlot.objects.bulk_create(livres, batch_size=batch_size)
+        # bulk_create não envia post_save
+        bump_availability_version()
+        publish_on_commit('slots-added', count=len(livres))
+        mark_dirty(*{slot_day(slot.start) for slot in livres})
+    return livres, conflitantes
@@ -1,6 +1,7 @@
 from django.urls import path
-from lavanderia.views import WasherListCreateView, AvaibleSlotView, WasherDeleteView, AgendamentosView, \
-    ReservedSlotListView, LavanderiaUserListView, LavanderiaUserDeleteView
+from lavanderia.views import WasherListCreateView, AvaibleSlotView, ReservedSlotListView, LavanderiaUserListView, \
+    LavanderiaUserDeleteView, SlotScheduleView, ReservationExportView, AnalyticsView, ReservationHistoryView, MetricsView, \
+    SlotAutocompleteView, UserImportView, UserImportDetailView, LotteryRoundListView
 
 urlpatterns = [
     path('washers/', WasherListCreateView.as_view(), name='washer_list'),  # CREATE E LIST
@@ -8,8 +9,18 @@ urlpatterns = [
 
     path('timeslots/', AvaibleSlotView.as_view(), name="time_slot_list"), # CREATE E LIST
     path('timeslots/<int:pk>', AvaibleSlotView.as_view(), name="time_update_delete"), # UPDATE e DELETE
+    path('timeslots/gerar/', SlotScheduleView.as_view(), name="time_slot_generate"),
+    path('timeslots/livres/', SlotAutocompleteView.as_view(), name="slot_autocomplete"),
 
     path('agendamentos/', ReservedSlotListView.as_view(), name='reserved_slots'),
+    path('agendamentos/exportar/', ReservationExportView.as_view(), name='reserved_slots_export'),
+    path('agendamentos/historico/', ReservationHistoryView.as_view(), name='reserved_slots_history'),
+    path('sorteios/', LotteryRoundListView.as_view(), name='lottery_rounds'),  # CREATE E LIST
+    path('sorteios/<int:pk>', LotteryRoundListView.as_view(), name='lottery_round_update_delete'),  # SORTEAR E DELETE
     path('usuarios/', LavanderiaUserListView.as_view(), name='user_list'),
+    path('usuarios/importar/', UserImportView.as_view(), name='user_import'),
+    path('usuarios/importar/<int:pk>/', UserImportDetailView.as_view(), name='user_import_detail'),
+    path('estatisticas/', AnalyticsView.as_view(), name='analytics'),
+    path('metricas/', MetricsView.as_view(), name='metrics'),
     path('usuarios/<int:pk>', LavanderiaUserDeleteView.as_view(), name='user_delete'),
 ]
@@ -0,0 +1,184 @@
+"""
+Tarefas executadas pela fila em segundo plano (lavanderia/jobs.py).
+
+Cada tarefa recebe o Job e devolve quantos itens processou. Todas podem ser repetidas
+sem efeito duplicado: processam em lotes de BATCH_SIZE apenas o que ainda está pendente
+(lembrete não enviado, presença não conferida, reserva de usuário bloqueado), então uma
+nova tentativa continua de onde a anterior parou.
+
+Antes de cada lote a tarefa renova a reserva do Job (renew_lease), para que uma execução
+longa não seja retomada por outro worker depois de JOB_LEASE_SECONDS. Se outro worker já
+a retomou, renew_lease levanta LeaseLost e esta execução para sem gravar o resultado.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from lavanderia.analytics import aggregate_usage, mark_dirty, slot_day
+from lavanderia.archive import archive_old_slots
+from lavanderia.booking import cancel_reservation, refresh_eligibility
+from lavanderia.lottery import draw_due_rounds
+from lavanderia.models import Job, ReservedSlot
+from lavanderia.notifications import get_notifier
+from lavanderia.provisioning import purge_imports, run_import
+
+BATCH_SIZE = 200
+# Só as reservas que terminaram nesse período são consideradas pela tarefa de faltas
+NO_SHOW_LOOKBACK = datetime.timedelta(days=1)
+
+
+class LeaseLost(Exception):
+    """A reserva da tarefa expirou e outro worker a retomou."""
+
+
+def renew_lease(job):
+    """Estende a reserva da tarefa em execução por mais JOB_LEASE_SECONDS."""
+    renovada = Job.objects.filter(id=job.id, status=Job.RUNNING, attempts=job.attempts).update(
+        locked_until=timezone.now() + datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS))
+    if not renovada:
+        raise LeaseLost(f"A tarefa {job.id} foi retomada por outro worker.")
+
+
+def _horario(slot):
+    return f"{timezone.localtime(slot.start):%d/%m às %H:%M} na {slot.washer.name}"
+
+
+def send_reminders(job):
+    """Lembra os usuários dos agendamentos que começam nos próximos REMINDER_MINUTES."""
+    agora = timezone.now()
+    pendentes = ReservedSlot.objects.filter(
+        reminded_at__isnull=True,
+        slot__start__gt=agora,
+        slot__start__lte=agora + datetime.timedelta(minutes=settings.REMINDER_MINUTES),
+    ).order_by('slot__start', 'id')
+    notifier = get_notifier()
+    total = 0
+    while True:
+        renew_lease(job)
+        # O lote é reservado (reminded_at gravado) antes do envio, na mesma transação que o
+        # escolhe: nem uma execução concorrente nem uma nova tentativa o enviam de novo. Se o
+        # envio falhar no meio, os lembretes restantes do lote se perdem em vez de duplicar.
+        with transaction.atomic():
+            ids = list(pendentes.select_for_update(skip_locked=True, of=('self',))
+                       .values_list('id', flat=True)[:BATCH_SIZE])
+            ReservedSlot.objects.filter(id__in=ids).update(reminded_at=agora)
+        if not ids:
+            break
+        reservas = ReservedSlot.objects.filter(id__in=ids).select_related('slot__washer', 'user') \
+            .order_by('slot__start', 'id')
+        notifier.send_messages([
+            (reserva.user, "Lembrete de agendamento", f"Você tem um agendamento em {_horario(reserva.slot)}.")
+            for reserva in reservas
+        ])
+        total += len(ids)
+    return total
+
+
+def mark_no_shows(job):
+    """Registra falta nas reservas que terminaram há mais de NO_SHOW_GRACE_MINUTES sem presença conferida."""
+    agora = timezone.now()
+    corte = agora - datetime.timedelta(minutes=settings.NO_SHOW_GRACE_MINUTES)
+    pendentes = ReservedSlot.objects.filter(
+        presence_checked=False,
+        slot__start__gte=corte - NO_SHOW_LOOKBACK,
+        slot__end__lte=corte,
+    ).order_by('id')
+    total = 0
+    while reservas := list(pendentes.values_list('id', 'user_id', 'slot__start')[:BATCH_SIZE]):
+        renew_lease(job)
+        with transaction.atomic():
+            # UPDATE direto, sem os sinais: a elegibilidade dos usuários e os dias dos
+            # agregados são atualizados uma vez por lote
+            ReservedSlot.objects.filter(id__in=[id_ for id_, _, _ in reservas], presence_checked=False).update(
+                presence=False, presence_checked=True)
+            for user_id in {user_id for _, user_id, _ in reservas}:
+                refresh_eligibility(user_id, agora, create=False)
+            mark_dirty(*{slot_day(start) for _, _, start in reservas})
+        total += len(reservas)
+    return total
+
+
+def release_blocked(job):
+    """Cancela os agendamentos futuros dos usuários bloqueados por excesso de faltas."""
+    agora = timezone.now()
+    pendentes = ReservedSlot.objects.filter(
+        slot__start__gt=agora,
+        user__eligibility__blocked_until__gte=agora,
+    ).select_related('slot__washer', 'user').order_by('id')
+    notifier = get_notifier()
+    total = 0
+    while reservas := list(pendentes[:BATCH_SIZE]):
+        renew_lease(job)
+        for reserva in reservas:
+            # Pelo modelo, para que os sinais liberem o horário (cache, eventos, elegibilidade)
+            # e o próximo da lista de espera o receba
+            cancel_reservation(reserva)
+        notifier.send_messages([
+            (reserva.user, "Agendamento cancelado",
+             f"Seu agendamento em {_horario(reserva.slot)} foi cancelado por excesso de faltas.")
+            for reserva in reservas
+        ])
+        total += len(reservas)
+    return total
+
+
+def run_aggregate_usage(job):
+    return aggregate_usage()
+
+
+def run_archive(job):
+    return archive_old_slots(on_batch=lambda: renew_lease(job))
+
+
+def run_draws(job):
+    return draw_due_rounds()
+
+
+def run_user_import(job):
+    return run_import(job.payload['importacao'], on_batch=lambda: renew_lease(job))
+
+
+def purge_user_imports(job):
+    return purge_imports()
+
+
+def purge_jobs(job):
+    """Apaga as tarefas terminadas há mais de JOB_RETENTION_DAYS."""
+    corte = timezone.now() - datetime.timedelta(days=settings.JOB_RETENTION_DAYS)
+    apagadas, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=corte).delete()
+    return apagadas
+
+
+TASKS = {
+    'lembretes': send_reminders,
+    'faltas': mark_no_shows,
+    'liberar_bloqueados': release_blocked,
+    'agregados': run_aggregate_usage,
+    'arquivamento': run_archive,
+    'sorteios': run_draws,
+    'importar_usuarios': run_user_import,
+    'limpeza_importacoes': purge_user_imports,
+    'limpeza_tarefas': purge_jobs,
+}
+
+
+def periodic_tasks():
+    """Tarefas periódicas habilitadas nas configurações e o intervalo de cada uma."""
+    janela = datetime.timedelta(minutes=settings.JOB_INTERVAL_MINUTES)
+    tarefas = {
+        'agregados': janela,
+        # As rodadas com inscrições encerradas são sorteadas até uma janela depois de closes_at
+        'sorteios': janela,
+        'arquivamento': datetime.timedelta(days=1),
+        'limpeza_importacoes': datetime.timedelta(days=1),
+        'limpeza_tarefas': datetime.timedelta(days=1),
+    }
+    if settings.REMINDER_MINUTES:
+        tarefas['lembretes'] = janela
+    if settings.AUTO_NO_SHOW:
+        tarefas['faltas'] = janela
+    if settings.RELEASE_BLOCKED:
+        tarefas['liberar_bloqueados'] = janela
+    return tarefas
@@ -0,0 +1,60 @@
+"""
+O número de consultas de cada listagem não pode depender do número de linhas:
+cada rota é acessada com cerca de 10 e depois com cerca de 1000 linhas.
+"""
+import asyncio
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from lavanderia import staff_urls, usuario_urls
+from lavanderia.management.seed import seed_database
+from lavanderia.models import LavanderiaUser, Washer
+
+# Prefixo com que cada módulo de URLs é incluído em lavanderia/urls.py
+URL_MODULES = {
+    usuario_urls: '/',
+    staff_urls: '/bolsista/',
+}
+
+# Parâmetros de seed_database que produzem aproximadamente N linhas por listagem
+POUCAS_LINHAS = dict(washers=1, dias=1, slots_por_dia=10, usuarios=10, dias_futuros=1)
+MUITAS_LINHAS = dict(washers=10, dias=10, slots_por_dia=10, usuarios=1000, dias_futuros=10)
+
+
+def list_paths():
+    # Somente as rotas sem parâmetros são listagens; as demais alteram dados.
+    # Views assíncronas são fluxos de eventos, que não terminam.
+    for module, prefix in URL_MODULES.items():
+        for pattern in module.urlpatterns:
+            if not pattern.pattern.converters and not asyncio.iscoroutinefunction(pattern.callback):
+                yield prefix + str(pattern.pattern)
+
+
+class QueryCountTests(TestCase):
+    def test_list_query_counts_do_not_depend_on_rows(self):
+        bolsista = LavanderiaUser.objects.create(username="bolsista", bolsista=True)
+        self.client.force_login(bolsista)
+
+        seed_database(ocupacao=0.5, **POUCAS_LINHAS)
+        contagens = {}
+        for path in list_paths():
+            # Mede sempre o caminho sem cache
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            contagens[path] = len(queries)
+
+        # Troca os dados pelos do cenário com muitas linhas
+        Washer.objects.all().delete()
+        LavanderiaUser.objects.exclude(pk=bolsista.pk).delete()
+        seed_database(ocupacao=0.5, **MUITAS_LINHAS)
+        for path, consultas in contagens.items():
+            with self.subTest(path=path):
+                cache.clear()
+                with self.assertNumQueries(consultas):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,67 @@
+"""
+As consultas mais frequentes não podem fazer leitura completa de tabela, medidas pelo
+EXPLAIN QUERY PLAN do SQLite com um ano de horários.
+"""
+import datetime
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from lavanderia.booking import JANELA_FALTAS, slot_queryset
+from lavanderia.management.seed import seed_database
+from lavanderia.models import AvaibleSlot, BookingEligibility, LavanderiaUser, ReservedSlot, Washer
+from lavanderia.views import AvailableSlotListView, AvaibleSlotView, ReservedSlotListView, \
+    UserReservationListView
+
+# Qualquer SCAN em uma tabela do app é uma leitura completa (da tabela ou do índice)
+FULL_SCAN = re.compile(r'\bSCAN (lavanderia_\w+)')
+
+
+def hot_queries():
+    factory = RequestFactory()
+    user = LavanderiaUser.objects.first()
+    washer = Washer.objects.first()
+    slot = AvaibleSlot.objects.order_by('-start').first()
+    inicio = timezone.now()
+
+    def view_queryset(view_class, path='/'):
+        request = factory.get(path)
+        request.user = user
+        view = view_class()
+        view.setup(request)
+        return view.get_queryset()
+
+    return {
+        'horarios': view_queryset(AvailableSlotListView)[:AvailableSlotListView.paginate_by],
+        'time_slot_list': view_queryset(AvaibleSlotView)[:AvaibleSlotView.paginate_by],
+        'reserved_slots': view_queryset(ReservedSlotListView),
+        'meus_agendamentos': view_queryset(UserReservationListView),
+        'sobreposicao': AvaibleSlot.objects.filter(washer=washer).overlapping(
+            inicio, inicio + datetime.timedelta(hours=1)),
+        'elegibilidade': BookingEligibility.objects.filter(user_id=user.pk),
+        'recalculo_elegibilidade': ReservedSlot.objects.filter(
+            user=user, presence=False, slot__start__gte=inicio - JANELA_FALTAS).order_by('-slot__start'),
+        'agendamento': slot_queryset(slot.pk),
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', "A verificação de planos só conhece o formato do SQLite.")
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_database(washers=8, dias=365, usuarios=300)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "\n".join(linha[-1] for linha in cursor.fetchall())
+
+    def test_hot_queries_use_indexes(self):
+        for nome, queryset in hot_queries().items():
+            with self.subTest(nome):
+                plano = self.explain(queryset)
+                self.assertIsNone(FULL_SCAN.search(plano), f"Leitura completa de tabela:\n{plano}")
@@ -1,13 +1,26 @@
+from django.conf import settings
 from django.urls import path
 
-from lavanderia.views import AvailableSlotListView, UserReservationListView, ReservationCancelView, schedule_slot
+from lavanderia.views import AvailableSlotListView, UserReservationListView, ReservationCancelView, schedule_slot, \
+    available_slots_api, availability_events, WaitlistLeaveView, LotteryListView, LotteryPreferenceView
 
 urlpatterns = [
     path('', AvailableSlotListView.as_view(), name='horarios'),  # LISTA HORARIOS DISPONIVEIS
     path('horarios/', AvailableSlotListView.as_view(), name='horarios'),  # LISTA HORARIOS DISPONIVEIS
     path('horarios/<int:pk>', schedule_slot, name='schedule_slot'),  # UPDATE E DELETE
+    path('api/horarios/', available_slots_api, name='api_horarios'),  # HORARIOS DISPONIVEIS EM JSON
 
     path('agendamentos/', UserReservationListView.as_view(), name="meus_agendamentos"),  # Listar Agendamentos
     path('agendamentos/<int:pk>', ReservationCancelView.as_view(), name="cancelar_agendamento"),  # Listar Agendamentos
+    path('agendamentos/espera/<int:pk>', WaitlistLeaveView.as_view(), name="sair_espera"),  # Sair da lista de espera
+
+    path('sorteios/', LotteryListView.as_view(), name="sorteios"),  # Sorteios com inscrições abertas
+    path('sorteios/<int:pk>/', LotteryPreferenceView.as_view(), name="sorteio_preferencias"),  # Enviar preferências
 
 ]
+
+if settings.LIVE_EVENTS:
+    # Só sob ASGI: sob WSGI cada conexão prenderia um worker (ver LIVE_EVENTS em settings)
+    urlpatterns.append(
+        path('horarios/eventos/', availability_events, name='horarios_eventos'),  # MUDANCAS EM TEMPO REAL (SSE)
+    )
@@ -1,22 +1,45 @@
+import asyncio
+import csv
 import datetime
-from time import strptime, mktime
-from typing import Callable
+import hashlib
+import io
+import json
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
-from django.db.models import ObjectDoesNotExist
-from django.http import HttpResponseForbidden
+from django.core.paginator import Page
+from django.db import OperationalError, transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.timezone import now
 from django.views import View
-from django.views.generic import ListView, FormView, DeleteView
-
-from lavanderia.forms import WasherForm, AvaibleSlotForm, ReservedSlotForm, DateFilterForm, LavanderiaUserForm
-from lavanderia.models import Washer, AvaibleSlot, ReservedSlot, LavanderiaUser
+from django.views.decorators.http import condition, require_GET
+from django.views.generic import ListView, FormView, DeleteView, TemplateView
+
+from lavanderia.analytics import usage_report
+from lavanderia.archive import reservation_history
+from lavanderia.booking import BookingError, SlotTakenError, available_slots, book_slot, cancel_reservation, \
+    check_user_rules, confirm_presence, join_waitlist, toggle_presence, unreserved_slots
+from lavanderia.cache import get_availability, set_availability
+from lavanderia.events import hub
+from lavanderia.export import FORMATS, Echo, export_lines, reservation_rows
+from lavanderia.forms import WasherForm, AvaibleSlotForm, ReservedSlotForm, DateFilterForm, LavanderiaUserForm, \
+    SlotScheduleForm, ExportForm, PeriodForm, HistoryForm, UserImportForm, LotteryRoundForm, LotteryPreferenceForm, \
+    slot_label
+from lavanderia.metrics import metrics_text
+from lavanderia.jobs import enqueue
+from lavanderia.lottery import draw_round, save_preferences
+from lavanderia.models import Washer, AvaibleSlot, ReservedSlot, LavanderiaUser, WaitlistEntry, LotteryRound, Job, \
+    UserImport
+from lavanderia.pagination import KeysetPaginationMixin, after
+from lavanderia.provisioning import REPORT_HEADER, check_columns, error_rows, job_key, report_expiry
+from lavanderia.slots import generate_slots
 
 
 @login_required
@@ -30,6 +53,20 @@ def user_logout(request):
     return redirect("horarios", permanent=True)
 
 
+def get_selected_date(request):
+    """
+    Início (00:00, fuso local) do dia escolhido em ?data=AAAA-MM-DD, ou de hoje.
+
+    Retornar um datetime em vez de uma data permite filtrar direto na coluna
+    start (start__gte), aproveitando os índices.
+    """
+    try:
+        selected_date = datetime.date.fromisoformat(request.GET.get('data', ''))
+    except ValueError:
+        selected_date = timezone.localdate()
+    return timezone.make_aware(datetime.datetime.combine(selected_date, datetime.time.min))
+
+
 class StaffRequireBolsista(UserPassesTestMixin):
     login_url = "/"
     raise_exception = True
@@ -47,222 +84,93 @@ class StaffRequireBolsista(UserPassesTestMixin):
         return super().handle_no_permission()
 
 
-# WASHERS
-class WasherFormView(FormView):
-    model = Washer
-    form_class = WasherForm
-    success_url = "/bolsista/washers/"
-    template_name = "lavanderia/washer_list.html"
+class ListFormView(KeysetPaginationMixin, ListView):
+    """
+    Listagem com o formulário de criação e edição na mesma página.
+
+    GET lista os objetos. POST salva o formulário (editando o objeto de `pk`, se houver)
+    ou, com _method=delete, remove o objeto de `pk`. Se o formulário tiver erros, a
+    listagem é montada e renderizada uma única vez, com o formulário preenchido.
+    """
+    form_class = None
+    form_context_name = 'form'
+    success_url = None
+
+    def get_context_data(self, *, form=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context[self.form_context_name] = form or self.form_class()
+        return context
 
     def post(self, request, *args, **kwargs):
-        w_id = self.kwargs.get('pk')
-        if w_id is not None:
-            try:
-                washer = Washer.objects.get(id=w_id)
-            except ObjectDoesNotExist:
+        instance = None
+        if 'pk' in self.kwargs:
+            instance = self.model.objects.filter(pk=self.kwargs['pk']).first()
+            if instance is None:
                 messages.add_message(request, messages.ERROR,
                                      "A identificador passado como parâmetro não coressponder a nenhum objeto")
-                return render(request, template_name=self.template_name)
-        else:
-            washer = None
+                return redirect(self.success_url)
+
+        if request.POST.get('_method') == 'delete':
+            if instance is None:
+                return HttpResponseBadRequest("Nenhum objeto indicado para exclusão.")
+            instance.delete()
+            return redirect(self.success_url)
 
-        w_form = self.form_class(request.POST, instance=washer)
-        if w_form.is_valid():
+        form = self.form_class(request.POST, instance=instance)
+        if form.is_valid():
+            form.save()
             messages.success(request, "Salvo com sucesso!")
-            w_form.save()
-            return self.form_valid(w_form)
-        else:
-            return self.form_invalid(w_form)
+            return redirect(self.success_url)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['object_list'] = Washer.objects.all()  # Adiciona todos os Washers ao contexto
-        return context
+        self.object_list = self.get_queryset()
+        return self.render_to_response(self.get_context_data(form=form))
 
 
-class WasherListView(ListView):
+# WASHERS
+class WasherListCreateView(StaffRequireBolsista, ListFormView):
     model = Washer
     form_class = WasherForm
-    paginate_by = 100
+    keyset = ('id',)
+    success_url = reverse_lazy('washer_list')
     template_name = "lavanderia/washer_list.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['form'] = self.form_class()  # Adiciona o formulário ao contexto
-        context['washer_form'] = WasherForm()
-        return context
-
-
-class WasherDeleteView(DeleteView):
-    model = Washer
-    success_url = reverse_lazy("washer_list")
-
 
 # ---------__TIME SLOT____--------
 
-class TimeSlotDeleteView(DeleteView):
-    model = AvaibleSlot
-    success_url = reverse_lazy('time_slot_list')
-
-
-class TimeSlotFormView(FormView):
+# FIXME Decida TimeSlot ou AvaiableSlot
+class AvaibleSlotView(StaffRequireBolsista, ListFormView):
     model = AvaibleSlot
     form_class = AvaibleSlotForm
+    keyset = ('start', 'id')
     success_url = reverse_lazy('time_slot_list')
     template_name = "lavanderia/avaibleslot_list.html"
 
-    def post(self, request, *args, **kwargs):
-        slot_id = self.kwargs.get("pk")
-        if slot_id is not None:
-            try:
-                Slot = AvaibleSlot.objects.get(id=slot_id)
-            except ObjectDoesNotExist:
-                messages.add_message(request, messages.ERROR,
-                                     "A identificador passado como parâmetro não coressponder a nenhum objeto")
-                return render(request, template_name=self.template_name)
-        else:
-            Slot = AvaibleSlot()
-
-        s_form = self.form_class(request.POST, instance=Slot)
-        if s_form.is_valid():
-            s_form.save()
-            messages.success(request, "Salvo com sucesso!")
-            return self.form_valid(s_form)
-        else:
-            return self.form_invalid(s_form)
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['object_list'] = AvaibleSlot.objects.all()  # Adiciona todos os Washers ao contexto
-        return context
+    def get_queryset(self):
+        selected_date = get_selected_date(self.request)
 
-
-class AvaibleSlotListView(ListView):
-    model = AvaibleSlot
-    form_class = AvaibleSlotForm
-    paginate_by = 100
-    template_name = "lavanderia/avaibleslot_list.html"
+        return AvaibleSlot.objects.filter(start__gte=selected_date).select_related('washer').order_by('start')
 
     def get_context_data(self, **kwargs):
-        self.object = []
         context = super().get_context_data(**kwargs)
-        context['form'] = self.form_class()
         context['form_data'] = DateFilterForm(self.request.GET)
-
         return context
 
-    def get_queryset(self):
-        date_str = self.request.GET.get('data', None)
-        if date_str:
-            try:
-                selected_date = datetime.datetime.fromtimestamp(mktime(strptime(date_str, '%Y-%m-%d')))
-            except ValueError:
-                selected_date = timezone.localdate()
-        else:
-            selected_date = timezone.localdate()
-
-        return AvaibleSlot.objects.filter(start__gte=selected_date);
-
-
-class BaseCRUDView(View):
-    list_view: View | None = None
-    delete_view: View | None = None
-    form_view: View | None = None
-    form: Callable = None
-
-    def get(self, request, *args, **kwargs):
-        view = self.list_view.as_view()
-        return view(request, *args, **kwargs)
-
-    def post(self, request, *args, **kwargs):
-        if request.POST.get('_method') == 'delete':
-            delete_view = self.delete_view.as_view()
-            return delete_view(request, *args, **kwargs)
-
-        # Processa o formulário de Washer
-        form_view = self.form_view.as_view()
-        form_response = form_view(request, *args, **kwargs)
-
-        # Verifica se o formulário é válido ou contém erros
-        if form_response.status_code == 302:
-            # Se o formulário foi bem-sucedido, redireciona ou exibe a lista atualizada
-            return form_response  # Redireciona ao sucesso
-
-        # Se houver erros no formulário, precisamos exibir a lista de Washers junto com os erros
-        list_view = self.list_view.as_view()
-        rget = request
-        rget.method = 'GET'
-        list_response = list_view(request, *args, **kwargs)
-
-        # Pega o contexto da lista
-        list_context = list_response.context_data
-
-        # Insere o formulário com erros no contexto
-        if hasattr(form_response, 'context_data') and 'form' in form_response.context_data:
-            list_context['form'] = form_response.context_data['form']  # Formulário com erros
-        else:
-            list_context['form'] = self.form()  # Formulário vazio se não houver erros
-
-        # Adiciona as mensagens ao contexto
-        list_context['messages'] = messages.get_messages(request)
-
-        # Renderiza a resposta final, unindo a lista com o formulário
-        return render(request, self.list_view.template_name, list_context)
-
-
-class WasherListCreateView(StaffRequireBolsista, BaseCRUDView):
-    form_view = WasherFormView
-    form = WasherForm
-    list_view = WasherListView
-    delete_view = WasherDeleteView
 
+class SlotScheduleView(StaffRequireBolsista, FormView):
+    form_class = SlotScheduleForm
+    success_url = reverse_lazy('time_slot_list')
+    template_name = "lavanderia/gerar_horarios.html"
 
-# FIXME Decida TimeSlot ou AvaiableSlot
-class AvaibleSlotView(BaseCRUDView):
-    form_view = TimeSlotFormView
-    form = AvaibleSlotForm
-    list_view = AvaibleSlotListView
-    delete_view = TimeSlotDeleteView
+    def form_valid(self, form):
+        criados, conflitantes = generate_slots(**form.cleaned_data)
+        messages.success(self.request, f"{len(criados)} horários criados.")
+        if conflitantes:
+            messages.warning(self.request, f"{len(conflitantes)} horários ignorados por sobreposição.")
+        return super().form_valid(form)
 
 
 # Agendamentos
 
-class AgendamentoDeleteView(DeleteView):
-    model = Washer
-    success_url = reverse_lazy("agendamentos_view")
-
-
-class AgendamentoListView(ListView):
-    model = ReservedSlot
-    form_class = ReservedSlotForm
-    paginate_by = 100
-    template_name = "lavanderia/agendamento_list.html"
-
-    def get_queryset(self):
-        # Acessando os parâmetros da URL (por exemplo: ?start_date=2024-01-01)
-        start_date = self.request.GET.get('start', None)
-
-        # Se 'start_date' foi passado, converte para um objeto DateTime
-        if start_date:
-            start_date = strptime(start_date, "%Y-%m-%d")
-        else:
-            start_date = datetime.date.today()  # Se não for passado, filtra a partir da data atual
-
-        # Retorna o queryset filtrado pela data
-        return ReservedSlot.objects.filter(date__gte=start_date).order_by('date')
-
-
-class AgendamentoFormView(FormView):
-    pass  # TODO
-
-
-class AgendamentosView(BaseCRUDView):
-    form_view = AgendamentoFormView
-    form = ReservedSlotForm
-    list_view = AgendamentoListView
-    delete_view = AgendamentoDeleteView
-
-
 # Parte dos usuarios comuns
 
 class AvailableSlotListView(ListView):
@@ -274,27 +182,40 @@ class AvailableSlotListView(ListView):
     def get_queryset(self):
         # Pega a data e hora atual
         # Pega a data da URL ou usa o dia atual como padrão
-        date_str = self.request.GET.get('data', None)
-        if date_str:
-            try:
-                selected_date = datetime.datetime.fromtimestamp(mktime(strptime(date_str, '%Y-%m-%d')))
-            except ValueError:
-                selected_date = timezone.localdate()
-        else:
-            selected_date = timezone.localdate()
+        selected_date = get_selected_date(self.request)
 
-        # Seleciona os AvaibleSlots que começam a partir do momento atual e não estão reservados
-        queryset = AvaibleSlot.objects.filter(
-            start__gte=selected_date  # Slots com data e hora de início futura
-        ).exclude(
-            id__in=ReservedSlot.objects.values_list('slot_id', flat=True)  # Exclui slots já reservados
-        ).order_by('start')  # Ordena os slots por data de início
+        # Seleciona os AvaibleSlots livres da janela de agendamento
+        queryset = available_slots(selected_date).select_related('washer').order_by('start')
 
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        # A página é guardada em cache por dia escolhido, página e dia atual (que define
+        # o fim da janela de agendamento); o queryset só é avaliado em caso de falha
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        if not settings.AVAILABILITY_CACHE_TIMEOUT or not str(page).isdigit():
+            return super().paginate_queryset(queryset, page_size)
+        key = f"horarios:{get_selected_date(self.request).date()}:{timezone.localdate()}:{int(page)}"
+
+        dados = get_availability(key)
+        if dados is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            dados = (list(object_list), page.number, paginator.count)
+            set_availability(key, dados)
+
+        object_list, number, count = dados
+        paginator = self.get_paginator([], page_size, allow_empty_first_page=self.get_allow_empty())
+        paginator.count = count
+        page = Page(object_list, number, paginator)
+        return paginator, page, object_list, page.has_other_pages()
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = DateFilterForm(self.request.GET)
+        # Fluxo de eventos sob ASGI; senão a página consulta a API de horários periodicamente
+        context['live_events'] = settings.LIVE_EVENTS
+        context['poll_seconds'] = settings.AVAILABILITY_POLL_SECONDS
+        context['inicio'] = get_selected_date(self.request).date().isoformat()
         return context
 
 
@@ -305,48 +226,123 @@ from lavanderia.models import AvaibleSlot, ReservedSlot
 
 @login_required
 def schedule_slot(request, pk):
-    slot = get_object_or_404(AvaibleSlot, pk=pk)
-
-    # Verifica se o slot já foi reservado
-    if ReservedSlot.objects.filter(slot=slot).exists():
-        messages.add_message(request, messages.ERROR,
-                             "Horário já agendado")
+    try:
+        book_slot(request.user, pk)
+    except SlotTakenError:
+        # O usuário cumpre as regras: entra na fila e recebe o horário se ele for cancelado
+        try:
+            posicao = join_waitlist(request.user, pk)
+        except BookingError as erro:
+            # O horário já é do próprio usuário (clique duplo ou página desatualizada)
+            messages.add_message(request, messages.INFO, str(erro))
+            return redirect('meus_agendamentos')
+        messages.add_message(request, messages.WARNING,
+                             f"Horário já agendado. Você entrou na lista de espera (posição {posicao}) "
+                             f"e o horário será seu se for cancelado.")
+        return redirect('meus_agendamentos')
+    except BookingError as erro:
+        messages.add_message(request, messages.ERROR, str(erro))
         return redirect('horarios')
-
-    # Calcula a data limite de 30 dias atrás
-    thirty_days_ago = timezone.now() - datetime.timedelta(days=30)
-
-    if (slot.start.date() - datetime.date.today()).days >= 15:
-        messages.add_message(request, messages.ERROR,
-                             "Você não pode agendar para datas além de duas semanas.")
+    except OperationalError:
+        # O banco continuou travado mesmo depois das novas tentativas
+        messages.add_message(request, messages.ERROR, "Muitos agendamentos ao mesmo tempo. Tente novamente.")
         return redirect('horarios')
 
-    # Verifica se o usuário já tem dois ou mais agendamentos com presence=False nos últimos 30 dias
-    recent_absent_reservations = ReservedSlot.objects.filter(
-        user=request.user,
-        presence=False,
-        slot__start__gte=thirty_days_ago
-    ).count()
-
-    if recent_absent_reservations >= 2:
-        messages.add_message(request, messages.ERROR,
-                             "Você não pode agendar mais horários. Possui 2 ou mais faltas nos últimos 30 dias.")
-        return redirect('horarios')
-
-    next_reservatuions = ReservedSlot.objects.filter(user=request.user,
-                                                     slot__start__gte=now())
-    if next_reservatuions.count() >= 2:
-        messages.add_message(request, messages.ERROR,
-                             "Você não pode agendar mais horários. Possui 2 horarios agendados na próxima semana.")
-        return redirect('horarios')
-
-    # Cria a reserva para o usuário logado
-    ReservedSlot.objects.create(slot=slot, user=request.user)
-
     # Redireciona após agendamento
     return redirect('meus_agendamentos')
 
 
+def get_api_range(request):
+    """Intervalo [inicio, fim) pedido à API em ?inicio=AAAA-MM-DD&fim=AAAA-MM-DD (fim inclusive)."""
+    try:
+        inicio = datetime.date.fromisoformat(request.GET.get('inicio', ''))
+    except ValueError:
+        inicio = timezone.localdate()
+    try:
+        fim = datetime.date.fromisoformat(request.GET.get('fim', ''))
+    except ValueError:
+        fim = None
+
+    inicio = timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min))
+    if fim is not None:
+        fim = timezone.make_aware(datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min))
+    return inicio, fim
+
+
+def available_slots_etag(request):
+    """
+    ETag da disponibilidade no intervalo pedido, calculado com uma única agregação.
+
+    Os ids são AUTOINCREMENT (nunca reutilizados), então contagem + maior id mudam
+    sempre que um slot ou reserva do intervalo é criado ou removido; updated_at
+    cobre slots editados.
+    """
+    inicio, fim = get_api_range(request)
+    slots = AvaibleSlot.objects.filter(start__gte=inicio)
+    if fim is not None:
+        slots = slots.filter(start__lt=fim)
+    resumo = slots.aggregate(
+        slots=Count('id'),
+        ultimo_slot=Max('id'),
+        atualizado=Max('updated_at'),
+        reservas=Count('reservedslot'),
+        ultima_reserva=Max('reservedslot__id'),
+    )
+    # O fim da janela de agendamento avança a cada dia
+    chave = f"{timezone.localdate()}:{inicio}:{fim}:" + ":".join(str(valor) for valor in resumo.values())
+    return hashlib.md5(chave.encode()).hexdigest()
+
+
+@require_GET
+@condition(etag_func=available_slots_etag)
+def available_slots_api(request):
+    """Horários disponíveis em JSON, respondendo 304 quando nada mudou desde o último ETag."""
+    inicio, fim = get_api_range(request)
+    slots = available_slots(inicio, fim).order_by('start').values(
+        'id', 'start', 'end', 'duration', 'washer_id', 'washer__name')
+    return JsonResponse({
+        'slots': [
+            {
+                'id': slot['id'],
+                'start': slot['start'].isoformat(),
+                'end': slot['end'].isoformat(),
+                'duration': int(slot['duration'].total_seconds()),
+                'washer': {'id': slot['washer_id'], 'name': slot['washer__name']},
+            }
+            for slot in slots
+        ]
+    })
+
+
+async def availability_events(request):
+    """
+    Fluxo Server-Sent Events com as mudanças de disponibilidade (slot-booked,
+    slot-freed, slot-added, slot-removed, slots-added, slots-booked).
+
+    Só é roteado sob ASGI (LIVE_EVENTS), onde cada conexão ociosa é apenas uma
+    tarefa asyncio; sob WSGI ela ocuparia um worker inteiro.
+    """
+    async def stream():
+        queue = hub.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Conexão encerrada pelo cliente
+            hub.unsubscribe(queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Não deixa um proxy nginx segurar os eventos
+    return response
+
+
 class UserReservationListView(LoginRequiredMixin, ListView):
     model = ReservedSlot
     template_name = "lavanderia/usuario/agendamentos.html"
@@ -354,70 +350,303 @@ class UserReservationListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         # Filtra os agendamentos do usuário logado
-        return ReservedSlot.objects.filter(user=self.request.user, slot__start__gte=datetime.datetime.today())
+        return ReservedSlot.objects.filter(
+            user=self.request.user, slot__start__gte=timezone.now()
+        ).select_related('slot__washer').order_by('slot__start')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Horários que o usuário espera, com a posição na fila de cada um
+        context['waits'] = WaitlistEntry.objects.filter(
+            user=self.request.user, slot__start__gte=timezone.now()
+        ).annotate(
+            posicao=Subquery(
+                WaitlistEntry.objects.filter(slot=OuterRef('slot'), id__lte=OuterRef('id'))
+                .values('slot').annotate(total=Count('id')).values('total')
+            ),
+        ).select_related('slot__washer').order_by('slot__start')
+        return context
 
 
 class ReservationCancelView(LoginRequiredMixin, DeleteView):
     model = ReservedSlot
     success_url = reverse_lazy('meus_agendamentos')  # Redireciona para a lista de reservas após cancelar
 
-    def delete(self, request, *args, **kwargs):
-        # Obtém a instância do agendamento
-        reservation = self.get_object()
+    def get_queryset(self):
+        # Só os agendamentos do próprio usuário
+        return ReservedSlot.objects.filter(user=self.request.user).select_related('slot')
+
+    def form_valid(self, form):
+        # O DeleteView chama form_valid (e não delete) no POST
+        reservation = self.object
 
         # Verifica se o horário do slot já passou
         if reservation.slot.start < now():
             messages.error(self.request, "Não é possível cancelar um agendamento de data já passada.")
             return HttpResponseForbidden("Cancelamento não permitido para datas passadas.")
 
-        # Caso esteja dentro do prazo permitido, cancela o agendamento
+        # Caso esteja dentro do prazo permitido, cancela o agendamento e passa o horário
+        # ao próximo da lista de espera
+        try:
+            cancel_reservation(reservation)
+        except OperationalError:
+            messages.error(self.request, "Muitas alterações ao mesmo tempo. Tente novamente.")
+            return redirect(self.success_url)
         messages.success(self.request, "Agendamento cancelado com sucesso.")
-        return super().delete(request, *args, **kwargs)
+        return redirect(self.success_url)
+
 
+class WaitlistLeaveView(LoginRequiredMixin, DeleteView):
+    model = WaitlistEntry
+    success_url = reverse_lazy('meus_agendamentos')
 
-class ReservedSlotListView(StaffRequireBolsista, ListView):
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user)
+
+    def form_valid(self, form):
+        self.object.delete()
+        messages.success(self.request, "Você saiu da lista de espera.")
+        return redirect(self.success_url)
+
+
+class LotteryListView(LoginRequiredMixin, ListView):
+    """Sorteios com inscrições abertas e quantos horários o usuário já escolheu em cada um."""
+    template_name = "lavanderia/usuario/sorteios.html"
+    context_object_name = "rounds"
+
+    def get_queryset(self):
+        return LotteryRound.objects.filter(
+            status=LotteryRound.OPEN, closes_at__gt=timezone.now()
+        ).annotate(
+            escolhas=Count('preferences', filter=Q(preferences__user=self.request.user)),
+        ).order_by('start')
+
+
+class LotteryPreferenceView(LoginRequiredMixin, FormView):
+    """Envio das preferências do usuário para os horários livres da janela de um sorteio."""
+    form_class = LotteryPreferenceForm
+    template_name = "lavanderia/usuario/sorteio.html"
+    success_url = reverse_lazy('sorteios')
+
+    def dispatch(self, request, *args, **kwargs):
+        self.rodada = get_object_or_404(LotteryRound, pk=kwargs['pk'], status=LotteryRound.OPEN)
+        if self.rodada.closes_at <= timezone.now():
+            messages.error(request, "As inscrições deste sorteio já terminaram.")
+            return redirect(self.success_url)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['slots'] = unreserved_slots(self.rodada.start, self.rodada.end).select_related('washer') \
+            .order_by('start', 'washer__name')
+        return kwargs
+
+    def get_initial(self):
+        return {
+            f'slot_{slot_id}': rank for slot_id, rank in
+            self.rodada.preferences.filter(user=self.request.user).values_list('slot_id', 'rank')
+        }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['round'] = self.rodada
+        return context
+
+    def form_valid(self, form):
+        # As regras de schedule_slot valem também no sorteio (e são conferidas de novo no sorteio)
+        try:
+            check_user_rules(self.request.user, timezone.now())
+        except BookingError as erro:
+            form.add_error(None, str(erro))
+            return self.form_invalid(form)
+        save_preferences(self.rodada, self.request.user, form.cleaned_data['slot_ids'])
+        messages.success(self.request, f"{len(form.cleaned_data['slot_ids'])} preferências salvas.")
+        return super().form_valid(form)
+
+
+class ReservedSlotListView(StaffRequireBolsista, ListFormView):
     model = ReservedSlot
+    form_class = ReservedSlotForm
+    form_context_name = 'reservation_form'
+    success_url = reverse_lazy('reserved_slots')
     template_name = 'lavanderia/agendamento_list.html'
     context_object_name = 'reservations'
+    keyset = ('slot__start', 'id')
 
     def get_queryset(self):
         # Pega a data da URL ou usa o dia atual como padrão
-        date_str = self.request.GET.get('data', None)
-        if date_str:
-            try:
-                selected_date = datetime.datetime.fromtimestamp(mktime(strptime(date_str, '%Y-%m-%d')))
-            except ValueError:
-                selected_date = timezone.localdate()
-        else:
-            selected_date = timezone.localdate()
+        selected_date = get_selected_date(self.request)
 
-        # Retorna os agendamentos a partir da data escolhida
+        # Retorna os agendamentos a partir da data escolhida. As lavadoras vêm em uma consulta
+        # separada: com elas no JOIN o SQLite percorre a tabela (pequena) de lavadoras primeiro
+        # e ordena todas as reservas do período em vez de seguir o índice de start
         return ReservedSlot.objects.filter(
-            slot__start__date__gte=selected_date
-        ).select_related('slot', 'user')
+            slot__start__gte=selected_date
+        ).select_related('slot', 'user').prefetch_related('slot__washer').order_by('slot__start')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = DateFilterForm(self.request.GET)
+        context['export_form'] = ExportForm()
+        context['washers'] = Washer.objects.order_by('name')
         return context
 
-    # Para alterar a presença de um agendamento
+    # Para alterar a presença de um agendamento, cancelar ou criar um novo
     def post(self, request, *args, **kwargs):
         if 'presence_toggle' in request.POST:
-            reserved_slot = get_object_or_404(ReservedSlot, id=request.POST.get('reservation_id'))
-            reserved_slot.presence = not reserved_slot.presence
-            reserved_slot.save()
+            toggle_presence(request.POST.get('reservation_id'))
+
+        elif 'presence_confirm' in request.POST:
+            confirm_presence(request.POST.get('reservation_id'))
 
         elif 'delete_reservation' in request.POST:
             reserved_slot = get_object_or_404(ReservedSlot, id=request.POST.get('reservation_id'))
-            reserved_slot.delete()
+            cancel_reservation(reserved_slot)
+
+        else:
+            return super().post(request, *args, **kwargs)
         return redirect(self.request.path)
 
 
-class LavanderiaUserListView(StaffRequireBolsista, ListView):
+class LotteryRoundListView(StaffRequireBolsista, ListFormView):
+    model = LotteryRound
+    form_class = LotteryRoundForm
+    keyset = ('start', 'id')
+    success_url = reverse_lazy('lottery_rounds')
+    template_name = "lavanderia/sorteios.html"
+    context_object_name = 'rounds'
+
+    def get_queryset(self):
+        return LotteryRound.objects.annotate(
+            inscritos=Count('preferences__user', distinct=True),
+        ).order_by('start')
+
+    # Para sortear antes do fim das inscrições (o worker sorteia as rodadas encerradas)
+    def post(self, request, *args, **kwargs):
+        if 'draw_round' in request.POST:
+            resultado = draw_round(self.kwargs.get('pk'))
+            if resultado is None:
+                messages.error(request, "Este sorteio já foi realizado.")
+            else:
+                messages.success(request, f"{resultado['alocados']} horários distribuídos entre "
+                                          f"{resultado['atendidos']} de {resultado['inscritos']} inscritos.")
+            return redirect(self.success_url)
+        return super().post(request, *args, **kwargs)
+
+
+class SlotAutocompleteView(StaffRequireBolsista, View):
+    """Horários futuros e livres (?data=AAAA-MM-DD&washer=<id>) para o seletor de horário, em JSON."""
+    limit = 50
+
+    def get(self, request, *args, **kwargs):
+        agora = timezone.now()
+        fim = None
+        if request.GET.get('data'):
+            inicio = get_selected_date(request)
+            fim = inicio + datetime.timedelta(days=1)
+            inicio = max(inicio, agora)
+        else:
+            inicio = agora
+
+        slots = unreserved_slots(inicio, fim).select_related('washer').order_by('start', 'id')
+        if request.GET.get('washer', '').isdigit():
+            slots = slots.filter(washer_id=request.GET['washer'])
+
+        return JsonResponse({
+            'results': [{'id': slot.pk, 'text': slot_label(slot)} for slot in slots[:self.limit]],
+        })
+
+
+class ReservationExportView(StaffRequireBolsista, View):
+    """Exporta as reservas do período (?inicio=&fim=, inclusive) em CSV ou JSON Lines."""
+
+    def get(self, request, *args, **kwargs):
+        form = ExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest("Parâmetros de exportação inválidos.")
+
+        inicio, fim = form.cleaned_data['inicio'], form.cleaned_data['fim']
+        formato = form.cleaned_data['formato'] or 'csv'
+        if inicio is not None:
+            inicio = timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min))
+        if fim is not None:
+            fim = timezone.make_aware(datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min))
+
+        response = StreamingHttpResponse(
+            export_lines(reservation_rows(inicio, fim), formato),
+            content_type=FORMATS[formato],
+        )
+        response['Content-Disposition'] = f'attachment; filename="agendamentos.{formato}"'
+        return response
+
+
+class ReservationHistoryView(StaffRequireBolsista, KeysetPaginationMixin, ListView):
+    """Reservas de qualquer período, juntando as tabelas ativa e de arquivo (?inicio=&fim=&usuario=)."""
+    template_name = 'lavanderia/historico.html'
+    context_object_name = 'reservations'
+    keyset = ('slot__start', 'id')
+    fields = ('id', 'slot__start', 'slot__duration', 'slot__washer__name', 'user__username', 'presence')
+
+    def get_filters(self):
+        self.form = HistoryForm(self.request.GET)
+        if not self.form.is_valid():
+            return {}
+        inicio, fim = self.form.cleaned_data['inicio'], self.form.cleaned_data['fim']
+        filters = {}
+        if inicio is not None:
+            filters['start'] = timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min))
+        if fim is not None:
+            filters['end'] = timezone.make_aware(
+                datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min))
+        if self.form.cleaned_data['usuario']:
+            filters['user__username'] = self.form.cleaned_data['usuario']
+        return filters
+
+    def get_queryset(self):
+        return reservation_history(self.fields, **self.get_filters())
+
+    def filter_after(self, queryset, cursor):
+        # Uma união não aceita filter(): o cursor é aplicado em cada uma das tabelas
+        return reservation_history(self.fields, conditions=[after(self.keyset, cursor)], **self.get_filters())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = self.form
+        return context
+
+
+class MetricsView(StaffRequireBolsista, View):
+    """Métricas das requisições deste processo, no formato de texto do Prometheus."""
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class AnalyticsView(StaffRequireBolsista, TemplateView):
+    """Estatísticas de uso do período (?inicio=&fim=, padrão: último ano), lidas dos agregados diários."""
+    template_name = "lavanderia/estatisticas.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = PeriodForm(self.request.GET)
+        hoje = timezone.localdate()
+        inicio, fim = hoje - datetime.timedelta(days=365), hoje
+        if form.is_valid():
+            inicio = form.cleaned_data['inicio'] or inicio
+            fim = form.cleaned_data['fim'] or fim
+
+        context['form'] = form
+        context['inicio'], context['fim'] = inicio, fim
+        context.update(usage_report(inicio, fim))
+        return context
+
+
+class LavanderiaUserListView(StaffRequireBolsista, KeysetPaginationMixin, ListView):
     model = LavanderiaUser
     template_name = "lavanderia/users_list.html"
     context_object_name = "users"
+    paginate_by = 100
+    keyset = ('id',)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -437,6 +666,78 @@ class LavanderiaUserListView(StaffRequireBolsista, ListView):
         return redirect('user_list')  # Substitua com o nome da sua URL de listagem
 
 
+class UserImportView(StaffRequireBolsista, FormView):
+    """
+    Cadastro em lote a partir de um CSV. O arquivo é guardado e importado pela fila em
+    segundo plano (tarefa importar_usuarios): com o PBKDF2, milhares de senhas passam
+    do tempo limite de uma requisição.
+    """
+    form_class = UserImportForm
+    template_name = "lavanderia/importar_usuarios.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['imports'] = UserImport.objects.select_related('created_by').defer('content', 'report') \
+            .order_by('-id')[:10]
+        return context
+
+    def form_valid(self, form):
+        try:
+            conteudo = form.cleaned_data['arquivo'].read().decode('utf-8-sig')
+            check_columns(csv.DictReader(io.StringIO(conteudo, newline='')))
+        except UnicodeDecodeError:
+            form.add_error('arquivo', "O arquivo precisa estar em UTF-8.")
+            return self.form_invalid(form)
+        except (ValueError, csv.Error) as error:
+            form.add_error('arquivo', str(error))
+            return self.form_invalid(form)
+
+        with transaction.atomic():
+            importacao = UserImport.objects.create(created_by=self.request.user, content=conteudo)
+            enqueue('importar_usuarios', job_key(importacao.id), payload={'importacao': importacao.id})
+        messages.success(self.request, "Importação enfileirada; os usuários são cadastrados em segundo plano.")
+        return redirect('user_import_detail', pk=importacao.pk)
+
+
+class UserImportDetailView(StaffRequireBolsista, View):
+    """
+    Andamento de uma importação; o relatório com os links para definir a senha é baixado
+    uma única vez (POST), enquanto os links valem.
+    """
+    template_name = "lavanderia/importacao_usuarios.html"
+
+    def get(self, request, pk):
+        importacao = get_object_or_404(UserImport.objects.select_related('created_by').defer('content'), pk=pk)
+        return render(request, self.template_name, {
+            'importacao': importacao,
+            'expirado': importacao.finished_at is not None and importacao.finished_at < report_expiry(),
+            'job': Job.objects.filter(key=job_key(pk)).only('status', 'attempts', 'run_at').first(),
+            # (linha, username, erros): as linhas com erro continuam visíveis depois do download
+            'errors': [(linha, username, erros) for linha, username, _, _, erros in error_rows(importacao.report)],
+        })
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            importacao = get_object_or_404(
+                UserImport.objects.select_for_update().defer('content'),
+                pk=pk, finished_at__gte=report_expiry(), downloaded_at__isnull=True,
+            )
+            relatorio = importacao.report
+            # Os links saem do banco com o download; só as linhas com erro ficam
+            writer = csv.writer(Echo())
+            importacao.report = ''.join(writer.writerow(row) for row in error_rows(relatorio))
+            importacao.downloaded_at = timezone.now()
+            importacao.save(update_fields=['report', 'downloaded_at'])
+
+        # Os links são gravados como caminhos; o arquivo leva o endereço completo do site
+        linhas = [row[:3] + [request.build_absolute_uri(row[3]) if row[3] else ''] + row[4:]
+                  for row in csv.reader(io.StringIO(relatorio, newline=''))]
+        response = HttpResponse(''.join(writer.writerow(row) for row in [REPORT_HEADER] + linhas),
+                                content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="importacao-{pk}.csv"'
+        return response
+
+
 # DeleteView para excluir um usuário LavanderiaUser
 class LavanderiaUserDeleteView(StaffRequireBolsista, DeleteView):
     model = LavanderiaUser